@@ -0,0 +1,236 @@
+"""pandas analytics over evaluations, cached per PPG and store revision.
+
+``evaluations_frame`` joins evaluations with their target (article or PTT),
+evaluator, research line and project; ``scores_frame`` is the same data in long
+form, one row per criterion answer. Everything else is a vectorized group-by
+over these two frames. pandas is imported on first use.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+
+import streamlit as st
+
+from demo_store import _collection, get_evaluation_forms, store_revision
+from evaluation_scores import score_rows
+from instrumentation import instrument_module
+from metrics import record_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Group name -> (key column, label column) in ``evaluations_frame``.
+GROUPS: Dict[str, Tuple[str, str]] = {
+    "evaluator": ("evaluator_id", "evaluator_name"),
+    "line": ("line_id", "line_name"),
+    "project": ("project_id", "project_name"),
+    "year": ("year", "year"),
+    "target_type": ("target_type", "target_type"),
+}
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+TARGET_COLLECTIONS = {"article": "articles", "ptt": "ptts"}
+
+_FRAME_COLUMNS = [
+    "id", "target_type", "target_id", "evaluator_id", "form_type", "final_score", "created_at",
+]
+_TARGET_COLUMNS = ["id", "title", "year", "line_id", "project_id", "orientador_id"]
+
+
+def _rows(collection: str, ppg_id: str) -> list:
+    return [row for row in _collection(collection) if row.get("ppg_id") == ppg_id]
+
+
+def _names(collection: str, ppg_id: str, field: str = "name") -> "pd.Series":
+    import pandas as pd
+
+    rows = _rows(collection, ppg_id)
+    return pd.Series({row["id"]: row.get(field, row["id"]) for row in rows}, dtype="object")
+
+
+def _build_frames(ppg_id: str) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+    import pandas as pd
+
+    evaluations = _rows("evaluations", ppg_id)
+    frame = pd.DataFrame.from_records(
+        [{column: ev.get(column) for column in _FRAME_COLUMNS} for ev in evaluations], columns=_FRAME_COLUMNS
+    )
+    frame["final_score"] = pd.to_numeric(frame["final_score"], errors="coerce")
+    frame["created_at"] = pd.to_datetime(frame["created_at"], errors="coerce", format="ISO8601")
+    frame["year"] = frame["created_at"].dt.year.astype("Int64")
+
+    targets = pd.concat(
+        [
+            pd.DataFrame.from_records(
+                [{column: row.get(column) for column in _TARGET_COLUMNS} for row in _rows(collection, ppg_id)],
+                columns=_TARGET_COLUMNS,
+            ).assign(target_type=target_type)
+            for target_type, collection in TARGET_COLLECTIONS.items()
+        ],
+        ignore_index=True,
+    ).rename(columns={"id": "target_id", "title": "target_title", "year": "target_year"})
+    frame = frame.merge(targets, on=["target_type", "target_id"], how="left")
+    frame["evaluator_name"] = frame["evaluator_id"].map(_names("people", ppg_id)).fillna(frame["evaluator_id"])
+    frame["line_name"] = frame["line_id"].map(_names("research_lines", ppg_id))
+    frame["project_name"] = frame["project_id"].map(_names("projects", ppg_id))
+    for column in ("target_type", "form_type", "evaluator_id", "line_id", "project_id"):
+        frame[column] = frame[column].astype("category")
+
+    criteria = pd.DataFrame.from_records(
+        [
+            {"form_type": form_type, "criterion_id": c["id"], "criterion_name": c.get("name", c["id"]), "weight": c.get("weight", 1)}
+            for form_type, form in (get_evaluation_forms() or {}).items()
+            for c in form.get("criteria", [])
+        ],
+        columns=["form_type", "criterion_id", "criterion_name", "weight"],
+    )
+    # Read from the normalized score table instead of decoding every ``scores`` dict.
+    scores = pd.DataFrame.from_records(
+        [(row["evaluation_id"], row["criterion_id"], row["score"]) for row in score_rows(ppg_id)],
+        columns=["id", "criterion_id", "score"],
+    )
+    scores["score"] = pd.to_numeric(scores["score"], errors="coerce")
+    scores = scores.merge(
+        frame[["id", "target_type", "target_id", "evaluator_id", "form_type", "line_id", "year"]], on="id", how="inner"
+    )
+    scores["form_type"] = scores["form_type"].astype("object")
+    scores = scores.merge(criteria, on=["form_type", "criterion_id"], how="left")
+    scores["criterion_name"] = scores["criterion_name"].fillna(scores["criterion_id"])
+    scores["criterion_id"] = scores["criterion_id"].astype("category")
+    return frame, scores
+
+
+def _frames(ppg_id: str) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+    cache: Dict[str, Any] = st.session_state.setdefault("_evaluation_frames", {})
+    entry = cache.get(ppg_id)
+    revision = store_revision()
+    hit = entry is not None and entry[0] == revision
+    record_cache("evaluations_frame", hit)
+    if not hit:
+        entry = (revision, *_build_frames(ppg_id))
+        cache[ppg_id] = entry
+    return entry[1], entry[2]
+
+
+def evaluations_frame(ppg_id: str) -> "pd.DataFrame":
+    """One row per evaluation of ``ppg_id`` joined with its target, evaluator, line and project."""
+    return _frames(ppg_id)[0]
+
+
+def scores_frame(ppg_id: str) -> "pd.DataFrame":
+    """One row per criterion answer (``score`` on the 0–5 scale) with the evaluation's keys."""
+    return _frames(ppg_id)[1]
+
+
+def _describe(grouped: Any, column: str, percentiles: Sequence[float]) -> "pd.DataFrame":
+    stats = grouped[column].agg(["count", "mean", "std", "min", "max"])
+    quantiles = grouped[column].quantile(list(percentiles)).unstack()
+    quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+    return stats.join(quantiles)
+
+
+def group_stats(ppg_id: str, by: str, percentiles: Sequence[float] = PERCENTILES) -> "pd.DataFrame":
+    """Count, mean, dispersion and percentiles of ``final_score`` per ``by`` (a key of ``GROUPS``)."""
+    if by not in GROUPS:
+        raise ValueError(f"Agrupamento desconhecido: {by}")
+    key, label = GROUPS[by]
+    frame = evaluations_frame(ppg_id).dropna(subset=["final_score"])
+    stats = _describe(frame.groupby(key, observed=True), "final_score", percentiles)
+    if label == key:
+        return stats.assign(label=stats.index.astype(str)).reset_index()
+    labels = frame.drop_duplicates(key).set_index(key)[label]
+    return stats.assign(label=labels.reindex(stats.index)).reset_index()
+
+
+def criterion_stats(ppg_id: str, form_type: Optional[str] = None, percentiles: Sequence[float] = PERCENTILES) -> "pd.DataFrame":
+    """Per-criterion statistics of the 0–5 answers, optionally for one form."""
+    scores = scores_frame(ppg_id)
+    if form_type:
+        scores = scores[scores["form_type"] == form_type]
+    scores = scores.dropna(subset=["score"])
+    stats = _describe(scores.groupby("criterion_id", observed=True), "score", percentiles)
+    names = scores.drop_duplicates("criterion_id").set_index("criterion_id")[["criterion_name", "weight"]]
+    return stats.join(names).reset_index()
+
+
+def score_percentiles(ppg_id: str, percentiles: Sequence[float] = PERCENTILES) -> Dict[str, float]:
+    scores = evaluations_frame(ppg_id)["final_score"].dropna()
+    if scores.empty:
+        return {}
+    return {f"p{int(q * 100)}": float(value) for q, value in scores.quantile(list(percentiles)).items()}
+
+
+def inter_evaluator_agreement(ppg_id: str) -> Dict[str, Any]:
+    """Agreement between evaluators on targets evaluated more than once.
+
+    Returns the number of such targets, the mean absolute pairwise difference of
+    ``final_score``, the one-way ICC(1) of ``final_score`` and, per criterion, the
+    share of evaluator pairs that gave exactly the same answer.
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = evaluations_frame(ppg_id).dropna(subset=["final_score"])
+    target = ["target_type", "target_id"]
+    sizes = frame.groupby(target, observed=True)["final_score"].transform("size")
+    multi = frame[sizes > 1]
+    result: Dict[str, Any] = {"targets": 0, "mean_abs_diff": None, "icc1": None, "criteria": pd.DataFrame()}
+    if multi.empty:
+        return result
+    groups = multi.groupby(target, observed=True)["final_score"]
+    n = groups.size()
+    result["targets"] = int(len(n))
+
+    # Mean |x_i - x_j| over pairs within a target, from sorted values:
+    # sum_{i<j} (x_j - x_i) = sum_k x_(k) * (2k - n + 1) with 0-based rank k.
+    ranked = multi.assign(
+        rank=groups.rank(method="first") - 1, n=groups.transform("size")
+    )
+    weighted = (ranked["final_score"] * (2 * ranked["rank"] - ranked["n"] + 1)).groupby(
+        [ranked["target_type"], ranked["target_id"]], observed=True
+    ).sum()
+    pairs = n * (n - 1) / 2
+    result["mean_abs_diff"] = float((weighted / pairs).mean())
+
+    # One-way random-effects ICC(1) for unbalanced groups.
+    total_n, group_count = n.sum(), len(n)
+    grand = multi["final_score"].mean()
+    means = groups.mean()
+    ss_between = float((n * (means - grand) ** 2).sum())
+    ss_within = float(((multi["final_score"] - groups.transform("mean")) ** 2).sum())
+    ms_between = ss_between / (group_count - 1) if group_count > 1 else np.nan
+    ms_within = ss_within / (total_n - group_count)
+    k0 = (total_n - (n**2).sum() / total_n) / (group_count - 1) if group_count > 1 else np.nan
+    denominator = ms_between + (k0 - 1) * ms_within
+    if denominator and not np.isnan(denominator):
+        result["icc1"] = float((ms_between - ms_within) / denominator)
+
+    # Exact agreement per criterion: agreeing pairs are sum c*(c-1)/2 over answer counts c.
+    scores = scores_frame(ppg_id).dropna(subset=["score"])
+    scores = scores[scores["id"].isin(multi["id"])]
+    if not scores.empty:
+        keys = ["criterion_id", "target_type", "target_id"]
+        per_value = scores.groupby(keys + ["score"], observed=True).size()
+        agreeing = (per_value * (per_value - 1) / 2).groupby(level=keys, observed=True).sum()
+        answers = scores.groupby(keys, observed=True).size()
+        totals = pd.DataFrame({"pairs": answers * (answers - 1) / 2, "agreeing": agreeing}).groupby(
+            level="criterion_id", observed=True
+        ).sum()
+        totals = totals[totals["pairs"] > 0]
+        totals["exact_agreement"] = totals["agreeing"] / totals["pairs"]
+        names = scores.drop_duplicates("criterion_id").set_index("criterion_id")["criterion_name"]
+        result["criteria"] = totals.join(names).reset_index()
+    return result
+
+
+__all__ = [
+    "GROUPS",
+    "PERCENTILES",
+    "evaluations_frame",
+    "scores_frame",
+    "group_stats",
+    "criterion_stats",
+    "score_percentiles",
+    "inter_evaluator_agreement",
+]
+
+instrument_module(globals())
@@ -7,17 +7,76 @@ ensure_demo_db()
 import streamlit as st
 
 from demo_context import current_person, current_ppg, current_profile, get_ctx, set_person, set_ppg, set_profile
-from demo_store import export_db_json, import_db_json, list_people, reset_db
+from demo_store import (
+    export_db_json,
+    get_db,
+    import_db_json,
+    list_snapshots,
+    reset_db,
+    restore_snapshot,
+    save_snapshot,
+    store_revision,
+)
+from exports import FORMATS as COLUMNAR_FORMATS, export_ppg_zip
+from instrumentation import begin_rerun, end_rerun
+from ppg_datasets import list_people, switch_ppg, switchable_ppgs, warm_up
+from provider import login, logout, supabase_login_available, watch_ppg_changes
+from rbac import cached_user
 
 
 def _set_page_config() -> None:
     st.set_page_config(page_title="PPG Manager (Demo)", layout="wide")
 
 
+def _account() -> None:
+    """Supabase sign-in; loads the user's memberships in every PPG (``provider.login``)."""
+    if not supabase_login_available():
+        return
+    with st.sidebar.expander("Conta", expanded=cached_user() is None):
+        auth = st.session_state.get("auth") or {}
+        if cached_user() is not None:
+            st.caption(auth.get("email") or cached_user())
+            if st.button("Sair", use_container_width=True):
+                logout()
+                st.rerun()
+            return
+        with st.form("login_form"):
+            email = st.text_input("E-mail")
+            password = st.text_input("Senha", type="password")
+            submitted = st.form_submit_button("Entrar", use_container_width=True)
+        if submitted:
+            try:
+                signed_in = login(email, password) is not None
+            except Exception as exc:
+                st.error(f"Erro ao entrar: {exc}")
+                return
+            if not signed_in:
+                st.error("E-mail ou senha inválidos.")
+                return
+            st.rerun()
+
+
 def _sidebar() -> None:
     ensure_demo_db()
     ctx = get_ctx()
     st.sidebar.title("PPG Demo")
+    _account()
+
+    ppgs = switchable_ppgs()
+    ppg_ids = [p["id"] for p in ppgs]
+    if ppg_ids:
+        names = {p["id"]: p.get("name") or p["id"] for p in ppgs}
+        current = ctx.get("ppg_id")
+        selected_ppg = st.sidebar.selectbox(
+            "PPG atual",
+            ppg_ids,
+            index=ppg_ids.index(current) if current in ppg_ids else 0,
+            format_func=names.get,
+        )
+        switch_ppg(selected_ppg)
+        if len(ppg_ids) > 1:
+            # Lists and reports of the other programs are ready before the user switches.
+            warm_up()
 
     profiles = ["coordenador", "orientador", "mestrando"]
     profile = st.sidebar.selectbox("Perfil atual", profiles, index=profiles.index(ctx.get("profile", "coordenador")))
@@ -39,7 +98,6 @@ def _sidebar() -> None:
         set_person(None)
 
     ppg_id = ctx.get("ppg_id")
-    st.sidebar.write(f"PPG atual: {ppg_id}")
 
     st.sidebar.divider()
     if st.sidebar.button("Resetar demo", use_container_width=True):
@@ -53,6 +111,34 @@ def _sidebar() -> None:
         st.success("Banco demo importado.")
         st.rerun()
 
+    with st.sidebar.expander("Exportação analítica"):
+        fmt = st.radio("Formato", list(COLUMNAR_FORMATS), horizontal=True, key="columnar_format")
+        key = (ppg_id, fmt, store_revision())
+        if st.button("Gerar arquivos do PPG", use_container_width=True, disabled=not ppg_id):
+            # Built on demand: download_button needs the bytes on every rerun it is shown.
+            st.session_state["_columnar_export"] = (key, export_ppg_zip(get_db(), ppg_id, fmt))
+        cached = st.session_state.get("_columnar_export")
+        if cached and cached[0] == key:
+            st.download_button(
+                f"Baixar {fmt.capitalize()} (zip)",
+                cached[1],
+                file_name=f"{ppg_id}_{fmt}.zip",
+                mime="application/zip",
+                use_container_width=True,
+            )
+
+    with st.sidebar.expander("Snapshots"):
+        name = st.text_input("Nome do snapshot", key="snapshot_name")
+        if st.button("Salvar snapshot", use_container_width=True, disabled=not name):
+            save_snapshot(name)
+            st.success(f"Snapshot '{name}' salvo.")
+        snapshots = list_snapshots()
+        if snapshots:
+            selected = st.selectbox("Snapshots salvos", snapshots, key="snapshot_selected")
+            if st.button("Restaurar snapshot", use_container_width=True):
+                restore_snapshot(selected)
+                st.rerun()
+
     st.sidebar.divider()
     st.sidebar.header("Navegação")
     st.sidebar.page_link("pages/01_Visão_Geral.py", label="Visão Geral")
@@ -66,6 +152,8 @@ def _sidebar() -> None:
 def main() -> None:
     _set_page_config()
     ensure_demo_db()
+    begin_rerun("Início")
+    watch_ppg_changes()
     _sidebar()
     st.title("PPG Manager - Demo")
     st.success("Use a barra lateral para navegar entre as páginas.")
@@ -74,6 +162,7 @@ def main() -> None:
     )
     ctx = get_ctx()
     st.write(f"Perfil: {current_profile()} | Pessoa: {current_person() or 'Coordenação'} | PPG: {current_ppg()}")
+    end_rerun()
 
 
 if __name__ == "__main__":
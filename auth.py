@@ -3,7 +3,6 @@ from __future__ import annotations
 from dataclasses import dataclass
 import os
 import streamlit as st
-from supabase import create_client
 
 @dataclass(frozen=True)
 class AuthState:
@@ -23,6 +22,9 @@ def get_client():
     key = _supabase_key()
     if not url or not key:
         raise RuntimeError("SUPABASE_URL e SUPABASE_ANON_KEY não configurados (Secrets/ENV).")
+    # Import tardio: o modo DEMO nunca carrega o cliente Supabase.
+    from supabase import create_client
+
     # IMPORTANTE: não cacheie o client para Auth em multipage
     return create_client(url, key)
 
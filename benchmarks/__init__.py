@@ -0,0 +1 @@
+"""Performance benchmarks for the demo data layer and pages."""
@@ -0,0 +1,126 @@
+"""Micro-benchmarks for the hot paths in ``data.py`` and ``demo_store.py``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_data --sizes small,medium,large
+    python -m benchmarks.bench_data --history
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.harness import DATASET_SIZES, headless_session, load_dataset, measure, print_history, write_results
+
+SUITE = "data"
+
+Case = Tuple[str, Callable[[], Any], Optional[Callable[[], Any]]]
+
+
+def _cases(db: Dict[str, Any]) -> List[Case]:
+    import analytics
+    import data
+    import demo_store
+    import evaluation_scores
+    import evaluation_timeline
+    import form_versions
+    import ppg_datasets
+    import reports
+
+    ppg_id = "ppg1"
+    last_article = db["articles"][-1]
+    dissertation = next(d for d in db["dissertations"] if d["artigos_ids"])
+    target = db["evaluations"][-1]
+    form = data.get_admin_form(target["form_type"])
+    project_id = db["projects"][-1]["id"]
+    baseline = demo_store.snapshot_db()
+
+    def restore() -> None:
+        demo_store.restore_db(baseline)
+
+    def upsert_update() -> None:
+        demo_store._upsert("articles", {"id": last_article["id"], "status": "concluido"})
+
+    def upsert_insert_delete() -> None:
+        demo_store._upsert("articles", {"id": "bench-new", "ppg_id": ppg_id, "status": "planejado"})
+        demo_store._delete("articles", "bench-new")
+
+    batch = [
+        {
+            "ppg_id": ppg_id,
+            "target_type": "article",
+            "target_id": article["id"],
+            "form_type": "articles",
+            "scores": {c["id"]: (True if c.get("response_type") == "yes_no" else 4) for c in data.get_admin_form("articles")["criteria"]},
+        }
+        for article in [a for a in db["articles"] if a["ppg_id"] == ppg_id][:50]
+    ]
+
+    def sync_dissertation() -> None:
+        current = demo_store.get_by_id("dissertations", dissertation["id"])
+        data.upsert_dissertation({**current, "artigos_ids": list(reversed(current["artigos_ids"]))})
+
+    return [
+        ("list_people", lambda: demo_store.list_people(ppg_id), None),
+        ("list_lines", lambda: demo_store.list_lines(ppg_id), None),
+        ("list_projects", lambda: demo_store.list_projects(ppg_id), None),
+        ("list_dissertations", lambda: demo_store.list_dissertations(ppg_id), None),
+        ("list_articles", lambda: demo_store.list_articles(ppg_id), None),
+        ("list_ptts", lambda: demo_store.list_ptts(ppg_id), None),
+        ("list_evaluations", lambda: demo_store.list_evaluations(ppg_id=ppg_id), None),
+        ("list_ppg_members", lambda: data.list_ppg_members(ppg_id), None),
+        ("list_articles_partitioned", lambda: ppg_datasets.list_articles(ppg_id), None),
+        ("build_ppg_datasets", ppg_datasets.build_datasets, None),
+        ("get_by_id", lambda: demo_store.get_by_id("articles", last_article["id"]), None),
+        ("_upsert_update", upsert_update, None),
+        ("_upsert_insert+_delete", upsert_insert_delete, None),
+        ("_delete", lambda: demo_store._delete("articles", last_article["id"]), restore),
+        ("delete_project", lambda: data.delete_project(project_id), restore),
+        ("upsert_dissertation_link_sync", sync_dissertation, None),
+        ("evaluation_stats", lambda: data.evaluation_stats(target["target_type"], target["target_id"]), None),
+        ("recent_evaluations_10", lambda: data.list_recent_evaluations(10), None),
+        ("build_evaluation_timeline", evaluation_timeline.build_timeline, None),
+        ("calculate_weighted_score", lambda: data.calculate_weighted_score(form, target["scores"]), None),
+        ("add_evaluation_records_50", lambda: data.add_evaluation_records([dict(p) for p in batch]), restore),
+        ("compiled_form_score", lambda: form_versions.score_evaluation(target), None),
+        ("build_production_report", lambda: reports.build_production_report(ppg_id), None),
+        ("production_report_cached", lambda: reports.production_report(ppg_id), None),
+        ("build_all_reports", reports.build_all_reports, None),
+        ("ppg_overview_cached", lambda: data.ppg_overview(ppg_id), None),
+        ("ppg_overview_after_write", lambda: (upsert_update(), data.ppg_overview(ppg_id)), None),
+        ("build_score_table", evaluation_scores.build_score_table, None),
+        ("criterion_average", lambda: evaluation_scores.criterion_average("articles", "c_art_3", ppg_id), None),
+        ("evaluations_frame_build", lambda: analytics._build_frames(ppg_id), None),
+        ("group_stats_evaluator", lambda: analytics.group_stats(ppg_id, "evaluator"), None),
+        ("inter_evaluator_agreement", lambda: analytics.inter_evaluator_agreement(ppg_id), None),
+    ]
+
+
+def run(sizes: List[str], repeat: int) -> Dict[str, Any]:
+    headless_session()
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        db = load_dataset(size)
+        for name, fn, setup in _cases(db):
+            key = f"{size}/{name}"
+            results[key] = measure(fn, setup=setup, repeat=repeat)
+            print(f"{key:<48}{results[key]['median'] * 1e3:10.3f}ms")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small,medium", help=f"Tamanhos: {', '.join(DATASET_SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="Arquivo JSON de saída (padrão: benchmarks/results/data-<commit>.json)")
+    parser.add_argument("--history", action="store_true", help="Mostra a evolução dos resultados salvos")
+    args = parser.parse_args(argv)
+    if args.history:
+        print_history(SUITE)
+        return
+    results = run([s for s in args.sizes.split(",") if s], args.repeat)
+    print(f"Resultados salvos em {write_results(SUITE, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Cold-start benchmarks: ``python -X importtime`` per module and first-page latency in a fresh process.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_imports
+    python -m benchmarks.bench_imports --history
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.harness import ROOT, print_history, write_results
+
+SUITE = "imports"
+
+MODULES = ["demo_store", "data", "provider", "components.forms", "auth"]
+
+# Modules that must not be loaded just by importing the demo data layer.
+HEAVY = ["pandas", "supabase", "pyarrow"]
+
+FIRST_PAGES = {
+    "visao_geral": "pages/01_Visão_Geral.py",
+    "avaliacoes": "pages/07_Avaliações.py",
+    "fichas": "pages/09_Fichas_CAPES.py",
+}
+
+# Runs in a fresh interpreter, like a new container: import Streamlit, run app.py, open one page.
+_FIRST_PAGE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+app = time.perf_counter()
+at.switch_page(sys.argv[1]).run()
+page = time.perf_counter()
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(json.dumps({
+    "import_streamlit": imported - start,
+    "app": app - imported,
+    "page": page - app,
+    "heavy": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (HEAVY,)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ, DEMO_MODE="true", PYTHONPATH=str(ROOT))
+    env.pop("PPG_INSTRUMENT", None)
+    env.pop("PPG_METRICS_PORT", None)
+    return env
+
+
+def _importtime(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import ``module`` in a fresh interpreter; return total seconds and cumulative seconds per import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    cumulative: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:") :].split("|"))
+        total += int(self_us) / 1e6
+        cumulative.setdefault(name.strip(), int(cumulative_us) / 1e6)
+    return total, cumulative
+
+
+def _first_page(page: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _FIRST_PAGE_SCRIPT, page],
+        cwd=ROOT,
+        env=_env(),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{page}: {proc.stderr.strip()[-500:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def _summary(samples: List[float], **extra: Any) -> Dict[str, Any]:
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "repeat": len(samples),
+        **extra,
+    }
+
+
+def run(repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for module in MODULES:
+        samples = []
+        for _ in range(repeat):
+            total, cumulative = _importtime(module)
+            samples.append(total)
+        heavy = sorted(name for name in HEAVY if name in cumulative)
+        slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:5]
+        results[f"import/{module}"] = _summary(samples, heavy=heavy, slowest=dict(slowest))
+        print(f"{'import/' + module:<40}{results[f'import/{module}']['median'] * 1e3:10.1f}ms  pesados: {heavy or '-'}")
+    for key, page in FIRST_PAGES.items():
+        runs = [_first_page(page) for _ in range(repeat)]
+        for phase in ("process", "import_streamlit", "app", "page"):
+            case = f"first_page/{key}/{phase}"
+            results[case] = _summary([r[phase] for r in runs])
+            print(f"{case:<40}{results[case]['median'] * 1e3:10.1f}ms")
+        results[f"first_page/{key}/process"]["heavy"] = runs[-1]["heavy"]
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Arquivo JSON de saída (padrão: benchmarks/results/imports-<commit>.json)")
+    parser.add_argument("--history", action="store_true", help="Mostra a evolução dos resultados salvos")
+    args = parser.parse_args(argv)
+    if args.history:
+        print_history(SUITE)
+        return
+    results = run(args.repeat)
+    print(f"Resultados salvos em {write_results(SUITE, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
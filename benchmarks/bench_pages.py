@@ -0,0 +1,171 @@
+"""End-to-end rerun benchmarks driving the pages through ``streamlit.testing.v1.AppTest``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_pages --sizes small,medium   # medium takes minutes
+    python -m benchmarks.bench_pages --history
+"""
+from __future__ import annotations
+
+import argparse
+import pickle
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.harness import DATASET_SIZES, ROOT, print_history, write_results
+
+SUITE = "pages"
+
+PAGES = {
+    "visao_geral": "pages/01_Visão_Geral.py",
+    "dissertacoes": "pages/04_Dissertações.py",
+    "artigos": "pages/05_Artigos.py",
+    "avaliacoes": "pages/07_Avaliações.py",
+}
+
+
+def _count_elements(node: Any) -> Tuple[int, int]:
+    """Return ``(elements, widgets)`` rendered below ``node``."""
+    from streamlit.testing.v1.element_tree import Block, Widget
+
+    elements = widgets = 0
+    for child in getattr(node, "children", {}).values():
+        if isinstance(child, Block):
+            sub_elements, sub_widgets = _count_elements(child)
+            elements += sub_elements
+            widgets += sub_widgets
+        else:
+            elements += 1
+            widgets += isinstance(child, Widget)
+    return elements, widgets
+
+
+def _app(db: Dict[str, Any], page: str, timeout: float):
+    """Open ``page`` through ``app.py`` so ``st.page_link`` targets resolve."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+    at.session_state["db"] = db
+    at.session_state["ctx"] = {"ppg_id": "ppg1", "profile": "coordenador", "person_id": None}
+    at.run()
+    at.switch_page(page)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].message}")
+    return at
+
+
+def _timed(action: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
+
+
+def _peak_memory(action: Callable[[], Any]) -> int:
+    # Measured in a separate pass: tracemalloc slows the rerun down several times.
+    tracemalloc.start()
+    try:
+        action()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _summary(times: List[float], peak: int, at: Any) -> Dict[str, Any]:
+    elements, widgets = _count_elements(at._tree)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "peak_memory_bytes": peak,
+        "elements": elements,
+        "widgets": widgets,
+        "repeat": len(times),
+    }
+
+
+def _rerun(at: Any) -> None:
+    at.run()
+
+
+def _change_dissertation_status(at: Any) -> None:
+    radio = at.radio[0]
+    radio.set_value("concluido" if radio.value != "concluido" else "planejado")
+    next(b for b in at.button if b.label == "Salvar").click()
+    at.run()
+
+
+def _change_article_status(at: Any) -> None:
+    radio = at.radio[0]
+    radio.set_value("concluido" if radio.value != "concluido" else "planejado")
+    next(b for b in at.button if b.label == "Atualizar status").click()
+    at.run()
+
+
+def _new_evaluation(at: Any) -> None:
+    next(b for b in at.button if b.label == "Nova avaliação").click()
+    at.run()
+    for slider in at.slider:
+        slider.set_value(4)
+    for checkbox in at.checkbox:
+        checkbox.check()
+    at.text_area[0].input("Avaliação gerada pelo benchmark.")
+    next(b for b in at.button if b.label == "Salvar avaliação").click()
+    at.run()
+
+
+SCENARIOS: List[Tuple[str, str, Callable[[Any], None]]] = [
+    ("visao_geral", "rerun", _rerun),
+    ("dissertacoes", "rerun", _rerun),
+    ("dissertacoes", "status_change", _change_dissertation_status),
+    ("artigos", "rerun", _rerun),
+    ("artigos", "status_change", _change_article_status),
+    ("avaliacoes", "rerun", _rerun),
+    ("avaliacoes", "new_evaluation", _new_evaluation),
+]
+
+
+def run(sizes: List[str], repeat: int, timeout: float) -> Dict[str, Any]:
+    from demo_generator import generate_demo_db
+
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        blob = pickle.dumps(generate_demo_db(1, **DATASET_SIZES[size]), protocol=5)
+        for page_key, scenario, action in SCENARIOS:
+            times = []
+            for _ in range(repeat):
+                # Each sample gets a freshly loaded page and data, so writes do not accumulate.
+                at = _app(pickle.loads(blob), PAGES[page_key], timeout)
+                times.append(_timed(lambda: action(at)))
+                if at.exception:
+                    raise RuntimeError(f"{page_key}/{scenario}: {at.exception[0].message}")
+            at = _app(pickle.loads(blob), PAGES[page_key], timeout)
+            peak = _peak_memory(lambda: action(at))
+            key = f"{size}/{page_key}/{scenario}"
+            results[key] = _summary(times, peak, at)
+            print(
+                f"{key:<44}{results[key]['median'] * 1e3:10.1f}ms"
+                f"{results[key]['peak_memory_bytes'] / 2**20:10.1f}MiB{results[key]['widgets']:8d} widgets"
+            )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small", help=f"Tamanhos: {', '.join(DATASET_SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo por rerun (s)")
+    parser.add_argument("-o", "--output", help="Arquivo JSON de saída (padrão: benchmarks/results/pages-<commit>.json)")
+    parser.add_argument("--history", action="store_true", help="Mostra a evolução dos resultados salvos")
+    args = parser.parse_args(argv)
+    if args.history:
+        print_history(SUITE)
+        return
+    results = run([s for s in args.sizes.split(",") if s], args.repeat, args.timeout)
+    print(f"Resultados salvos em {write_results(SUITE, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""EXPLAIN ANALYZE of RLS-filtered queries before and after the "RLS performance" section of ``db/ddl.sql``.
+
+Starts a throwaway Postgres in Docker (or reuses ``--container``), loads the
+schema up to the "RLS performance" section with minimal stand-ins for Supabase's ``auth``
+schema, fills it with generated data and runs each query as an
+``authenticated`` user. Then it applies that section alone (up to the next
+section header) and runs the queries again; the sections after it are loaded
+only once the measurements are done. Needs only ``docker``: SQL goes through ``psql`` inside the container.
+
+    python -m benchmarks.bench_rls --ppgs 20 --rows 5000
+    python -m benchmarks.bench_rls --history
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.harness import ROOT, print_history, write_results
+
+SUITE = "rls"
+DDL = ROOT / "db" / "ddl.sql"
+MIGRATION_MARKER = "-- RLS performance"
+# Section headers of ddl.sql: ``-- Title -----``.
+SECTION_HEADER = re.compile(r"^-- [^\n]*-{5,}$", re.MULTILINE)
+
+# Just enough of Supabase's auth schema for the DDL and the policies.
+AUTH_STUB = """
+create extension if not exists pgcrypto;
+create schema if not exists auth;
+create table if not exists auth.users (
+    id uuid primary key default gen_random_uuid(),
+    email text,
+    raw_user_meta_data jsonb default '{}'::jsonb
+);
+create or replace function auth.uid() returns uuid
+language sql stable
+as $$ select nullif(current_setting('request.jwt.claim.sub', true), '')::uuid $$;
+do $$ begin
+  if not exists (select 1 from pg_roles where rolname = 'authenticated') then
+    create role authenticated nologin;
+  end if;
+end $$;
+"""
+
+GRANTS = """
+grant usage on schema public, auth to authenticated;
+grant select, insert, update, delete on all tables in schema public to authenticated;
+"""
+
+SEED = """
+insert into auth.users (email)
+select 'user' || g || '@bench.local' from generate_series(1, {users}) g;
+
+insert into public.ppgs (name) select 'PPG ' || g from generate_series(1, {ppgs}) g;
+
+insert into public.memberships (user_id, ppg_id, role)
+select u.id, p.id, (array['coordenador', 'orientador', 'mestrando'])[1 + (abs(hashtext(u.id::text || p.id::text)) % 3)]::public.member_role_v2
+from auth.users u
+join lateral (select id from public.ppgs order by md5(u.id::text || id::text) limit {memberships_per_user}) p on true;
+
+insert into public.research_lines (ppg_id, name)
+select p.id, 'Linha ' || g from public.ppgs p cross join generate_series(1, 5) g;
+
+insert into public.projects (ppg_id, name)
+select p.id, 'Projeto ' || g from public.ppgs p cross join generate_series(1, {projects}) g;
+
+insert into public.project_orientadores (project_id, user_id)
+select pr.id, m.user_id
+from public.projects pr
+join lateral (
+  select user_id from public.memberships where ppg_id = pr.ppg_id and role = 'orientador' limit 2
+) m on true;
+
+insert into public.articles (ppg_id, title, year, status, project_id)
+select p.id, 'Artigo ' || g, 2020 + g % 5, 'planejado',
+       (select pr.id from public.projects pr where pr.ppg_id = p.id order by pr.id offset g % {projects} limit 1)
+from public.ppgs p cross join generate_series(1, {rows}) g;
+
+insert into public.dissertations (ppg_id, title, project_id)
+select p.id, 'Dissertação ' || g,
+       (select pr.id from public.projects pr where pr.ppg_id = p.id order by pr.id offset g % {projects} limit 1)
+from public.ppgs p cross join generate_series(1, {rows} / 5) g;
+
+insert into public.ptts (ppg_id, title)
+select p.id, 'PTT ' || g from public.ppgs p cross join generate_series(1, {rows} / 5) g;
+
+insert into public.evaluations (ppg_id, target_type, target_id, form_type, scores, final_score)
+select a.ppg_id, 'article', a.id, 'articles', '{{"c1": 4, "c2": true}}'::jsonb, 40
+from public.articles a;
+
+analyze;
+"""
+
+# name -> query; ``{ppg}`` is one of the probe user's PPGs.
+QUERIES: Dict[str, str] = {
+    "articles_page": "select id, title, status from public.articles where ppg_id = '{ppg}' order by created_at, id limit 50",
+    "articles_visible": "select count(*) from public.articles",
+    "evaluations_visible": "select count(*) from public.evaluations",
+    "evaluation_scores_ppg": "select criterion_id, avg(score) from public.evaluation_scores where ppg_id = '{ppg}' group by 1",
+    "project_orientadores": "select count(*) from public.project_orientadores",
+    "profiles_same_ppg": "select count(*) from public.profiles",
+    "memberships_visible": "select count(*) from public.memberships",
+}
+
+
+def _psql(container: str, sql: str) -> str:
+    out = subprocess.run(
+        ["docker", "exec", "-i", container, "psql", "-U", "postgres", "-d", "postgres", "-v", "ON_ERROR_STOP=1", "-q", "-At"],
+        input=sql,
+        capture_output=True,
+        text=True,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip() or out.stdout.strip())
+    return out.stdout
+
+
+def _start(image: str, name: str) -> None:
+    subprocess.run(
+        ["docker", "run", "-d", "--rm", "--name", name, "-e", "POSTGRES_PASSWORD=bench", image],
+        check=True,
+        capture_output=True,
+    )
+    for _ in range(60):
+        ready = subprocess.run(["docker", "exec", name, "pg_isready", "-U", "postgres"], capture_output=True)
+        if ready.returncode == 0:
+            # pg_isready turns green once during initdb's temporary server; make sure it stays up.
+            time.sleep(1)
+            if subprocess.run(["docker", "exec", name, "pg_isready", "-U", "postgres"], capture_output=True).returncode == 0:
+                return
+        time.sleep(1)
+    raise RuntimeError("Postgres não ficou pronto em 60 s.")
+
+
+def _split_ddl() -> Tuple[str, str, str]:
+    """The schema before the measured section, the section itself and the rest of the file."""
+    text = DDL.read_text(encoding="utf-8")
+    position = text.index(MIGRATION_MARKER)
+    following = SECTION_HEADER.search(text, position + len(MIGRATION_MARKER))
+    end = following.start() if following else len(text)
+    # Plain Postgres has no ``create policy if not exists``; the schema is loaded into an empty database.
+    base = re.sub(r"create policy if not exists", "create policy", text[:position], flags=re.IGNORECASE)
+    return base, text[position:end], text[end:]
+
+
+def _explain(container: str, user_id: str, query: str) -> Dict[str, Any]:
+    sql = (
+        "begin;\n"
+        "set local role authenticated;\n"
+        f"set local request.jwt.claim.sub = '{user_id}';\n"
+        f"explain (analyze, buffers, format json) {query};\n"
+        "rollback;\n"
+    )
+    output = _psql(container, sql)
+    return json.loads(output[output.index("[") :])[0]
+
+
+def _nodes(plan: Dict[str, Any]) -> List[str]:
+    label = plan["Node Type"] + (f" on {plan['Relation Name']}" if "Relation Name" in plan else "")
+    if "Index Name" in plan:
+        label += f" using {plan['Index Name']}"
+    return [label] + [node for child in plan.get("Plans", []) for node in _nodes(child)]
+
+
+def _run_queries(container: str, user_id: str, ppg_id: str, repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, template in QUERIES.items():
+        query = template.format(ppg=ppg_id)
+        explains = [_explain(container, user_id, query) for _ in range(repeat)]
+        times = [explain["Execution Time"] / 1e3 for explain in explains]
+        results[name] = {
+            "median": statistics.median(times),
+            "min": min(times),
+            "repeat": repeat,
+            "shared_hit_blocks": explains[-1]["Plan"].get("Shared Hit Blocks"),
+            "plan": _nodes(explains[-1]["Plan"]),
+        }
+    return results
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    container = args.container or "ppg-bench-rls"
+    if not args.container:
+        _start(args.image, container)
+    try:
+        base, migration, rest = _split_ddl()
+        _psql(container, AUTH_STUB + base + GRANTS)
+        _psql(
+            container,
+            SEED.format(
+                users=args.users, ppgs=args.ppgs, rows=args.rows, projects=args.projects,
+                memberships_per_user=args.memberships_per_user,
+            ),
+        )
+        user_id, ppg_id = _psql(container, "select user_id, ppg_id from public.memberships order by user_id limit 1;").strip().split("|")
+        results: Dict[str, Any] = {}
+        for name, data in _run_queries(container, user_id, ppg_id, args.repeat).items():
+            results[f"before/{name}"] = data
+        _psql(container, migration + GRANTS + "analyze;")
+        for name, data in _run_queries(container, user_id, ppg_id, args.repeat).items():
+            results[f"after/{name}"] = data
+        _psql(container, rest + GRANTS)
+        return results
+    finally:
+        if not args.container and not args.keep:
+            subprocess.run(["docker", "stop", container], capture_output=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image", default="postgres:16")
+    parser.add_argument("--container", help="Usa um container Postgres já em execução (banco vazio)")
+    parser.add_argument("--keep", action="store_true", help="Não para o container ao terminar")
+    parser.add_argument("--ppgs", type=int, default=20)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--memberships-per-user", type=int, default=2)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=5000, help="Artigos por PPG (dissertações e PTTs: 1/5)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="Arquivo JSON de saída (padrão: benchmarks/results/rls-<commit>.json)")
+    parser.add_argument("--history", action="store_true", help="Mostra a evolução dos resultados salvos")
+    args = parser.parse_args(argv)
+    if args.history:
+        print_history(SUITE)
+        return
+    results = run(args)
+    print(f"{'consulta':<28}{'antes':>12}{'depois':>12}  plano (depois)")
+    for name in QUERIES:
+        before, after = results[f"before/{name}"], results[f"after/{name}"]
+        plan = ", ".join(node for node in after["plan"] if "Scan" in node)
+        print(f"{name:<28}{before['median'] * 1e3:10.2f}ms{after['median'] * 1e3:10.2f}ms  {plan}")
+    print(f"Resultados em {write_results(SUITE, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
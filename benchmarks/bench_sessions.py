@@ -0,0 +1,104 @@
+"""Several sessions writing to one shared store: wall time and consistency checks.
+
+Each session is a thread with its own ``st.session_state`` (``thread_sessions``)
+holding the same store object, so they share its locks and revision. Run from
+the repository root::
+
+    python -m benchmarks.bench_sessions --sessions 2 --writes 200
+    python -m benchmarks.bench_sessions --history
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import DATASET_SIZES, load_dataset, print_history, thread_sessions, write_results
+
+SUITE = "sessions"
+
+
+def _session(name: str, db: Dict[str, Any], writes: int, start: threading.Barrier, seen: Dict[str, Any]) -> None:
+    import streamlit as st
+
+    import demo_store
+    import ppg_datasets
+
+    st.session_state["db"] = db
+    st.session_state["ctx"] = {"ppg_id": "ppg1", "profile": "coordenador", "person_id": None}
+    ppg_datasets.list_articles("ppg1")  # partitions cached at the starting revision
+    start.wait()
+    for n in range(writes):
+        demo_store._upsert("articles", {"id": f"{name}-{n}", "ppg_id": "ppg1", "title": f"{name} {n}", "status": "planejado"})
+        ppg_datasets.list_articles("ppg1")
+    start.wait()  # every session finished writing
+    seen[name] = {"articles": len(ppg_datasets.list_articles("ppg1")), "revision": demo_store.store_revision()}
+
+
+def check_shared_store(db: Dict[str, Any], sessions: int, writes: int) -> float:
+    """Run ``sessions`` concurrent writers on ``db``; return the wall time and raise if they disagree."""
+    before = sum(1 for row in db["articles"] if row.get("ppg_id") == "ppg1")
+    start = threading.Barrier(sessions + 1)
+    seen: Dict[str, Any] = {}
+    errors: List[BaseException] = []
+
+    def target(name: str) -> None:
+        try:
+            _session(name, db, writes, start, seen)
+        except BaseException as exc:  # reported below, after the other sessions finish
+            errors.append(exc)
+            start.abort()
+
+    threads = [threading.Thread(target=target, args=(f"s{n}",)) for n in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    start.wait()
+    elapsed = time.perf_counter() - began
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    expected = before + sessions * writes
+    ids = [row["id"] for row in db["articles"]]
+    if len(ids) != len(set(ids)) or sum(1 for row in db["articles"] if row.get("ppg_id") == "ppg1") != expected:
+        raise AssertionError(f"Banco compartilhado inconsistente: esperado {expected} artigos em ppg1.")
+    if any(view["articles"] != expected for view in seen.values()):
+        raise AssertionError(f"Alguma sessão não viu as escritas das outras: {seen}")
+    if len({view["revision"] for view in seen.values()}) != 1:
+        raise AssertionError(f"As sessões leem revisões diferentes do mesmo banco: {seen}")
+    return elapsed
+
+
+def run(sizes: List[str], sessions: int, writes: int) -> Dict[str, Any]:
+    thread_sessions()
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        for count in sorted({1, sessions}):
+            db = load_dataset(size)
+            elapsed = check_shared_store(db, count, writes)
+            key = f"{size}/{count}_sessions_{writes}_writes"
+            results[key] = {"median": elapsed, "writes_per_s": count * writes / elapsed}
+            print(f"{key:<48}{elapsed * 1e3:10.3f}ms  {results[key]['writes_per_s']:10.0f} escritas/s")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small", help=f"Tamanhos: {', '.join(DATASET_SIZES)}")
+    parser.add_argument("--sessions", type=int, default=2)
+    parser.add_argument("--writes", type=int, default=200, help="Escritas por sessão")
+    parser.add_argument("-o", "--output", help="Arquivo JSON de saída (padrão: benchmarks/results/sessions-<commit>.json)")
+    parser.add_argument("--history", action="store_true", help="Mostra a evolução dos resultados salvos")
+    args = parser.parse_args(argv)
+    if args.history:
+        print_history(SUITE)
+        return
+    results = run([s for s in args.sizes.split(",") if s], args.sessions, args.writes)
+    print(f"Resultados salvos em {write_results(SUITE, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Shared helpers for the benchmark suites: headless session state, timing and JSON results."""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import MutableMapping
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Per-PPG counts handed to demo_generator.generate_demo_db for each dataset size.
+DATASET_SIZES: Dict[str, Dict[str, int]] = {
+    "small": {},
+    "medium": {"people": 200, "projects": 40, "dissertations": 300, "articles": 2000, "ptts": 600, "evaluations": 5000},
+    "large": {"people": 1000, "projects": 100, "dissertations": 2000, "articles": 20000, "ptts": 5000, "evaluations": 50000},
+}
+
+
+def headless_session() -> Dict[str, Any]:
+    """Replace ``st.session_state`` with a plain dict so the data layer runs without a Streamlit runtime."""
+    import streamlit as st
+
+    state: Dict[str, Any] = {}
+    st.session_state = state  # type: ignore[assignment]
+    return state
+
+
+class ThreadSessions(MutableMapping):
+    """``st.session_state`` stand-in where each thread sees its own dict, like one session per thread."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def _state(self) -> Dict[str, Any]:
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = {}
+        return state
+
+    def __getitem__(self, key: str) -> Any:
+        return self._state()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._state()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._state()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._state())
+
+    def __len__(self) -> int:
+        return len(self._state())
+
+
+def thread_sessions() -> ThreadSessions:
+    """Replace ``st.session_state`` so that every thread runs as a separate headless session."""
+    import streamlit as st
+
+    state = ThreadSessions()
+    st.session_state = state  # type: ignore[assignment]
+    return state
+
+
+def load_dataset(size: str, n_ppgs: int = 1, seed: int = 0) -> Dict[str, Any]:
+    """Install a generated dataset in the headless session and return it."""
+    from demo_generator import generate_demo_db
+
+    import streamlit as st
+
+    db = generate_demo_db(n_ppgs, seed=seed, **DATASET_SIZES[size])
+    st.session_state.clear()
+    st.session_state["db"] = db
+    st.session_state["ctx"] = {"ppg_id": "ppg1", "profile": "coordenador", "person_id": None}
+    return db
+
+
+def measure(
+    fn: Callable[[], Any],
+    *,
+    setup: Optional[Callable[[], Any]] = None,
+    repeat: int = 5,
+    number: Optional[int] = None,
+    budget: float = 0.2,
+) -> Dict[str, float]:
+    """Time ``fn`` and return per-call statistics in seconds.
+
+    Without ``setup`` the loop count is calibrated so each repeat takes about
+    ``budget`` seconds. With ``setup`` (run untimed before every call) each
+    repeat times a single call.
+    """
+    if setup is not None:
+        number = 1
+    elif number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= budget / 10 or number >= 1_000_000:
+                break
+            number *= 10
+    samples: List[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def write_results(suite: str, results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """Store ``results`` as ``results/<suite>-<commit>.json`` (or ``output``)."""
+    commit = _git_commit() or "nocommit"
+    payload = {
+        "suite": suite,
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    path = Path(output) if output else RESULTS_DIR / f"{suite}-{commit}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def load_history(suite: str) -> List[Dict[str, Any]]:
+    """Return stored runs of ``suite`` ordered by creation time."""
+    runs = [json.loads(p.read_text(encoding="utf-8")) for p in RESULTS_DIR.glob(f"{suite}-*.json")]
+    return sorted(runs, key=lambda run: run.get("created_at", ""))
+
+
+def print_history(suite: str, metric: str = "median") -> None:
+    """Print one line per case with ``metric`` across stored commits (oldest first)."""
+    runs = load_history(suite)
+    if not runs:
+        print(f"Nenhum resultado salvo para '{suite}'.")
+        return
+    print("case".ljust(48) + "".join(run["commit"].rjust(12) for run in runs))
+    cases = sorted({case for run in runs for case in run["results"]})
+    for case in cases:
+        cells = []
+        for run in runs:
+            value = run["results"].get(case, {}).get(metric)
+            cells.append(f"{value * 1e3:10.3f}ms" if isinstance(value, (int, float)) else " " * 12)
+        print(case.ljust(48) + "".join(cells))
+
+
+__all__ = [
+    "DATASET_SIZES",
+    "headless_session",
+    "thread_sessions",
+    "load_dataset",
+    "measure",
+    "write_results",
+    "load_history",
+    "print_history",
+]
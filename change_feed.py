@@ -0,0 +1,424 @@
+"""Process-wide row change feed with targeted reruns of the sessions watching a PPG.
+
+Every change is an event ``{"seq", "ppg_id", "table", "type", "record",
+"old_record", "source", "origin"}`` (``type`` is INSERT, UPDATE or DELETE). The
+feed keeps the last ``HISTORY`` events of each PPG and asks each session
+viewing that PPG (other than the writer) to rerun. A signed-in user's ``memberships`` rows, in any PPG, have a
+feed of their own (``user_feed``), watched by that user's sessions. Events
+come from two publishers:
+
+* ``origin="bus"``: the in-process stand-in, fed by ``demo_store`` writes, so
+  demo sessions of the same PPG share their edits;
+* ``origin="realtime"``: Supabase realtime (``start_realtime``), one channel per
+  PPG or user feed and process.
+
+The reruns go through Streamlit's private session API (``_request_rerun``), only
+on the releases it was checked against; elsewhere each watching session polls
+the feed from a fragment every ``POLL_INTERVAL`` seconds instead.
+
+Enabled by ``PPG_CHANGE_FEED=true`` (environment or secrets); off by default so
+each demo session keeps its own sandbox.
+"""
+from __future__ import annotations
+
+import base64
+import copy
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from demo_store import Change, _delete, _insert_many, _patch, get_by_id, register_write_listener
+from instrumentation import instrument_module
+from metrics import record_change_event
+
+ENV_FLAG = "PPG_CHANGE_FEED"
+HISTORY = int(os.environ.get("PPG_CHANGE_HISTORY", "1000"))
+REALTIME_TABLES = ("ppgs", "research_lines", "projects", "dissertations", "articles", "ptts", "evaluations")
+USER_FEED_PREFIX = "user:"
+# Server-side key for the realtime channels; without it they use the watching sessions' JWTs.
+SERVER_KEY_ENV = "SUPABASE_SERVICE_ROLE_KEY"
+DEAD_CHANNEL_STATES = ("CHANNEL_ERROR", "TIMED_OUT", "CLOSED")
+# Seconds between checks for a fresher token (and for sessions still watching).
+TOKEN_CHECK = float(os.environ.get("PPG_REALTIME_TOKEN_CHECK", "30"))
+# Seconds before a channel that died is started again.
+RETRY = float(os.environ.get("PPG_REALTIME_RETRY", "10"))
+POLL_INTERVAL = float(os.environ.get("PPG_CHANGE_POLL", "5"))
+# Streamlit releases (from, to) whose session internals ``_request_rerun`` relies on.
+PUSH_RERUN_VERSIONS = ((1, 30), (2, 0))
+
+_lock = threading.RLock()
+_seq = 0
+_events: Dict[str, Deque[Dict[str, Any]]] = {}
+# session_id -> PPG it is viewing.
+_watchers: Dict[str, str] = {}
+# session_id -> membership feed of its signed-in user.
+_user_watchers: Dict[str, str] = {}
+_realtime: Dict[str, threading.Thread] = {}
+_retry_at: Dict[str, float] = {}
+# session_id -> latest Supabase access token seen from it.
+_tokens: Dict[str, str] = {}
+_push_reruns: Optional[bool] = None
+
+
+def is_enabled() -> bool:
+    flag = os.environ.get(ENV_FLAG)
+    if flag is None and hasattr(st, "secrets"):
+        try:
+            if st.secrets.load_if_toml_exists():
+                flag = st.secrets.get(ENV_FLAG)  # type: ignore[attr-defined]
+        except Exception:
+            flag = None
+    return str(flag).lower() == "true"
+
+
+def current_session_id() -> Optional[str]:
+    """Id of the Streamlit session running this script (``None`` outside a session)."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def publish(
+    ppg_id: str,
+    table: str,
+    event_type: str,
+    record: Optional[Dict[str, Any]],
+    old_record: Optional[Dict[str, Any]] = None,
+    source: Optional[str] = None,
+    origin: str = "bus",
+) -> int:
+    """Record one row change and rerun the other sessions watching ``ppg_id``; returns its sequence number.
+
+    ``ppg_id`` names the feed: a PPG, or ``user_feed(user_id)`` for a user's memberships.
+    """
+    global _seq
+    with _lock:
+        _seq += 1
+        event = {
+            "seq": _seq,
+            "ppg_id": ppg_id,
+            "table": table,
+            "type": event_type,
+            "record": record,
+            "old_record": old_record,
+            "source": source,
+            "origin": origin,
+        }
+        _events.setdefault(ppg_id, deque(maxlen=HISTORY)).append(event)
+        targets = [session_id for session_id in _watching(ppg_id) if session_id != source]
+    reruns = 0
+    # Without push reruns the sessions find the event on their next poll.
+    for session_id in targets if push_reruns_available() else ():
+        if _request_rerun(session_id):
+            reruns += 1
+        else:
+            unwatch(session_id)
+    record_change_event(table, origin, reruns)
+    return event["seq"]
+
+
+def latest_seq() -> int:
+    return _seq
+
+
+def events_since(ppg_id: str, seq: int) -> List[Dict[str, Any]]:
+    with _lock:
+        return [event for event in _events.get(ppg_id, ()) if event["seq"] > seq]
+
+
+def user_feed(user_id: str) -> str:
+    return f"{USER_FEED_PREFIX}{user_id}"
+
+
+def watch(session_id: str, ppg_id: str, user_id: Optional[str] = None) -> None:
+    with _lock:
+        _watchers[session_id] = ppg_id
+        if user_id:
+            _user_watchers[session_id] = user_feed(user_id)
+        else:
+            _user_watchers.pop(session_id, None)
+
+
+def unwatch(session_id: str) -> None:
+    with _lock:
+        _watchers.pop(session_id, None)
+        _user_watchers.pop(session_id, None)
+        _tokens.pop(session_id, None)
+
+
+def _watching(feed: str) -> List[str]:
+    """Sessions watching ``feed`` (a PPG or a user feed)."""
+    watchers = _user_watchers if feed.startswith(USER_FEED_PREFIX) else _watchers
+    with _lock:
+        return [session_id for session_id, watched in watchers.items() if watched == feed]
+
+
+def _streamlit_version() -> Tuple[int, ...]:
+    parts = []
+    for part in st.__version__.split(".")[:2]:
+        digits = "".join(ch for ch in part if ch.isdigit())
+        parts.append(int(digits or 0))
+    return tuple(parts)
+
+
+def push_reruns_available() -> bool:
+    """Whether this Streamlit release has the session internals ``_request_rerun`` uses."""
+    global _push_reruns
+    if _push_reruns is None:
+        from streamlit.runtime.app_session import AppSession
+
+        low, high = PUSH_RERUN_VERSIONS
+        _push_reruns = low <= _streamlit_version() < high and callable(getattr(AppSession, "request_rerun", None))
+    return _push_reruns
+
+
+def _request_rerun(session_id: str) -> bool:
+    """Rerun a session on its current page with its current widget values.
+
+    Uses the same call Streamlit makes when a source file changes; returns False
+    when the session is gone (or there is no runtime, e.g. in tests). If the
+    private attributes it needs are missing, push reruns are switched off for
+    the process and the sessions fall back to polling.
+    """
+    global _push_reruns
+    from streamlit.runtime import Runtime
+
+    if not push_reruns_available() or not Runtime.exists():
+        return False
+    session_mgr = getattr(Runtime.instance(), "_session_mgr", None)
+    if session_mgr is None:
+        _push_reruns = False
+        return False
+    info = session_mgr.get_active_session_info(session_id)
+    if info is None:
+        return False
+    session = info.session
+    event_loop = getattr(session, "_event_loop", None)
+    if event_loop is None or not hasattr(session, "_client_state"):
+        _push_reruns = False
+        return False
+    event_loop.call_soon_threadsafe(session.request_rerun, session._client_state)
+    return True
+
+
+def _poll(feeds: List[str]) -> None:
+    """Rerun the app from a fragment when others changed the watched ``feeds`` (no push reruns)."""
+
+    @st.fragment(run_every=POLL_INTERVAL)
+    def poll() -> None:
+        position = st.session_state.get("_change_feed_position")
+        session_id = current_session_id()
+        if position is not None and position[0] == feeds[0]:
+            if any(event["source"] != session_id for feed in feeds for event in events_since(feed, position[1])):
+                st.rerun()
+
+    poll()
+
+
+# -- In-process bus: demo_store writes ------------------------------------
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    # Full reloads (seed, snapshot, JSON import) stay local to the session.
+    if collection is None or st.session_state.get("_applying_remote_changes") or not is_enabled():
+        return
+    source = current_session_id()
+    for before, after in changes:
+        row = after if after is not None else before
+        ppg_id = row.get("id") if collection == "ppgs" else row.get("ppg_id")
+        if not ppg_id:
+            continue
+        event_type = "INSERT" if before is None else "DELETE" if after is None else "UPDATE"
+        publish(ppg_id, collection, event_type, copy.deepcopy(after), copy.deepcopy(before), source=source)
+
+
+register_write_listener(_on_write)
+
+
+def apply_to_store(events: List[Dict[str, Any]]) -> None:
+    """Replay bus events written by other sessions into this session's ``demo_store``."""
+    st.session_state["_applying_remote_changes"] = True
+    try:
+        for event in events:
+            if event["origin"] != "bus":
+                continue
+            row = event["record"] or event["old_record"] or {}
+            existing = get_by_id(event["table"], row.get("id"))
+            if event["type"] == "DELETE":
+                if existing is not None:
+                    _delete(event["table"], row["id"])
+            elif existing is not None:
+                _patch(event["table"], existing, copy.deepcopy(event["record"]))
+            else:
+                _insert_many(event["table"], [copy.deepcopy(event["record"])])
+    finally:
+        st.session_state.pop("_applying_remote_changes", None)
+
+
+def sync_session(ppg_id: str, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Watch ``ppg_id`` (and the memberships of ``user_id``) from this session and
+    apply the events it has not seen yet.
+
+    The first call (and every PPG switch) only records the current position: the
+    session starts from its own data, not from the feed's history.
+    """
+    feeds = [ppg_id] + ([user_feed(user_id)] if user_id else [])
+    session_id = current_session_id()
+    if session_id is not None:
+        watch(session_id, ppg_id, user_id)
+        if not push_reruns_available():
+            _poll(feeds)
+    position = st.session_state.get("_change_feed_position")
+    st.session_state["_change_feed_position"] = (ppg_id, latest_seq())
+    if position is None or position[0] != ppg_id:
+        return []
+    events = sorted(
+        (event for feed in feeds for event in events_since(feed, position[1]) if event["source"] != session_id),
+        key=lambda event: event["seq"],
+    )
+    apply_to_store(events)
+    return events
+
+
+# -- Supabase realtime ----------------------------------------------------
+
+def _token_expiry(token: str) -> float:
+    """``exp`` claim of a JWT (not verified: only used to pick the freshest token)."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims.get("exp", 0))
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return 0.0
+
+
+def _server_key() -> Optional[str]:
+    return os.environ.get(SERVER_KEY_ENV) or None
+
+
+def realtime_token(feed: str) -> Optional[str]:
+    """Token the channel of ``feed`` should use: the server key, else the unexpired
+    access token with the latest expiry among the sessions watching the feed."""
+    server_key = _server_key()
+    if server_key:
+        return server_key
+    now = time.time()
+    watching = set(_watching(feed))
+    with _lock:
+        tokens = [token for session_id, token in _tokens.items() if session_id in watching and _token_expiry(token) > now]
+    return max(tokens, key=_token_expiry, default=None)
+
+
+def _subscriptions(feed: str) -> List[Tuple[str, str]]:
+    """``(table, filter)`` pairs of the channel of ``feed``."""
+    if feed.startswith(USER_FEED_PREFIX):
+        # Every PPG: a grant or revocation elsewhere changes the PPGs the user can switch to.
+        return [("memberships", f"user_id=eq.{feed[len(USER_FEED_PREFIX):]}")]
+    return [(table, f"{'id' if table == 'ppgs' else 'ppg_id'}=eq.{feed}") for table in REALTIME_TABLES]
+
+
+def _on_realtime(feed: str, payload: Dict[str, Any]) -> None:
+    data = payload.get("data", payload)
+    event_type = str(getattr(data.get("type"), "value", data.get("type")))
+    # Supabase does not filter DELETE events by column, so the feed comes from the channel.
+    publish(feed, data.get("table"), event_type, data.get("record"), data.get("old_record"), origin="realtime")
+
+
+def _run_realtime(feed: str, url: str, key: str) -> None:
+    import asyncio
+
+    from supabase import acreate_client
+
+    async def listen() -> bool:
+        """Listen until the channel dies (True) or no session watches the PPG (False)."""
+        client = await acreate_client(url, key)
+        token = realtime_token(feed)
+        if token:
+            await client.realtime.set_auth(token)
+        channel = client.channel(feed if feed.startswith(USER_FEED_PREFIX) else f"ppg:{feed}")
+        callback = functools.partial(_on_realtime, feed)
+        for table, row_filter in _subscriptions(feed):
+            channel.on_postgres_changes("*", callback, table=table, schema="public", filter=row_filter)
+        closed = asyncio.Event()
+
+        def on_state(state: Any, error: Optional[Exception] = None) -> None:
+            if str(getattr(state, "value", state)) in DEAD_CHANNEL_STATES:
+                closed.set()
+
+        await channel.subscribe(on_state)
+        try:
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=TOKEN_CHECK)
+                except asyncio.TimeoutError:
+                    pass
+                if not _watching(feed):
+                    break
+                fresh = realtime_token(feed)
+                if fresh and fresh != token:
+                    token = fresh
+                    await client.realtime.set_auth(token)
+        finally:
+            await client.realtime.remove_all_channels()
+        return closed.is_set()
+
+    failed = True
+    try:
+        failed = asyncio.run(listen())
+    finally:
+        with _lock:
+            _realtime.pop(feed, None)
+            if failed:
+                _retry_at[feed] = time.monotonic() + RETRY
+
+
+def start_realtime(feed: str, url: str, key: str, access_token: Optional[str] = None) -> None:
+    """Subscribe this process (once per feed) to the Postgres changes of ``feed``:
+    the tables of a PPG, or the ``memberships`` of a user (``user_feed``).
+
+    ``access_token`` is the calling session's JWT. The channel authenticates with
+    ``SUPABASE_SERVICE_ROLE_KEY`` when set, else with the freshest token of the
+    sessions watching the feed, re-applied (``set_auth``) as newer ones come in.
+    A channel that errors, times out or closes ends its thread, and the next
+    call after ``RETRY`` seconds starts a new one.
+    """
+    session_id = current_session_id()
+    with _lock:
+        if session_id is not None:
+            if access_token:
+                _tokens[session_id] = access_token
+            else:
+                _tokens.pop(session_id, None)
+        running = _realtime.get(feed)
+        if running is not None and running.is_alive():
+            return
+        if time.monotonic() < _retry_at.get(feed, 0.0) or realtime_token(feed) is None:
+            return
+        thread = threading.Thread(target=_run_realtime, args=(feed, url, key), name=f"realtime-{feed}", daemon=True)
+        _realtime[feed] = thread
+    thread.start()
+
+
+__all__ = [
+    "HISTORY",
+    "is_enabled",
+    "current_session_id",
+    "publish",
+    "latest_seq",
+    "events_since",
+    "user_feed",
+    "watch",
+    "unwatch",
+    "push_reruns_available",
+    "apply_to_store",
+    "sync_session",
+    "realtime_token",
+    "start_realtime",
+]
+
+instrument_module(globals())
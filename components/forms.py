@@ -1,46 +1,125 @@
 """Reusable Streamlit form helpers."""
 from __future__ import annotations
 
-from typing import Dict, Iterable
+from typing import Any, Dict, Iterable, Optional
 
 import streamlit as st
 
 from provider import (
+    VersionConflictError,
     create_evaluation,
     create_user_and_membership,
     upsert_article,
+    upsert_dissertation,
+    upsert_project,
     upsert_ptt,
     user_management_available,
 )
 
+PROJECT_STATUSES = ["Planejado", "Em execução", "Concluído"]
+ARTICLE_STATUSES = ["Em andamento", "Submetido", "Publicado"]
+PTT_STATUSES = ["Rascunho", "Em revisão", "Aprovado"]
 
-def article_form(ppg_id: str) -> None:
-    with st.form("article_form"):
-        st.subheader("Cadastrar artigo")
-        titulo = st.text_input("Título")
-        autores = st.text_input("Autores")
-        ano = st.number_input("Ano", min_value=2000, max_value=2100, value=2024)
-        status = st.selectbox("Status", ["Em andamento", "Submetido", "Publicado"])
+
+def _editing_updated_at(form_key: str, record: Optional[Dict[str, Any]], submitted: bool) -> Optional[str]:
+    """``updated_at`` of ``record`` when the form was rendered (see ``data.editing_version``)."""
+    if record is None:
+        return None
+    key = f"_editing_updated_at:{form_key}"
+    if not submitted:
+        st.session_state[key] = record.get("updated_at")
+        return st.session_state[key]
+    return st.session_state.pop(key, record.get("updated_at"))
+
+
+def _index(options: list, value: Any) -> int:
+    return options.index(value) if value in options else 0
+
+
+def project_form(ppg_id: str, project: Optional[Dict[str, Any]] = None) -> None:
+    """Create a project, or edit ``project`` unless someone else saved it in the meantime."""
+    record = project or {}
+    form_key = f"project_form_{record['id']}" if project else "project_form"
+    with st.form(form_key):
+        st.subheader("Editar projeto" if project else "Cadastrar projeto")
+        titulo = st.text_input("Título", value=record.get("titulo", ""))
+        lider = st.text_input("Líder", value=record.get("lider", ""))
+        status = st.selectbox("Status", PROJECT_STATUSES, index=_index(PROJECT_STATUSES, record.get("status")))
+        submitted = st.form_submit_button("Salvar projeto")
+    expected_updated_at = _editing_updated_at(form_key, project, submitted)
+    if submitted:
+        try:
+            upsert_project(ppg_id, titulo, lider, status, record.get("id"), expected_updated_at)
+            st.success("Projeto salvo com sucesso.")
+        except VersionConflictError as exc:
+            st.warning(str(exc))
+        except Exception as exc:
+            st.error(f"Erro ao salvar projeto: {exc}")
+
+
+def dissertation_form(ppg_id: str, dissertation: Optional[Dict[str, Any]] = None) -> None:
+    """Create a dissertation, or edit ``dissertation`` unless someone else saved it in the meantime."""
+    record = dissertation or {}
+    form_key = f"dissertation_form_{record['id']}" if dissertation else "dissertation_form"
+    with st.form(form_key):
+        st.subheader("Editar dissertação" if dissertation else "Cadastrar dissertação")
+        titulo = st.text_input("Título", value=record.get("titulo", ""))
+        autor = st.text_input("Autor", value=record.get("autor", ""))
+        orientador = st.text_input("Orientador", value=record.get("orientador", ""))
+        defesa_prevista = st.text_input("Defesa prevista", value=record.get("defesa_prevista", ""))
+        submitted = st.form_submit_button("Salvar dissertação")
+    expected_updated_at = _editing_updated_at(form_key, dissertation, submitted)
+    if submitted:
+        try:
+            upsert_dissertation(
+                ppg_id, titulo, autor, orientador, defesa_prevista, record.get("id"), expected_updated_at
+            )
+            st.success("Dissertação salva com sucesso.")
+        except VersionConflictError as exc:
+            st.warning(str(exc))
+        except Exception as exc:
+            st.error(f"Erro ao salvar dissertação: {exc}")
+
+
+def article_form(ppg_id: str, article: Optional[Dict[str, Any]] = None) -> None:
+    """Create an article, or edit ``article`` unless someone else saved it in the meantime."""
+    record = article or {}
+    form_key = f"article_form_{record['id']}" if article else "article_form"
+    with st.form(form_key):
+        st.subheader("Editar artigo" if article else "Cadastrar artigo")
+        titulo = st.text_input("Título", value=record.get("titulo", ""))
+        autores = st.text_input("Autores", value=record.get("autores", ""))
+        ano = st.number_input("Ano", min_value=2000, max_value=2100, value=int(record.get("ano") or 2024))
+        status = st.selectbox("Status", ARTICLE_STATUSES, index=_index(ARTICLE_STATUSES, record.get("status")))
         submitted = st.form_submit_button("Salvar artigo")
+    expected_updated_at = _editing_updated_at(form_key, article, submitted)
     if submitted:
         try:
-            upsert_article(ppg_id, titulo, autores, int(ano), status)
+            upsert_article(ppg_id, titulo, autores, int(ano), status, record.get("id"), expected_updated_at)
             st.success("Artigo salvo com sucesso.")
+        except VersionConflictError as exc:
+            st.warning(str(exc))
         except Exception as exc:
             st.error(f"Erro ao salvar artigo: {exc}")
 
 
-def ptt_form(ppg_id: str) -> None:
-    with st.form("ptt_form"):
-        st.subheader("Cadastrar PTT")
-        tema = st.text_input("Tema")
-        responsavel = st.text_input("Responsável")
-        status = st.selectbox("Status", ["Rascunho", "Em revisão", "Aprovado"])
+def ptt_form(ppg_id: str, ptt: Optional[Dict[str, Any]] = None) -> None:
+    """Create a PTT, or edit ``ptt`` unless someone else saved it in the meantime."""
+    record = ptt or {}
+    form_key = f"ptt_form_{record['id']}" if ptt else "ptt_form"
+    with st.form(form_key):
+        st.subheader("Editar PTT" if ptt else "Cadastrar PTT")
+        tema = st.text_input("Tema", value=record.get("tema", ""))
+        responsavel = st.text_input("Responsável", value=record.get("responsavel", ""))
+        status = st.selectbox("Status", PTT_STATUSES, index=_index(PTT_STATUSES, record.get("status")))
         submitted = st.form_submit_button("Salvar PTT")
+    expected_updated_at = _editing_updated_at(form_key, ptt, submitted)
     if submitted:
         try:
-            upsert_ptt(ppg_id, tema, responsavel, status)
+            upsert_ptt(ppg_id, tema, responsavel, status, record.get("id"), expected_updated_at)
             st.success("PTT salvo com sucesso.")
+        except VersionConflictError as exc:
+            st.warning(str(exc))
         except Exception as exc:
             st.error(f"Erro ao salvar PTT: {exc}")
 
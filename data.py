@@ -2,18 +2,37 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from demo_seed import ensure_demo_db
-
-ensure_demo_db()
+import streamlit as st
 
 from demo_context import current_ppg
+from evaluation_timeline import recent_evaluations, target_history, target_stats
+from form_versions import RESPONSE_SCORERS, compiled_form, register_form_version
+from instrumentation import instrument_module
+from metrics import record_cache
+from paging import Cursor, page_cursor
+from ppg_datasets import (
+    list_articles,
+    list_dissertations,
+    list_evaluations,
+    list_lines,
+    list_people,
+    list_projects,
+    list_ptts,
+    ppg_count,
+)
+from reports import production_report, project_rows
+from store_locks import write_lock
 
 from demo_store import (
+    VersionConflictError,
+    _collection,
     _delete,
+    _patch,
     _upsert,
     add_evaluation,
+    add_evaluations,
     articles_by_dissertation,
     articles_by_project,
     export_db_json,
@@ -21,41 +40,54 @@ from demo_store import (
     get_by_id,
     get_db,
     import_db_json,
-    list_articles,
-    list_dissertations,
-    list_lines,
-    list_people,
-    list_projects,
-    list_ptts,
-    list_evaluations,
     mestrandos_by_orientador,
     next_id,
     orientadores_by_line,
     ptts_by_dissertation,
     ptts_by_project,
     reset_db,
+    row_version,
+    save_evaluation_form,
     stats_evaluations,
+    store_revision,
     upsert_evaluation,
 )
 
 
 def list_ppgs() -> List[Dict[str, Any]]:
-    return get_db().get("ppgs", [])
+    return _collection("ppgs")
 
 
 def update_ppg(ppg_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    db = get_db()
-    for row in db.get("ppgs", []):
+    """Update a PPG; a ``version`` in ``payload`` makes it conditional (``VersionConflictError``)."""
+    expected_version = payload.pop("version", None)
+    for row in _collection("ppgs"):
         if row.get("id") == ppg_id:
-            row.update(payload)
-            return row
+            return _patch("ppgs", row, payload, expected_version)
     raise ValueError("PPG não encontrado")
 
 
+def editing_version(form_key: str, row: Dict[str, Any], submitted: bool) -> int:
+    """Version of ``row`` shown when the form ``form_key`` was last rendered.
+
+    Called after the form's submit button: a plain render remembers the current
+    version, while a submit returns the remembered one, so that a change made by
+    someone else in between (e.g. applied by the change feed at the top of the
+    rerun) is caught as a conflict instead of being overwritten.
+    """
+    key = f"_editing_version:{form_key}"
+    if not submitted:
+        st.session_state[key] = row_version(row)
+        return st.session_state[key]
+    return st.session_state.pop(key, row_version(row))
+
+
 # Research lines
 
-def list_research_lines(ppg_id: str) -> List[Dict[str, Any]]:
-    return list_lines(ppg_id)
+def list_research_lines(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    return list_lines(ppg_id, fields, after, limit)
 
 
 def add_research_line(ppg_id: str, name: str, description: str) -> Dict[str, Any]:
@@ -124,24 +156,26 @@ def update_project(project_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def delete_project(project_id: str) -> None:
-    _delete("projects", project_id)
-    # remove links from articles/dissertations/ptts
-    for collection in ["articles", "dissertations", "ptts"]:
-        for row in get_db().get(collection, []):
-            if row.get("project_id") == project_id:
-                row["project_id"] = None
+    # Link syncs take every collection they touch up front (see ``store_locks``).
+    with write_lock("projects", "articles", "dissertations", "ptts"):
+        _delete("projects", project_id)
+        # remove links from articles/dissertations/ptts
+        for collection in ["articles", "dissertations", "ptts"]:
+            for row in _collection(collection):
+                if row.get("project_id") == project_id:
+                    _patch(collection, row, {"project_id": None})
 
 
 def set_project_orientadores(project_id: str, orientadores: List[str]) -> None:
     project = get_by_id("projects", project_id)
     if project is not None:
-        project["orientadores_ids"] = orientadores
+        _patch("projects", project, {"orientadores_ids": orientadores})
 
 
 def set_project_mestrandos(project_id: str, mestrandos: List[str]) -> None:
     project = get_by_id("projects", project_id)
     if project is not None:
-        project["mestrandos_ids"] = mestrandos
+        _patch("projects", project, {"mestrandos_ids": mestrandos})
 
 
 def list_project_dissertations(project_id: str) -> List[Dict[str, Any]]:
@@ -156,16 +190,38 @@ def list_project_ptts(project_id: str) -> List[Dict[str, Any]]:
     return ptts_by_project(project_id)
 
 
+def ppg_overview(ppg_id: str) -> Dict[str, Any]:
+    """Top metrics and per-project production of the Visão Geral page.
+
+    The production counts come from the PPG's production report, which groups
+    them by project and is kept current by deltas on every write. The result
+    is cached per store revision, so a rerun without writes does no work and
+    one after a write only reads the report again.
+    """
+    cache = st.session_state.setdefault("_ppg_overview", {})
+    revision = store_revision()
+    entry = cache.get(ppg_id)
+    hit = entry is not None and entry[0] == revision
+    record_cache("ppg_overview", hit)
+    if not hit:
+        report = production_report(ppg_id)
+        metrics = {collection: ppg_count(collection, ppg_id) for collection in ("people", "research_lines", "projects")}
+        metrics.update(report["totals"])
+        entry = (revision, {"metrics": metrics, "projects": project_rows(report, list_projects(ppg_id))})
+        cache[ppg_id] = entry
+    return entry[1]
+
+
 def get_project_orientadores(project_id: str) -> List[Dict[str, Any]]:
     proj = get_by_id("projects", project_id) or {}
     ids = proj.get("orientadores_ids", [])
-    return [p for p in get_db().get("people", []) if p.get("id") in ids]
+    return [p for p in _collection("people") if p.get("id") in ids]
 
 
 def get_project_mestrandos(project_id: str) -> List[Dict[str, Any]]:
     proj = get_by_id("projects", project_id) or {}
     ids = proj.get("mestrandos_ids", [])
-    return [p for p in get_db().get("people", []) if p.get("id") in ids]
+    return [p for p in _collection("people") if p.get("id") in ids]
 
 
 # Dissertations
@@ -173,35 +229,37 @@ def get_project_mestrandos(project_id: str) -> List[Dict[str, Any]]:
 def upsert_dissertation(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not payload.get("id"):
         payload["id"] = next_id("diss")
-    diss = _upsert("dissertations", payload)
-    _sync_dissertation_links(diss)
+    with write_lock("dissertations", "articles", "ptts"):
+        diss = _upsert("dissertations", payload)
+        _sync_dissertation_links(diss)
     return diss
 
 
 def delete_dissertation(dissertation_id: str) -> None:
-    _delete("dissertations", dissertation_id)
-    for article in get_db().get("articles", []):
-        if article.get("dissertation_id") == dissertation_id:
-            article["dissertation_id"] = None
-    for ptt in get_db().get("ptts", []):
-        if ptt.get("dissertation_id") == dissertation_id:
-            ptt["dissertation_id"] = None
+    with write_lock("dissertations", "articles", "ptts"):
+        _delete("dissertations", dissertation_id)
+        for article in _collection("articles"):
+            if article.get("dissertation_id") == dissertation_id:
+                _patch("articles", article, {"dissertation_id": None})
+        for ptt in _collection("ptts"):
+            if ptt.get("dissertation_id") == dissertation_id:
+                _patch("ptts", ptt, {"dissertation_id": None})
 
 
 def _sync_dissertation_links(dissertation: Dict[str, Any]) -> None:
     diss_id = dissertation.get("id")
     desired_articles = set(dissertation.get("artigos_ids", []))
     desired_ptts = set(dissertation.get("ptts_ids", []))
-    for article in get_db().get("articles", []):
+    for article in _collection("articles"):
         if article.get("dissertation_id") == diss_id and article.get("id") not in desired_articles:
-            article["dissertation_id"] = None
-        if article.get("id") in desired_articles:
-            article["dissertation_id"] = diss_id
-    for ptt in get_db().get("ptts", []):
+            _patch("articles", article, {"dissertation_id": None})
+        if article.get("id") in desired_articles and article.get("dissertation_id") != diss_id:
+            _patch("articles", article, {"dissertation_id": diss_id})
+    for ptt in _collection("ptts"):
         if ptt.get("dissertation_id") == diss_id and ptt.get("id") not in desired_ptts:
-            ptt["dissertation_id"] = None
-        if ptt.get("id") in desired_ptts:
-            ptt["dissertation_id"] = diss_id
+            _patch("ptts", ptt, {"dissertation_id": None})
+        if ptt.get("id") in desired_ptts and ptt.get("dissertation_id") != diss_id:
+            _patch("ptts", ptt, {"dissertation_id": diss_id})
 
 
 # Articles
@@ -210,8 +268,9 @@ def upsert_article(payload: Dict[str, Any]) -> Dict[str, Any]:
     is_new = not payload.get("id")
     if is_new:
         payload["id"] = next_id("art")
-    article = _upsert("articles", payload)
-    _maybe_attach_to_dissertation(article)
+    with write_lock("articles", "dissertations"):
+        article = _upsert("articles", payload)
+        _maybe_attach_to_dissertation(article)
     return article
 
 
@@ -222,10 +281,10 @@ def _maybe_attach_to_dissertation(article: Dict[str, Any]) -> None:
         if diss:
             ids = set(diss.get("artigos_ids", []))
             ids.add(article["id"])
-            diss["artigos_ids"] = list(ids)
-    for diss in get_db().get("dissertations", []):
+            _patch("dissertations", diss, {"artigos_ids": list(ids)})
+    for diss in _collection("dissertations"):
         if diss.get("id") != diss_id and article.get("id") in diss.get("artigos_ids", []):
-            diss["artigos_ids"] = [aid for aid in diss.get("artigos_ids", []) if aid != article.get("id")]
+            _patch("dissertations", diss, {"artigos_ids": [aid for aid in diss.get("artigos_ids", []) if aid != article.get("id")]})
 
 
 # PTTs
@@ -233,8 +292,9 @@ def _maybe_attach_to_dissertation(article: Dict[str, Any]) -> None:
 def upsert_ptt(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not payload.get("id"):
         payload["id"] = next_id("ptt")
-    ptt = _upsert("ptts", payload)
-    _maybe_attach_ptt_to_dissertation(ptt)
+    with write_lock("ptts", "dissertations"):
+        ptt = _upsert("ptts", payload)
+        _maybe_attach_ptt_to_dissertation(ptt)
     return ptt
 
 
@@ -245,10 +305,10 @@ def _maybe_attach_ptt_to_dissertation(ptt: Dict[str, Any]) -> None:
         if diss:
             ids = set(diss.get("ptts_ids", []))
             ids.add(ptt["id"])
-            diss["ptts_ids"] = list(ids)
-    for diss in get_db().get("dissertations", []):
+            _patch("dissertations", diss, {"ptts_ids": list(ids)})
+    for diss in _collection("dissertations"):
         if diss.get("id") != diss_id and ptt.get("id") in diss.get("ptts_ids", []):
-            diss["ptts_ids"] = [pid for pid in diss.get("ptts_ids", []) if pid != ptt.get("id")]
+            _patch("dissertations", diss, {"ptts_ids": [pid for pid in diss.get("ptts_ids", []) if pid != ptt.get("id")]})
 
 
 # Evaluation forms and evaluations
@@ -262,12 +322,7 @@ def get_admin_form(form_key: str) -> Dict[str, Any]:
 
 
 def _score_value(raw_value: Any, response_type: str) -> float:
-    if response_type == "yes_no":
-        return 5.0 if bool(raw_value) else 0.0
-    try:
-        return float(raw_value)
-    except (TypeError, ValueError):
-        return 0.0
+    return RESPONSE_SCORERS.get(response_type, RESPONSE_SCORERS["scale_1_5"])(raw_value)
 
 
 def calculate_weighted_score(form: Dict[str, Any], scores: Dict[str, Any]) -> float:
@@ -282,13 +337,16 @@ def calculate_weighted_score(form: Dict[str, Any], scores: Dict[str, Any]) -> fl
 def add_evaluation_record(payload: Dict[str, Any]) -> Dict[str, Any]:
     ppg_id = payload.get("ppg_id") or current_ppg() or ""
     form_type = payload.get("form_type") or payload.get("form_key")
-    form = get_admin_form(form_type or "")
+    # Score with the compiled form version and keep its id, so the score stays
+    # reproducible after the form is edited.
+    form_version = payload.get("form_version") or register_form_version(form_type or "")
     scores = payload.get("scores", {})
-    computed_score = calculate_weighted_score(form, scores) if form else payload.get("final_score", 0)
+    computed_score = compiled_form(form_version).score(scores) if form_version else payload.get("final_score", 0)
     body = {
         **payload,
         "ppg_id": ppg_id,
         "form_type": form_type,
+        "form_version": form_version,
         "final_score": computed_score,
         "created_at": payload.get("created_at") or datetime.utcnow().isoformat(),
     }
@@ -297,16 +355,100 @@ def add_evaluation_record(payload: Dict[str, Any]) -> Dict[str, Any]:
     return add_evaluation(body)
 
 
+def _batch_scores(compiled: Any, rows: List[Dict[str, Any]]) -> Tuple[List[Optional[float]], List[List[str]]]:
+    """Validate and weight a batch of ``scores`` dicts column by column.
+
+    Returns the final score of each row (``None`` when invalid) and, per row, the
+    criteria with a missing or out-of-range answer.
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(rows, columns=list(compiled.criterion_ids))
+    values = pd.DataFrame(index=frame.index)
+    invalid = pd.DataFrame(index=frame.index)
+    for criterion, response_type in zip(compiled.criterion_ids, compiled.response_types):
+        column = frame[criterion]
+        if response_type == "yes_no":
+            ok = column.notna() & column.isin([True, False])
+            values[criterion] = np.where(ok & column.eq(True), 5.0, 0.0)
+        else:
+            numeric = pd.to_numeric(column, errors="coerce")
+            ok = numeric.between(1, 5) & (numeric % 1 == 0)
+            values[criterion] = numeric.fillna(0.0)
+        invalid[criterion] = ~ok
+    weighted = (values.to_numpy(dtype=float) @ np.asarray(compiled.weights, dtype=float)).round(2)
+    bad = invalid.to_numpy()
+    criteria = np.asarray(compiled.criterion_ids, dtype=object)
+    errors = [list(criteria[row]) for row in bad]
+    return [None if row_errors else float(score) for score, row_errors in zip(weighted, errors)], errors
+
+
+def add_evaluation_records(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate, score and save many evaluations (a committee's batch) in a single write.
+
+    Every payload needs ``target_type``/``target_id`` of the PPG, ``form_type`` and a
+    complete ``scores`` dict. Nothing is saved if any row is invalid.
+    """
+    now = datetime.utcnow().isoformat()
+    bodies = [
+        {
+            **payload,
+            "ppg_id": payload.get("ppg_id") or current_ppg() or "",
+            "form_type": payload.get("form_type") or payload.get("form_key"),
+            "created_at": payload.get("created_at") or now,
+        }
+        for payload in payloads
+    ]
+    problems: Dict[int, List[str]] = {}
+    targets: Dict[Tuple[str, str], set] = {}
+    for position, body in enumerate(bodies):
+        key = (body["ppg_id"], body.get("target_type"))
+        if key not in targets:
+            rows = {"article": list_articles, "ptt": list_ptts}.get(body.get("target_type"))
+            targets[key] = {row["id"] for row in rows(body["ppg_id"])} if rows else set()
+        if body.get("target_id") not in targets[key]:
+            problems.setdefault(position, []).append("produção inexistente neste PPG")
+    by_form: Dict[str, List[int]] = {}
+    for position, body in enumerate(bodies):
+        by_form.setdefault(body["form_type"] or "", []).append(position)
+    for form_type, positions in by_form.items():
+        version = register_form_version(form_type)
+        if not version:
+            for position in positions:
+                problems.setdefault(position, []).append(f"ficha desconhecida ({form_type or '—'})")
+            continue
+        compiled = compiled_form(version)
+        names = {c.get("id"): c.get("name", c.get("id")) for c in get_admin_form(form_type).get("criteria", [])}
+        scores, errors = _batch_scores(compiled, [bodies[position].get("scores") or {} for position in positions])
+        for position, score, row_errors in zip(positions, scores, errors):
+            bodies[position].update({"form_version": version, "final_score": score})
+            if row_errors:
+                problems.setdefault(position, []).append("nota inválida em " + ", ".join(names.get(c, c) for c in row_errors))
+    if problems:
+        details = "; ".join(f"linha {position + 1}: {', '.join(items)}" for position, items in sorted(problems.items())[:10])
+        raise ValueError(f"{len(problems)} avaliação(ões) inválida(s) — {details}")
+    for body in bodies:
+        if body.get("comments") and not body.get("notes"):
+            body["notes"] = body["comments"]
+    return add_evaluations(bodies)
+
+
 def list_ppg_evaluations(ppg_id: str, target_type: Optional[str] = None) -> List[Dict[str, Any]]:
     return list_evaluations(target_type=target_type, ppg_id=ppg_id)
 
 
 def list_target_evaluations(target_type: str, target_id: str) -> List[Dict[str, Any]]:
-    return list_evaluations(target_type=target_type, target_id=target_id, ppg_id=current_ppg())
+    """Evaluations of one article or PTT of the current PPG, newest first."""
+    return target_history(target_type, target_id, current_ppg())
 
 
 def evaluation_stats(target_type: str, target_id: str) -> tuple[int, Optional[float], Optional[float], Optional[str]]:
-    return stats_evaluations(target_type=target_type, target_id=target_id, ppg_id=current_ppg())
+    return target_stats(target_type, target_id, current_ppg())
+
+
+def list_recent_evaluations(limit: int = 10) -> List[Dict[str, Any]]:
+    return recent_evaluations(current_ppg(), limit)
 
 
 def save_evaluation(
@@ -331,3 +473,5 @@ def save_evaluation(
 
 
 __all__ = [name for name in globals() if not name.startswith("_")]
+
+instrument_module(globals())
@@ -137,6 +137,121 @@ alter table public.articles add column if not exists project_id uuid references
 alter table public.articles add column if not exists orientador_user_id uuid references auth.users(id);
 alter table public.articles add column if not exists mestrando_user_id uuid references auth.users(id);
 
+-- Evaluations ----------------------------------------------------------------
+-- ``scores`` keeps the answers as entered ({criterion_id: value}); the trigger
+-- below mirrors them into evaluation_scores, one row per criterion, so
+-- criterion-level queries read an indexed table instead of unpacking jsonb.
+create table if not exists public.evaluations (
+    id uuid primary key default gen_random_uuid(),
+    ppg_id uuid not null references public.ppgs(id) on delete cascade,
+    target_type text not null check (target_type in ('article','ptt')),
+    target_id uuid not null,
+    evaluator_id uuid references auth.users(id),
+    form_type text not null,
+    scores jsonb not null default '{}'::jsonb,
+    final_score numeric,
+    notes text,
+    created_at timestamptz default now()
+);
+
+create table if not exists public.evaluation_scores (
+    evaluation_id uuid not null references public.evaluations(id) on delete cascade,
+    criterion_id text not null,
+    ppg_id uuid not null references public.ppgs(id) on delete cascade,
+    form_type text not null,
+    target_type text not null,
+    target_id uuid not null,
+    evaluator_id uuid,
+    score numeric,
+    primary key (evaluation_id, criterion_id)
+);
+
+create index if not exists evaluation_scores_form_criterion_idx
+    on public.evaluation_scores (ppg_id, form_type, criterion_id) include (score);
+create index if not exists evaluation_scores_target_idx
+    on public.evaluation_scores (target_type, target_id);
+
+-- Runs as owner: members can only read evaluation_scores, so the rows always
+-- match evaluations.scores.
+create or replace function public.sync_evaluation_scores()
+returns trigger
+security definer
+set search_path = public
+language plpgsql
+as $$
+begin
+  delete from public.evaluation_scores where evaluation_id = new.id;
+  insert into public.evaluation_scores
+    (evaluation_id, criterion_id, ppg_id, form_type, target_type, target_id, evaluator_id, score)
+  select new.id, s.key, new.ppg_id, new.form_type, new.target_type, new.target_id, new.evaluator_id,
+         case jsonb_typeof(s.value)
+           when 'boolean' then case when s.value::boolean then 5 else 0 end  -- yes/no counts as 5/0
+           when 'number' then s.value::numeric
+         end
+  from jsonb_each(new.scores) s;
+  return new;
+end;
+$$;
+
+drop trigger if exists evaluations_sync_scores on public.evaluations;
+create trigger evaluations_sync_scores
+  after insert or update of scores, form_type, target_type, target_id, evaluator_id, ppg_id on public.evaluations
+  for each row execute function public.sync_evaluation_scores();
+
+-- Keyset pagination ---------------------------------------------------------
+-- Lists of one PPG ordered by (created_at, id) read the composite index, and
+-- "after the last row seen" becomes an index seek instead of an offset scan.
+-- provider.py pages the data module's tables (linhas_pesquisa, projetos, ...),
+-- which get the same index where they exist.
+do $$
+declare
+  t text;
+begin
+  foreach t in array array[
+    'research_lines', 'projects', 'dissertations', 'articles', 'ptts', 'evaluations',
+    'linhas_pesquisa', 'projetos', 'dissertacoes', 'artigos', 'avaliacoes'
+  ] loop
+    continue when to_regclass(format('public.%I', t)) is null;
+    execute format('create index if not exists %I on public.%I (ppg_id, created_at, id)', t || '_ppg_created_idx', t);
+  end loop;
+end$$;
+
+-- Row versions (optimistic concurrency) ------------------------------------
+-- Every update bumps ``version`` and ``updated_at``. Editors send the
+-- ``updated_at`` they read as a filter (update ... where id = $1 and
+-- updated_at = $2); zero rows updated means someone else saved first.
+-- provider.py saves through the data module's tables (projetos, dissertacoes,
+-- artigos, ptts), which get the same columns and trigger where they exist.
+create or replace function public.bump_row_version()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.version := old.version + 1;
+  new.updated_at := clock_timestamp();
+  return new;
+end;
+$$;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array[
+    'ppgs', 'research_lines', 'projects', 'dissertations', 'articles', 'ptts', 'evaluations',
+    'projetos', 'dissertacoes', 'artigos'
+  ] loop
+    continue when to_regclass(format('public.%I', t)) is null;
+    execute format('alter table public.%I add column if not exists version integer not null default 1', t);
+    execute format('alter table public.%I add column if not exists updated_at timestamptz not null default now()', t);
+    execute format('drop trigger if exists %I on public.%I', t || '_bump_version', t);
+    execute format(
+      'create trigger %I before update on public.%I for each row execute function public.bump_row_version()',
+      t || '_bump_version', t
+    );
+  end loop;
+end$$;
+
 -- Profiles (mirror of auth.users for safe UI display)
 create table if not exists public.profiles (
     user_id uuid primary key references auth.users(id) on delete cascade,
@@ -163,37 +278,116 @@ create trigger on_auth_user_created
   after insert on auth.users
   for each row execute function public.handle_new_user();
 
+-- Role cache ------------------------------------------------------------------
+-- One row per user with ``{ppg_id: role}`` for every PPG they belong to, kept
+-- in sync by a trigger on memberships. The RLS helpers answer from this row
+-- (a primary-key lookup per statement), the same per-user role map the app
+-- caches in its session at login.
+
+create table if not exists public.member_roles (
+    user_id uuid primary key,
+    roles jsonb not null default '{}'::jsonb,
+    updated_at timestamptz default now()
+);
+
+alter table public.member_roles enable row level security;
+
+drop policy if exists member_roles_select_self on public.member_roles;
+create policy member_roles_select_self on public.member_roles
+for select using ((select auth.uid()) = user_id);
+
+create or replace function public.refresh_member_roles(target_user uuid)
+returns void
+security definer
+set search_path = public
+language plpgsql
+as $$
+begin
+  if exists (select 1 from public.memberships where user_id = target_user) then
+    insert into public.member_roles (user_id, roles, updated_at)
+    select target_user, jsonb_object_agg(m.ppg_id::text, m.role), now()
+    from public.memberships m
+    where m.user_id = target_user
+    on conflict (user_id) do update set roles = excluded.roles, updated_at = excluded.updated_at;
+  else
+    -- No FK to auth.users: this also runs while a user's memberships cascade away.
+    delete from public.member_roles where user_id = target_user;
+  end if;
+end;
+$$;
+
+create or replace function public.sync_member_roles()
+returns trigger
+security definer
+set search_path = public
+language plpgsql
+as $$
+begin
+  if tg_op <> 'INSERT' then
+    perform public.refresh_member_roles(old.user_id);
+  end if;
+  if tg_op = 'INSERT' or (tg_op = 'UPDATE' and new.user_id is distinct from old.user_id) then
+    perform public.refresh_member_roles(new.user_id);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists memberships_sync_member_roles on public.memberships;
+create trigger memberships_sync_member_roles
+  after insert or update or delete on public.memberships
+  for each row execute function public.sync_member_roles();
+
+select public.refresh_member_roles(u.user_id) from (select distinct user_id from public.memberships) u;
+
 -- Helper functions for RLS --------------------------------------------------
+-- Each is defined once, here. They answer from the caller's ``member_roles``
+-- row (one primary-key lookup per statement) and run as owner, so they never
+-- re-enter the memberships policies. ``member_ppg_ids()`` lists the caller's
+-- PPGs, optionally only those with some roles.
+create or replace function public.user_role(target_ppg uuid)
+returns public.member_role_v2
+stable
+security definer
+set search_path = public
+language sql
+as $$
+  select (r.roles ->> target_ppg::text)::public.member_role_v2
+  from public.member_roles r
+  where r.user_id = (select auth.uid());
+$$;
+
 create or replace function public.is_member(target_ppg uuid)
 returns boolean
+stable
 security definer
+set search_path = public
 language sql
 as $$
-  select exists(
-    select 1 from public.memberships m
-    where m.ppg_id = target_ppg and m.user_id = auth.uid()
-  );
+  select public.user_role(target_ppg) is not null;
 $$;
 
 create or replace function public.is_coordinator(target_ppg uuid)
 returns boolean
+stable
 security definer
+set search_path = public
 language sql
 as $$
-  select exists(
-    select 1 from public.memberships m
-    where m.ppg_id = target_ppg and m.user_id = auth.uid() and m.role = 'coordenador'
-  );
+  select public.user_role(target_ppg) is not distinct from 'coordenador';
 $$;
 
-create or replace function public.user_role(target_ppg uuid)
-returns public.member_role_v2
+create or replace function public.member_ppg_ids(roles public.member_role_v2[] default null)
+returns setof uuid
+stable
 security definer
+set search_path = public
 language sql
 as $$
-  select role from public.memberships
-  where ppg_id = target_ppg and user_id = auth.uid()
-  limit 1;
+  select e.key::uuid
+  from public.member_roles r, jsonb_each_text(r.roles) e
+  where r.user_id = (select auth.uid())
+    and (member_ppg_ids.roles is null or e.value::public.member_role_v2 = any (member_ppg_ids.roles));
 $$;
 
 create or replace function public.is_project_member(target_project uuid)
@@ -246,6 +440,8 @@ alter table public.articles enable row level security;
 alter table public.dissertations enable row level security;
 alter table public.ptts enable row level security;
 alter table public.profiles enable row level security;
+alter table public.evaluations enable row level security;
+alter table public.evaluation_scores enable row level security;
 
 -- Policies -----------------------------------------------------------------
 create policy if not exists ppg_select on public.ppgs
@@ -372,3 +568,125 @@ for select using (
       and m_other.user_id = profiles.user_id
   )
 );
+
+create policy if not exists evaluations_select on public.evaluations
+for select using (is_member(ppg_id));
+
+create policy if not exists evaluations_insert on public.evaluations
+for insert with check (is_member(ppg_id) and evaluator_id = auth.uid());
+
+create policy if not exists evaluations_update on public.evaluations
+for update using (is_member(ppg_id) and evaluator_id = auth.uid());
+
+-- Read-only for members; only the security-definer sync trigger writes it.
+create policy if not exists evaluation_scores_select on public.evaluation_scores
+for select using (is_member(ppg_id));
+
+drop policy if exists evaluation_scores_write on public.evaluation_scores;
+
+-- RLS performance -------------------------------------------------------------
+-- Policies run once per candidate row, so every predicate they use needs an
+-- index, and membership is resolved once per statement: the read policies
+-- below call ``ppg_id in (select public.member_ppg_ids())``, which Postgres
+-- plans as a hashed InitPlan instead of calling ``is_member`` per row. This
+-- section only adds indexes and rewrites policies (the helpers above stay as
+-- they are), so ``benchmarks/bench_rls.py`` measures it alone: EXPLAIN ANALYZE
+-- before and after applying it, on generated data.
+
+create index if not exists memberships_user_ppg_idx on public.memberships (user_id, ppg_id) include (role);
+create index if not exists memberships_ppg_user_idx on public.memberships (ppg_id, user_id);
+create index if not exists swot_items_ppg_idx on public.swot_items (ppg_id);
+create index if not exists projects_parent_idx on public.projects (parent_project_id);
+create index if not exists project_orientadores_user_idx on public.project_orientadores (user_id, project_id);
+create index if not exists project_mestrandos_user_idx on public.project_mestrandos (user_id, project_id);
+create index if not exists articles_project_idx on public.articles (project_id);
+create index if not exists dissertations_project_idx on public.dissertations (project_id);
+create index if not exists ptts_project_idx on public.ptts (project_id);
+create index if not exists evaluations_evaluator_idx on public.evaluations (evaluator_id, ppg_id);
+create index if not exists evaluations_target_idx on public.evaluations (target_type, target_id);
+
+-- Columns that only some deployments have.
+do $$
+declare
+  spec text[];
+begin
+  foreach spec slice 1 in array array[
+    ['articles', 'dissertation_id'],
+    ['ptts', 'dissertation_id'],
+    ['articles', 'orientador_user_id'],
+    ['articles', 'mestrando_user_id']
+  ] loop
+    if exists (
+      select 1 from information_schema.columns
+      where table_schema = 'public' and table_name = spec[1] and column_name = spec[2]
+    ) then
+      execute format('create index if not exists %I on public.%I (%I)', spec[1] || '_' || spec[2] || '_idx', spec[1], spec[2]);
+    end if;
+  end loop;
+end$$;
+
+-- Read policies scan many rows: check them against the member set.
+do $$
+declare
+  spec text[];
+begin
+  foreach spec slice 1 in array array[
+    ['ppgs', 'ppg_select', 'id'],
+    ['memberships', 'memberships_select_ppg', 'ppg_id'],
+    ['research_lines', 'research_lines_select', 'ppg_id'],
+    ['swot_items', 'swot_items_select', 'ppg_id'],
+    ['projects', 'projects_select', 'ppg_id'],
+    ['articles', 'articles_select', 'ppg_id'],
+    ['dissertations', 'dissertations_select', 'ppg_id'],
+    ['ptts', 'ptts_select', 'ppg_id'],
+    ['evaluations', 'evaluations_select', 'ppg_id'],
+    ['evaluation_scores', 'evaluation_scores_select', 'ppg_id']
+  ] loop
+    execute format('drop policy if exists %I on public.%I', spec[2], spec[1]);
+    execute format(
+      'create policy %I on public.%I for select using (%I in (select public.member_ppg_ids()))',
+      spec[2], spec[1], spec[3]
+    );
+  end loop;
+end$$;
+
+drop policy if exists memberships_select_self on public.memberships;
+create policy memberships_select_self on public.memberships
+for select using ((select auth.uid()) = user_id);
+
+drop policy if exists profiles_select_same_ppg on public.profiles;
+create policy profiles_select_same_ppg on public.profiles
+for select using (
+  user_id in (
+    select m.user_id from public.memberships m
+    where m.ppg_id in (select public.member_ppg_ids())
+  )
+);
+
+-- Institution dashboard -------------------------------------------------------
+-- Per-PPG totals for the consolidated dashboard: one GROUP BY per table, then
+-- joined to ppgs. ``security_invoker`` applies the caller's RLS, so each user
+-- sees the rows of the PPGs they belong to. score_sum and scored let the app
+-- compute weighted institution-wide averages.
+
+create or replace view public.ppg_summary
+with (security_invoker = true)
+as
+select
+  p.id as ppg_id,
+  p.name,
+  coalesce(d.total, 0) as dissertations,
+  coalesce(a.total, 0) as articles,
+  coalesce(t.total, 0) as ptts,
+  coalesce(e.total, 0) as evaluations,
+  coalesce(e.scored, 0) as scored,
+  coalesce(e.score_sum, 0) as score_sum
+from public.ppgs p
+left join (select ppg_id, count(*) as total from public.dissertations group by ppg_id) d on d.ppg_id = p.id
+left join (select ppg_id, count(*) as total from public.articles group by ppg_id) a on a.ppg_id = p.id
+left join (select ppg_id, count(*) as total from public.ptts group by ppg_id) t on t.ppg_id = p.id
+left join (
+  select ppg_id, count(*) as total, count(final_score) as scored, sum(final_score) as score_sum
+  from public.evaluations
+  group by ppg_id
+) e on e.ppg_id = p.id;
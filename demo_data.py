@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import uuid
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import streamlit as st
 
+from demo_store import VersionConflictError
+
 
 DemoRecord = Dict[str, Any]
 
@@ -184,6 +187,7 @@ def seed_demo_data() -> None:
         "ficha_criterios": ficha_criterios,
         "avaliacoes": avaliacoes,
         "avaliacao_notas": avaliacao_notas,
+        "avaliacao_notas_indice": {"criterio": {}, "alvo": {}},
     }
 
 
@@ -217,23 +221,57 @@ def list_ppg_memberships(ppg_id: str) -> List[DemoRecord]:
     return registros
 
 
-def _upsert(table: str, payload: DemoRecord) -> DemoRecord:
+def _upsert(table: str, payload: DemoRecord, expected_updated_at: Optional[str] = None) -> DemoRecord:
+    """Insert or update a row; with ``expected_updated_at`` the update only applies to an unchanged row."""
     db = _db()
     registros = db.setdefault(table, [])
     record_id = payload.get("id") or str(uuid.uuid4())
     payload["id"] = record_id
+    payload["updated_at"] = datetime.utcnow().isoformat()
     for idx, registro in enumerate(registros):
         if registro.get("id") == record_id:
+            if expected_updated_at is not None and registro.get("updated_at") != expected_updated_at:
+                raise VersionConflictError(table, record_id, expected_updated_at, registro.get("updated_at"))
             registros[idx] = {**registro, **payload}
-            break
-    else:
-        registros.append(payload)
+            return registros[idx]
+    registros.append(payload)
     return payload
 
 
 def _delete(table: str, record_id: Any) -> None:
     db = _db()
     db[table] = [r for r in db.get(table, []) if r.get("id") != record_id]
+    if table == "avaliacoes":
+        removidas = [n for n in db.get("avaliacao_notas", []) if n.get("avaliacao_id") == record_id]
+        if removidas:
+            ids = {n["id"] for n in removidas}
+            db["avaliacao_notas"] = [n for n in db["avaliacao_notas"] if n["id"] not in ids]
+            _index_notas(removidas, remove=True)
+
+
+def _notas_indice() -> Dict[str, Dict[Any, Dict[str, DemoRecord]]]:
+    db = _db()
+    if "avaliacao_notas_indice" not in db:
+        db["avaliacao_notas_indice"] = {"criterio": {}, "alvo": {}}
+        _index_notas(db.get("avaliacao_notas", []))
+    return db["avaliacao_notas_indice"]
+
+
+def _index_notas(notas: List[DemoRecord], remove: bool = False) -> None:
+    """Keep the (ficha, critério) and (tipo, alvo) indexes of ``avaliacao_notas`` in sync."""
+    indice = _notas_indice()
+    for nota in notas:
+        for nome, chave in (
+            ("criterio", (nota.get("ficha_id"), nota.get("criterio_id"))),
+            ("alvo", (nota.get("target_type"), nota.get("target_id"))),
+        ):
+            grupo = indice[nome].setdefault(chave, {})
+            if remove:
+                grupo.pop(nota["id"], None)
+                if not grupo:
+                    del indice[nome][chave]
+            else:
+                grupo[nota["id"]] = nota
 
 
 def list_research_lines(ppg_id: str) -> List[DemoRecord]:
@@ -281,8 +319,19 @@ def list_projects(ppg_id: str) -> List[DemoRecord]:
     return [p for p in _db()["projetos"] if p.get("ppg_id") == ppg_id]
 
 
-def upsert_project(ppg_id: str, titulo: str, lider: str, status: str, project_id: Optional[str] = None) -> DemoRecord:
-    return _upsert("projetos", {"id": project_id, "ppg_id": ppg_id, "titulo": titulo, "lider": lider, "status": status})
+def upsert_project(
+    ppg_id: str,
+    titulo: str,
+    lider: str,
+    status: str,
+    project_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> DemoRecord:
+    return _upsert(
+        "projetos",
+        {"id": project_id, "ppg_id": ppg_id, "titulo": titulo, "lider": lider, "status": status},
+        expected_updated_at,
+    )
 
 
 def remove_project(record_id: Any) -> None:
@@ -300,6 +349,7 @@ def upsert_dissertation(
     orientador: str,
     defesa_prevista: str,
     dissertation_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
 ) -> DemoRecord:
     return _upsert(
         "dissertacoes",
@@ -311,6 +361,7 @@ def upsert_dissertation(
             "orientador": orientador,
             "defesa_prevista": defesa_prevista,
         },
+        expected_updated_at,
     )
 
 
@@ -322,10 +373,19 @@ def list_articles(ppg_id: str) -> List[DemoRecord]:
     return [a for a in _db()["artigos"] if a.get("ppg_id") == ppg_id]
 
 
-def upsert_article(ppg_id: str, titulo: str, autores: str, ano: int, status: str, article_id: Optional[str] = None) -> DemoRecord:
+def upsert_article(
+    ppg_id: str,
+    titulo: str,
+    autores: str,
+    ano: int,
+    status: str,
+    article_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> DemoRecord:
     return _upsert(
         "artigos",
         {"id": article_id, "ppg_id": ppg_id, "titulo": titulo, "autores": autores, "ano": ano, "status": status},
+        expected_updated_at,
     )
 
 
@@ -337,10 +397,18 @@ def list_ptts(ppg_id: str) -> List[DemoRecord]:
     return [p for p in _db()["ptts"] if p.get("ppg_id") == ppg_id]
 
 
-def upsert_ptt(ppg_id: str, tema: str, responsavel: str, status: str, ptt_id: Optional[str] = None) -> DemoRecord:
+def upsert_ptt(
+    ppg_id: str,
+    tema: str,
+    responsavel: str,
+    status: str,
+    ptt_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> DemoRecord:
     return _upsert(
         "ptts",
         {"id": ptt_id, "ppg_id": ppg_id, "tema": tema, "responsavel": responsavel, "status": status},
+        expected_updated_at,
     )
 
 
@@ -418,15 +486,29 @@ def create_evaluation(
         {
             "id": str(uuid.uuid4()),
             "avaliacao_id": avaliacao["id"],
+            "ppg_id": ppg_id,
+            "ficha_id": form_id,
             "criterio_id": criterio_id,
+            "target_type": target_type,
+            "target_id": target_id,
             "nota": nota,
         }
         for criterio_id, nota in scores.items()
     ]
     _db().setdefault("avaliacao_notas", []).extend(notas_registros)
+    _index_notas(notas_registros)
     return {**avaliacao, "total": total}
 
 
+def list_criterion_scores(form_id: str, criterio_id: str, ppg_id: Optional[str] = None) -> List[DemoRecord]:
+    notas = _notas_indice()["criterio"].get((form_id, criterio_id), {}).values()
+    return [n for n in notas if ppg_id is None or n.get("ppg_id") == ppg_id]
+
+
+def list_target_scores(target_type: str, target_id: str) -> List[DemoRecord]:
+    return list(_notas_indice()["alvo"].get((target_type, target_id), {}).values())
+
+
 def list_reports(ppg_id: str) -> List[DemoRecord]:
     return [r for r in _db().get("relatorios", []) if r.get("ppg_id") == ppg_id]
 
@@ -0,0 +1,432 @@
+"""Deterministic synthetic datasets for scale testing, built on ``demo_seed``.
+
+Usage::
+
+    python demo_generator.py --ppgs 3 --articles 5000 --format json -o demo_db.json
+    python demo_generator.py --ppgs 3 --format sql -o demo_db.sql
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from demo_seed import init_demo_db
+from form_versions import compile_form, form_version_id
+
+DEFAULT_COUNTS = {
+    "people": 40,
+    "lines": 4,
+    "projects": 10,
+    "dissertations": 30,
+    "articles": 120,
+    "ptts": 40,
+    "evaluations": 300,
+}
+
+STATUSES = ["planejado", "em_execucao", "concluido"]
+TARGET_FORMS = {"article": "articles", "ptt": "ptts"}
+SQL_NAMESPACE = uuid.UUID("5f0e1f3a-7c55-4d8e-9a63-2f5d0c9b8a11")
+SQL_BATCH_SIZE = 1000
+
+
+def generate_demo_db(n_ppgs: int = 1, *, seed: int = 0, **counts: int) -> Dict[str, Any]:
+    """Return a database shaped like ``init_demo_db()`` with ``n_ppgs`` programs.
+
+    ``counts`` overrides the per-PPG sizes in ``DEFAULT_COUNTS``. The same
+    arguments always produce the same data.
+    """
+    unknown = set(counts) - set(DEFAULT_COUNTS)
+    if unknown:
+        raise ValueError(f"Contagens desconhecidas: {', '.join(sorted(unknown))}")
+    sizes = {**DEFAULT_COUNTS, **counts}
+    rng = random.Random(seed)
+    forms = copy.deepcopy(init_demo_db()["evaluation_forms"])
+    db: Dict[str, Any] = {
+        "ppgs": [],
+        "people": [],
+        "research_lines": [],
+        "projects": [],
+        "dissertations": [],
+        "articles": [],
+        "ptts": [],
+        "evaluation_forms": forms,
+        "evaluation_form_versions": [
+            {
+                "id": form_version_id(form_type, form),
+                "form_type": form_type,
+                "number": 1,
+                "form": copy.deepcopy(form),
+                "created_at": "2021-01-01T00:00:00",
+            }
+            for form_type, form in forms.items()
+        ],
+        "evaluations": [],
+    }
+    for index in range(1, n_ppgs + 1):
+        _generate_ppg(db, f"ppg{index}", index, sizes, rng)
+    return db
+
+
+def _generate_ppg(db: Dict[str, Any], ppg_id: str, index: int, sizes: Dict[str, int], rng: random.Random) -> None:
+    db["ppgs"].append(
+        {"id": ppg_id, "name": f"PPG Sintético {index}", "description": "Dados sintéticos para testes de escala."}
+    )
+
+    lines = [
+        {
+            "id": f"{ppg_id}_l{n}",
+            "ppg_id": ppg_id,
+            "name": f"Linha {n}",
+            "description": f"Linha de pesquisa sintética {n}.",
+        }
+        for n in range(1, max(sizes["lines"], 1) + 1)
+    ]
+    line_ids = [line["id"] for line in lines]
+    db["research_lines"].extend(lines)
+
+    n_people = max(sizes["people"], 3)
+    n_orientadores = max(1, n_people // 5)
+    coordenador = {"id": f"{ppg_id}_coord", "ppg_id": ppg_id, "name": f"Coordenação {index}", "role": "coordenador"}
+    orientadores = [
+        {
+            "id": f"{ppg_id}_or{n}",
+            "ppg_id": ppg_id,
+            "name": f"Prof. {n}",
+            "role": "orientador",
+            "linhas_ids": rng.sample(line_ids, min(2, len(line_ids))),
+        }
+        for n in range(1, n_orientadores + 1)
+    ]
+    mestrandos = []
+    for n in range(1, n_people - n_orientadores):
+        orientador = rng.choice(orientadores)
+        mestrandos.append(
+            {
+                "id": f"{ppg_id}_m{n}",
+                "ppg_id": ppg_id,
+                "name": f"Mestrando(a) {n}",
+                "role": "mestrando",
+                "orientador_id": orientador["id"],
+                "line_id": rng.choice(orientador["linhas_ids"]),
+                "status": rng.choice(STATUSES),
+            }
+        )
+    db["people"].extend([coordenador, *orientadores, *mestrandos])
+
+    projects = []
+    for n in range(1, max(sizes["projects"], 1) + 1):
+        projects.append(
+            {
+                "id": f"{ppg_id}_p{n}",
+                "ppg_id": ppg_id,
+                "name": f"Projeto {n}",
+                "description": f"Projeto sintético {n}.",
+                "status": rng.choice(STATUSES),
+                "line_id": rng.choice(line_ids),
+                "orientadores_ids": [o["id"] for o in rng.sample(orientadores, min(2, len(orientadores)))],
+                "mestrandos_ids": [],
+            }
+        )
+    project_by_mestrando: Dict[str, Dict[str, Any]] = {}
+    for position, mestrando in enumerate(mestrandos):
+        project = projects[position % len(projects)]
+        project["mestrandos_ids"].append(mestrando["id"])
+        project_by_mestrando[mestrando["id"]] = project
+    db["projects"].extend(projects)
+
+    dissertations = []
+    for n in range(1, sizes["dissertations"] + 1):
+        mestrando = mestrandos[(n - 1) % len(mestrandos)] if mestrandos else None
+        dissertations.append(
+            {
+                "id": f"{ppg_id}_d{n}",
+                "ppg_id": ppg_id,
+                "title": f"Dissertação {n} — {ppg_id}",
+                "summary": f"Resumo sintético da dissertação {n}.",
+                "status": rng.choice(STATUSES),
+                "year": rng.randint(2019, 2025),
+                "line_id": mestrando["line_id"] if mestrando else rng.choice(line_ids),
+                "project_id": project_by_mestrando[mestrando["id"]]["id"] if mestrando else None,
+                "orientador_id": mestrando["orientador_id"] if mestrando else None,
+                "mestrando_id": mestrando["id"] if mestrando else None,
+                "artigos_ids": [],
+                "ptts_ids": [],
+            }
+        )
+    db["dissertations"].extend(dissertations)
+
+    ptt_types = db["evaluation_forms"].get("ptts", {}).get("ptt_types", [])
+    articles = [
+        _production(f"{ppg_id}_a{n}", ppg_id, f"Artigo {n}", "artigos_ids", dissertations, projects, line_ids, rng)
+        for n in range(1, sizes["articles"] + 1)
+    ]
+    for article in articles:
+        article["autores_texto"] = "; ".join(
+            filter(None, [_person_name(article.get("mestrando_id")), _person_name(article.get("orientador_id"))])
+        )
+    ptts = [
+        _production(f"{ppg_id}_t{n}", ppg_id, f"PTT {n}", "ptts_ids", dissertations, projects, line_ids, rng)
+        for n in range(1, sizes["ptts"] + 1)
+    ]
+    for ptt in ptts:
+        ptt["tipo_ptt"] = rng.choice(ptt_types) if ptt_types else None
+    db["articles"].extend(articles)
+    db["ptts"].extend(ptts)
+
+    targets = [("article", a["id"]) for a in articles] + [("ptt", p["id"]) for p in ptts]
+    evaluators = [coordenador["id"]] + [o["id"] for o in orientadores]
+    start = datetime(2021, 1, 1)
+    compiled = {
+        row["form_type"]: compile_form(row["form"], row["form_type"], row["id"]) for row in db["evaluation_form_versions"]
+    }
+    for n in range(1, (sizes["evaluations"] if targets else 0) + 1):
+        target_type, target_id = rng.choice(targets)
+        form_type = TARGET_FORMS[target_type]
+        form = db["evaluation_forms"].get(form_type, {})
+        scores = {
+            c["id"]: bool(rng.randint(0, 1)) if c.get("response_type") == "yes_no" else rng.randint(1, 5)
+            for c in form.get("criteria", [])
+        }
+        version = compiled.get(form_type)
+        created_at = start + timedelta(minutes=rng.randint(0, 5 * 365 * 24 * 60))
+        db["evaluations"].append(
+            {
+                "id": f"{ppg_id}_e{n}",
+                "ppg_id": ppg_id,
+                "target_type": target_type,
+                "target_id": target_id,
+                "evaluator_id": rng.choice(evaluators),
+                "form_type": form_type,
+                "form_version": version.version_id if version else None,
+                "scores": scores,
+                "final_score": version.score(scores) if version else 0.0,
+                "notes": None,
+                "created_at": created_at.isoformat(),
+            }
+        )
+
+
+def _production(
+    item_id: str,
+    ppg_id: str,
+    label: str,
+    links_field: str,
+    dissertations: List[Dict[str, Any]],
+    projects: List[Dict[str, Any]],
+    line_ids: List[str],
+    rng: random.Random,
+) -> Dict[str, Any]:
+    """Build an article/PTT; half of them are linked to a dissertation."""
+    dissertation = rng.choice(dissertations) if dissertations and rng.random() < 0.5 else None
+    if dissertation:
+        dissertation[links_field].append(item_id)
+        project_id = dissertation["project_id"]
+        line_id = dissertation["line_id"]
+        orientador_id = dissertation["orientador_id"]
+        mestrando_id = dissertation["mestrando_id"]
+    else:
+        project = rng.choice(projects)
+        project_id = project["id"]
+        line_id = project["line_id"] or rng.choice(line_ids)
+        orientador_id = rng.choice(project["orientadores_ids"]) if project["orientadores_ids"] else None
+        mestrando_id = rng.choice(project["mestrandos_ids"]) if project["mestrandos_ids"] else None
+    return {
+        "id": item_id,
+        "ppg_id": ppg_id,
+        "title": f"{label} — {ppg_id}",
+        "summary": f"Resumo sintético: {label.lower()}.",
+        "status": rng.choice(STATUSES),
+        "year": rng.randint(2019, 2025),
+        "line_id": line_id,
+        "project_id": project_id,
+        "dissertation_id": dissertation["id"] if dissertation else None,
+        "orientador_id": orientador_id,
+        "mestrando_id": mestrando_id,
+    }
+
+
+def _person_name(person_id: Optional[str]) -> Optional[str]:
+    if not person_id:
+        return None
+    # Ids encode the role and index, so the name can be derived without a scan.
+    suffix = person_id.rsplit("_", 1)[-1]
+    if suffix.startswith("or"):
+        return f"Prof. {suffix[2:]}"
+    if suffix.startswith("m"):
+        return f"Mestrando(a) {suffix[1:]}"
+    return None
+
+
+# -- Output formats ----------------------------------------------------------
+
+def to_json(db: Dict[str, Any], indent: Optional[int] = None) -> str:
+    """Serialize ``db`` in the format read by ``demo_store.import_db_json``."""
+    return json.dumps(db, indent=indent, ensure_ascii=False)
+
+
+def sql_uuid(demo_id: Optional[str]) -> Optional[str]:
+    """Map a demo id to a stable UUID so links survive the SQL export."""
+    if not demo_id:
+        return None
+    return str(uuid.uuid5(SQL_NAMESPACE, demo_id))
+
+
+def _sql_literal(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _insert_statements(table: str, columns: List[str], rows: Iterable[List[Any]]) -> Iterable[str]:
+    batch: List[str] = []
+    qualified = table if "." in table else f"public.{table}"
+    header = f"insert into {qualified} ({', '.join(columns)}) values\n"
+    for row in rows:
+        batch.append("(" + ", ".join(_sql_literal(v) for v in row) + ")")
+        if len(batch) == SQL_BATCH_SIZE:
+            yield header + ",\n".join(batch) + ";"
+            batch = []
+    if batch:
+        yield header + ",\n".join(batch) + ";"
+
+
+def to_sql_inserts(db: Dict[str, Any], with_users: bool = False) -> str:
+    """Render ``db`` as inserts for the tables in ``db/ddl.sql``.
+
+    People become ``memberships`` rows, and evaluations fill
+    ``evaluation_scores`` through their sync trigger. Columns referencing
+    ``auth.users`` (project links, article authors, evaluators) are left out
+    because those users do not exist in a fresh database, unless
+    ``with_users`` also inserts one ``auth.users`` row per person.
+    """
+    user = sql_uuid if with_users else (lambda demo_id: None)
+    tables = []
+    if with_users:
+        tables.append(
+            ("auth.users", ["id", "email"], [[sql_uuid(p["id"]), f"{p['id']}@demo.local"] for p in db.get("people", [])])
+        )
+    tables += [
+        ("ppgs", ["id", "name", "description"], [[sql_uuid(p["id"]), p.get("name"), p.get("description")] for p in db.get("ppgs", [])]),
+        (
+            "memberships",
+            ["id", "user_id", "ppg_id", "role"],
+            [
+                [sql_uuid(f"membership:{p['id']}"), sql_uuid(p["id"]), sql_uuid(p.get("ppg_id")), p.get("role")]
+                for p in db.get("people", [])
+            ],
+        ),
+        (
+            "research_lines",
+            ["id", "ppg_id", "name", "description"],
+            [[sql_uuid(l["id"]), sql_uuid(l.get("ppg_id")), l.get("name"), l.get("description")] for l in db.get("research_lines", [])],
+        ),
+        (
+            "projects",
+            ["id", "ppg_id", "name", "description", "status"],
+            [
+                [sql_uuid(p["id"]), sql_uuid(p.get("ppg_id")), p.get("name"), p.get("description"), p.get("status")]
+                for p in db.get("projects", [])
+            ],
+        ),
+        (
+            "articles",
+            ["id", "ppg_id", "title", "authors", "year", "status", "project_id", "orientador_user_id", "mestrando_user_id"],
+            [
+                [
+                    sql_uuid(a["id"]),
+                    sql_uuid(a.get("ppg_id")),
+                    a.get("title"),
+                    a.get("autores_texto"),
+                    a.get("year"),
+                    a.get("status"),
+                    sql_uuid(a.get("project_id")),
+                    user(a.get("orientador_id")),
+                    user(a.get("mestrando_id")),
+                ]
+                for a in db.get("articles", [])
+            ],
+        ),
+        (
+            "dissertations",
+            ["id", "ppg_id", "title", "summary", "project_id"],
+            [
+                [sql_uuid(d["id"]), sql_uuid(d.get("ppg_id")), d.get("title"), d.get("summary"), sql_uuid(d.get("project_id"))]
+                for d in db.get("dissertations", [])
+            ],
+        ),
+        (
+            "ptts",
+            ["id", "ppg_id", "title", "summary", "project_id"],
+            [
+                [sql_uuid(p["id"]), sql_uuid(p.get("ppg_id")), p.get("title"), p.get("summary"), sql_uuid(p.get("project_id"))]
+                for p in db.get("ptts", [])
+            ],
+        ),
+        (
+            "evaluations",
+            ["id", "ppg_id", "target_type", "target_id", "evaluator_id", "form_type", "scores", "final_score", "notes", "created_at"],
+            [
+                [
+                    sql_uuid(e["id"]),
+                    sql_uuid(e.get("ppg_id")),
+                    e.get("target_type"),
+                    sql_uuid(e.get("target_id")),
+                    user(e.get("evaluator_id")),
+                    e.get("form_type"),
+                    json.dumps(e.get("scores") or {}, ensure_ascii=False),
+                    e.get("final_score"),
+                    e.get("notes"),
+                    e.get("created_at"),
+                ]
+                for e in db.get("evaluations", [])
+            ],
+        ),
+    ]
+    if with_users:
+        for table, key in (("project_orientadores", "orientadores_ids"), ("project_mestrandos", "mestrandos_ids")):
+            links = [[sql_uuid(p["id"]), sql_uuid(person_id)] for p in db.get("projects", []) for person_id in p.get(key) or []]
+            tables.append((table, ["project_id", "user_id"], links))
+    statements = ["begin;"]
+    for table, columns, rows in tables:
+        statements.extend(_insert_statements(table, columns, rows))
+    statements.append("commit;")
+    return "\n\n".join(statements) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para testes de escala.")
+    parser.add_argument("--ppgs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    for name, default in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--format", choices=["json", "sql"], default="json")
+    parser.add_argument(
+        "--with-users", action="store_true", help="SQL: cria auth.users para as pessoas e preenche vínculos de projetos e avaliadores"
+    )
+    parser.add_argument("-o", "--output", help="Arquivo de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    db = generate_demo_db(args.ppgs, seed=args.seed, **{name: getattr(args, name) for name in DEFAULT_COUNTS})
+    content = to_json(db, indent=2) if args.format == "json" else to_sql_inserts(db, args.with_users)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(content)
+    else:
+        sys.stdout.write(content)
+
+
+__all__ = ["DEFAULT_COUNTS", "generate_demo_db", "to_json", "to_sql_inserts", "sql_uuid"]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 """Demo seed data for the in-memory PPG manager."""
 from __future__ import annotations
 
+import pickle
+from functools import lru_cache
 from typing import Dict, List
 
 import streamlit as st
 
+from metrics import record_cache
+
+SNAPSHOT_PROTOCOL = 5
+
 
 def init_demo_db() -> Dict[str, List[dict]]:
     """Return deterministic demo data representing a full PPG."""
@@ -428,14 +434,26 @@ def init_demo_db() -> Dict[str, List[dict]]:
     }
 
 
+@lru_cache(maxsize=1)
+def seed_snapshot() -> bytes:
+    """Return the pickled seed so new sessions skip rebuilding the literal."""
+    return pickle.dumps(init_demo_db(), protocol=SNAPSHOT_PROTOCOL)
+
+
+def load_seed_db() -> Dict[str, List[dict]]:
+    """Return a fresh, independent copy of the seed database."""
+    return pickle.loads(seed_snapshot())
+
+
 def ensure_demo_db() -> None:
     """Ensure demo database and context exist in session state."""
     if "db" not in st.session_state:
-        st.session_state["db"] = init_demo_db()
+        record_cache("seed_snapshot", seed_snapshot.cache_info().currsize > 0)
+        st.session_state["db"] = load_seed_db()
     if "ctx" not in st.session_state:
         st.session_state["ctx"] = {"ppg_id": "ppg1", "profile": "coordenador", "person_id": None}
     st.session_state["ppg_id"] = st.session_state["ctx"]["ppg_id"]
     st.session_state["role"] = st.session_state["ctx"]["profile"]
 
 
-__all__ = ["init_demo_db", "ensure_demo_db"]
+__all__ = ["init_demo_db", "ensure_demo_db", "load_seed_db", "seed_snapshot", "SNAPSHOT_PROTOCOL"]
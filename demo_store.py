@@ -2,12 +2,17 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import pickle
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import streamlit as st
 
 from demo_context import current_ppg
-from demo_seed import ensure_demo_db, init_demo_db
+from demo_seed import SNAPSHOT_PROTOCOL, ensure_demo_db, load_seed_db
+from ids import new_id, next_ids
+from instrumentation import instrument_module, note_rows
+from store_locks import read_lock, store_locks, write_lock
 
 STANDARD_STATUSES = {"planejado", "em_execucao", "concluido"}
 STATUS_SYNONYMS = {
@@ -31,12 +36,143 @@ def get_db() -> Dict[str, List[dict]]:
     return st.session_state["db"]
 
 
-def reset_db() -> None:
-    st.session_state["db"] = init_demo_db()
+def _collection(name: str) -> List[dict]:
+    """Return the rows of ``name`` for a full scan, counting them when instrumentation is on.
+
+    A single scan needs no lock: writers only append to a collection list or
+    replace it (``_delete``), never remove from it in place. Take ``read_lock``
+    when several scans must agree with each other.
+    """
+    rows = get_db().get(name, [])
+    note_rows(len(rows))
+    return rows
+
+
+# Called as ``listener(collection, changes, old_revision, new_revision)`` after every write,
+# where ``changes`` lists the ``(before, after)`` rows it touched; ``collection`` is ``None``
+# (and ``changes`` empty) when the whole database was replaced.
+Change = Tuple[Optional[dict], Optional[dict]]
+WriteListener = Callable[[Optional[str], List[Change], int, int], None]
+_WRITE_LISTENERS: List[WriteListener] = []
+
+
+def register_write_listener(listener: WriteListener) -> None:
+    if listener not in _WRITE_LISTENERS:
+        _WRITE_LISTENERS.append(listener)
+
+
+def store_revision() -> int:
+    """Revision of the current store, moved on every write by any session sharing it.
+
+    Caches keyed on it are valid while it is unchanged.
+    """
+    return store_locks().revision
+
+
+def _record_write(collection: Optional[str], before: Optional[dict], after: Optional[dict]) -> None:
+    _record_writes(collection, [(before, after)] if collection is not None else [])
+
+
+def _record_writes(collection: Optional[str], changes: List[Change]) -> None:
+    """Bump the revision once for a batch of row changes and notify the listeners."""
+    old_revision, new_revision = store_locks().bump_revision()
+    for listener in _WRITE_LISTENERS:
+        listener(collection, changes, old_revision, new_revision)
+
+
+class VersionConflictError(ValueError):
+    """Raised when a row changed after the caller read it (optimistic concurrency)."""
+
+    def __init__(self, collection: str, row_id: Any, expected: Any, current: Any = None) -> None:
+        super().__init__(
+            "Este registro foi alterado por outra pessoa enquanto você editava. "
+            "Revise os dados atualizados e salve novamente."
+        )
+        self.collection = collection
+        self.row_id = row_id
+        self.expected = expected
+        self.current = current
+
+
+def row_version(row: dict) -> int:
+    """Version of a stored row; rows saved before versioning count as version 1."""
+    return int(row.get("version") or 1)
+
+
+def _patch(collection: str, row: dict, changes: Dict[str, Any], expected_version: Optional[int] = None) -> dict:
+    """Update fields of a row already fetched from ``collection`` and record the write.
+
+    Every update bumps ``version`` and ``updated_at``; with ``expected_version`` the
+    update is refused with ``VersionConflictError`` if the row moved on since it was
+    read. Changes that carry their own ``version`` (replicated rows) keep it.
+    """
+    with write_lock(collection):
+        if expected_version is not None and int(expected_version) != row_version(row):
+            raise VersionConflictError(collection, row.get("id"), expected_version, row_version(row))
+        if "status" in changes:
+            _ensure_standard_status(changes, collection)
+        before = dict(row)
+        row.update(changes)
+        if "version" not in changes:
+            row["version"] = row_version(before) + 1
+            row["updated_at"] = datetime.utcnow().isoformat()
+        _record_write(collection, before, row)
+    return row
+
+
+def _named_snapshots() -> Dict[str, bytes]:
+    """Named snapshots of this session; other sessions can neither list nor restore them."""
+    return st.session_state.setdefault("_named_snapshots", {})
+
+
+def reset_db(snapshot: Optional[str] = None) -> None:
+    if snapshot:
+        restore_snapshot(snapshot)
+        return
+    st.session_state["db"] = load_seed_db()
+    _record_write(None, None, None)
+
+
+def snapshot_db() -> bytes:
+    """Serialize the current database with pickle protocol 5."""
+    db = get_db()
+    with read_lock(*db):
+        return pickle.dumps({"db": db}, protocol=SNAPSHOT_PROTOCOL)
+
+
+def restore_db(blob: bytes) -> None:
+    """Replace the session database with a blob produced by ``snapshot_db``.
+
+    Only restore blobs created by this process: unpickling untrusted data is unsafe.
+    """
+    state = pickle.loads(blob)
+    st.session_state["db"] = state["db"]
+    _record_write(None, None, None)
+
+
+def save_snapshot(name: str) -> None:
+    _named_snapshots()[name] = snapshot_db()
+
+
+def restore_snapshot(name: str) -> None:
+    snapshots = _named_snapshots()
+    if name not in snapshots:
+        raise KeyError(f"Snapshot não encontrado: {name}")
+    restore_db(snapshots[name])
+
+
+def delete_snapshot(name: str) -> None:
+    _named_snapshots().pop(name, None)
+
+
+def list_snapshots() -> List[str]:
+    return sorted(_named_snapshots())
 
 
 def export_db_json() -> str:
-    return json.dumps(get_db(), indent=2, ensure_ascii=False)
+    db = get_db()
+    with read_lock(*db):
+        return json.dumps(db, indent=2, ensure_ascii=False)
 
 
 def import_db_json(file) -> None:
@@ -45,14 +181,13 @@ def import_db_json(file) -> None:
     content = file.read()
     if isinstance(content, bytes):
         content = content.decode("utf-8")
-    st.session_state["db"] = json.loads(content)
+    st.session_state["db"] = _normalize_db(json.loads(content))
+    _record_write(None, None, None)
 
 
 def next_id(prefix: str) -> str:
-    ensure_demo_db()
-    counters = st.session_state.setdefault("id_counters", {})
-    counters[prefix] = counters.get(prefix, 0) + 1
-    return f"{prefix}-{counters[prefix]}"
+    """New globally unique, time-sortable id (see ``ids``); never collides with stored rows."""
+    return new_id(prefix)
 
 
 def _filter_by_ppg(items: Iterable[dict], ppg_id: str) -> List[dict]:
@@ -60,38 +195,38 @@ def _filter_by_ppg(items: Iterable[dict], ppg_id: str) -> List[dict]:
 
 
 def list_people(ppg_id: str, role: Optional[str] = None) -> List[dict]:
-    people = _filter_by_ppg(get_db().get("people", []), ppg_id)
+    people = _filter_by_ppg(_collection("people"), ppg_id)
     if role:
         return [p for p in people if p.get("role") == role]
     return people
 
 
 def list_lines(ppg_id: str) -> List[dict]:
-    return _filter_by_ppg(get_db().get("research_lines", []), ppg_id)
+    return _filter_by_ppg(_collection("research_lines"), ppg_id)
 
 
 def list_projects(ppg_id: str) -> List[dict]:
-    return _filter_by_ppg(get_db().get("projects", []), ppg_id)
+    return _filter_by_ppg(_collection("projects"), ppg_id)
 
 
 def list_dissertations(ppg_id: str) -> List[dict]:
     return [
-        _ensure_standard_status(row, "dissertations")
-        for row in _filter_by_ppg(get_db().get("dissertations", []), ppg_id)
+        _with_standard_status(row, "dissertations")
+        for row in _filter_by_ppg(_collection("dissertations"), ppg_id)
     ]
 
 
 def list_articles(ppg_id: str) -> List[dict]:
     return [
-        _ensure_standard_status(row, "articles")
-        for row in _filter_by_ppg(get_db().get("articles", []), ppg_id)
+        _with_standard_status(row, "articles")
+        for row in _filter_by_ppg(_collection("articles"), ppg_id)
     ]
 
 
 def list_ptts(ppg_id: str) -> List[dict]:
     return [
-        _ensure_standard_status(row, "ptts")
-        for row in _filter_by_ppg(get_db().get("ptts", []), ppg_id)
+        _with_standard_status(row, "ptts")
+        for row in _filter_by_ppg(_collection("ptts"), ppg_id)
     ]
 
 
@@ -99,11 +234,21 @@ def get_evaluation_forms() -> dict:
     return get_db().get("evaluation_forms", {})
 
 
+def save_evaluation_form(form_type: str, form: dict) -> dict:
+    """Replace a form; evaluations already saved keep the version they were scored with."""
+    with write_lock("evaluation_forms"):
+        forms = get_db().setdefault("evaluation_forms", {})
+        before = forms.get(form_type)
+        forms[form_type] = form
+        _record_write("evaluation_forms", before, form)
+    return form
+
+
 def list_evaluations(
     target_type: Optional[str] = None, target_id: Optional[str] = None, ppg_id: Optional[str] = None
 ) -> List[dict]:
     ppg = ppg_id or current_ppg() or (get_db().get("ppgs", [{}])[0].get("id"))
-    evaluations = _filter_by_ppg(get_db().get("evaluations", []), ppg)
+    evaluations = _filter_by_ppg(_collection("evaluations"), ppg)
     if target_type:
         evaluations = [ev for ev in evaluations if ev.get("target_type") == target_type]
     if target_id:
@@ -121,86 +266,154 @@ def add_evaluation(payload: dict) -> dict:
     return upsert_evaluation(payload)
 
 
+def add_evaluations(payloads: List[dict]) -> List[dict]:
+    """Insert many new evaluations as one write (one revision bump)."""
+    missing = [payload for payload in payloads if not payload.get("id")]
+    for payload, evaluation_id in zip(missing, next_ids("eval", len(missing))):
+        payload["id"] = evaluation_id
+    return _insert_many("evaluations", payloads)
+
+
 def stats_evaluations(target_type: str, target_id: str, ppg_id: Optional[str] = None) -> Tuple[int, Optional[float], Optional[float], Optional[str]]:
     evaluations = list_evaluations(target_type=target_type, target_id=target_id, ppg_id=ppg_id)
     if not evaluations:
         return 0, None, None, None
     scores = [ev.get("final_score") for ev in evaluations if ev.get("final_score") is not None]
     avg = round(sum(scores) / len(scores), 2) if scores else None
-    latest = sorted(evaluations, key=lambda ev: ev.get("created_at", ""))[-1]
+    latest = max(reversed(evaluations), key=lambda ev: ev.get("created_at", ""))
     return len(evaluations), avg, latest.get("final_score"), latest.get("created_at")
 
 
 def get_by_id(entity: str, entity_id: str) -> Optional[dict]:
-    return next((row for row in get_db().get(entity, []) if row.get("id") == entity_id), None)
+    return next((row for row in _collection(entity) if row.get("id") == entity_id), None)
 
 
 def orientadores_by_line(line_id: str) -> List[dict]:
     return [
         p
-        for p in get_db().get("people", [])
+        for p in _collection("people")
         if line_id in p.get("linhas_de_pesquisa_ids", []) or line_id in p.get("linhas_ids", [])
     ]
 
 
 def mestrandos_by_orientador(orientador_id: str) -> List[dict]:
-    return [p for p in get_db().get("people", []) if p.get("role") == "mestrando" and p.get("orientador_id") == orientador_id]
+    return [p for p in _collection("people") if p.get("role") == "mestrando" and p.get("orientador_id") == orientador_id]
 
 
 def dissertations_by_project(project_id: str) -> List[dict]:
-    return [d for d in get_db().get("dissertations", []) if d.get("project_id") == project_id]
+    return [d for d in _collection("dissertations") if d.get("project_id") == project_id]
 
 
 def articles_by_project(project_id: str) -> List[dict]:
-    return [a for a in get_db().get("articles", []) if a.get("project_id") == project_id]
+    return [a for a in _collection("articles") if a.get("project_id") == project_id]
 
 
 def ptts_by_project(project_id: str) -> List[dict]:
-    return [p for p in get_db().get("ptts", []) if p.get("project_id") == project_id]
+    return [p for p in _collection("ptts") if p.get("project_id") == project_id]
 
 
 def articles_by_dissertation(dissertation_id: str) -> List[dict]:
-    return [a for a in get_db().get("articles", []) if a.get("dissertation_id") == dissertation_id]
+    return [a for a in _collection("articles") if a.get("dissertation_id") == dissertation_id]
 
 
 def ptts_by_dissertation(dissertation_id: str) -> List[dict]:
-    return [p for p in get_db().get("ptts", []) if p.get("dissertation_id") == dissertation_id]
+    return [p for p in _collection("ptts") if p.get("dissertation_id") == dissertation_id]
 
 
 def _upsert(collection: str, payload: dict) -> dict:
     payload = _ensure_standard_status(payload, collection)
-    db = get_db()
-    rows = db.setdefault(collection, [])
-    existing = get_by_id(collection, payload.get("id"))
-    if existing:
-        existing.update(payload)
-        return existing
-    rows.append(payload)
+    # Lookup and insert/update under one lock: two saves of a new id cannot both append.
+    with write_lock(collection):
+        rows = get_db().setdefault(collection, [])
+        existing = get_by_id(collection, payload.get("id"))
+        if existing:
+            # A ``version`` in the payload is the one the caller read: the update is conditional on it.
+            expected_version = payload.pop("version", None)
+            payload.pop("updated_at", None)
+            return _patch(collection, existing, payload, expected_version)
+        _stamp_new(payload)
+        rows.append(payload)
+        _record_write(collection, None, payload)
     return payload
 
 
+def _insert_many(collection: str, payloads: List[dict]) -> List[dict]:
+    """Append new rows (ids must not exist yet) and record them as a single write."""
+    payloads = [_stamp_new(_ensure_standard_status(payload, collection)) for payload in payloads]
+    if payloads:
+        with write_lock(collection):
+            get_db().setdefault(collection, []).extend(payloads)
+            _record_writes(collection, [(None, payload) for payload in payloads])
+    return payloads
+
+
 def _delete(collection: str, entity_id: str) -> None:
     db = get_db()
-    db[collection] = [row for row in db.get(collection, []) if row.get("id") != entity_id]
+    kept: List[dict] = []
+    removed: List[dict] = []
+    with write_lock(collection):
+        for row in _collection(collection):
+            (removed if row.get("id") == entity_id else kept).append(row)
+        # Copy-on-write: scans already running keep iterating the old list.
+        db[collection] = kept
+        if removed:
+            _record_writes(collection, [(row, None) for row in removed])
+
+
+def _stamp_new(payload: dict) -> dict:
+    payload.setdefault("version", 1)
+    payload.setdefault("updated_at", datetime.utcnow().isoformat())
+    return payload
+
+
+def _standard_status(value: Any) -> str:
+    status_value = str(value or "").lower()
+    normalized = STATUS_SYNONYMS.get(status_value, status_value)
+    return normalized if normalized in STANDARD_STATUSES else "planejado"
 
 
 def _ensure_standard_status(payload: dict, collection: str) -> dict:
+    """Normalize ``payload["status"]`` in place; only for rows about to be written or loaded."""
     if collection not in {"dissertations", "articles", "ptts"}:
         return payload
-    status_value = str(payload.get("status") or "").lower()
-    normalized = STATUS_SYNONYMS.get(status_value, status_value)
-    if normalized not in STANDARD_STATUSES:
-        normalized = "planejado"
-    payload["status"] = normalized
+    payload["status"] = _standard_status(payload.get("status"))
     return payload
 
 
+def _with_standard_status(row: dict, collection: str) -> dict:
+    """``row`` for reading: itself when its status is standard, else a normalized copy.
+
+    Stored rows are never changed on read, since the write listeners' caches
+    (reports, partitions) counted them as they were written.
+    """
+    if collection not in {"dissertations", "articles", "ptts"} or row.get("status") in STANDARD_STATUSES:
+        return row
+    return {**row, "status": _standard_status(row.get("status"))}
+
+
+def _normalize_db(db: Dict[str, Any]) -> Dict[str, Any]:
+    for collection in ("dissertations", "articles", "ptts"):
+        for row in db.get(collection, []):
+            _ensure_standard_status(row, collection)
+    return db
+
+
 __all__ = [
     "get_db",
     "reset_db",
+    "snapshot_db",
+    "restore_db",
+    "save_snapshot",
+    "restore_snapshot",
+    "delete_snapshot",
+    "list_snapshots",
     "export_db_json",
     "import_db_json",
     "next_id",
+    "store_revision",
+    "register_write_listener",
+    "VersionConflictError",
+    "row_version",
     "list_people",
     "list_lines",
     "list_projects",
@@ -208,6 +421,7 @@ __all__ = [
     "list_articles",
     "list_ptts",
     "list_evaluations",
+    "save_evaluation_form",
     "get_by_id",
     "orientadores_by_line",
     "mestrandos_by_orientador",
@@ -219,5 +433,8 @@ __all__ = [
     "_upsert",
     "_delete",
     "add_evaluation",
+    "add_evaluations",
     "stats_evaluations",
 ]
+
+instrument_module(globals())
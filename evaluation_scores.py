@@ -0,0 +1,152 @@
+"""Normalized per-criterion score table derived from ``evaluations[*].scores``.
+
+One row per (evaluation, criterion) with the evaluation's keys copied in, plus
+two indexes: ``(form_type, criterion_id)`` and ``(target_type, target_id)``.
+The table is built once per session and then kept in sync by a store write
+listener, so criterion-level queries never decode the ``scores`` dicts again.
+Mirrors ``public.evaluation_scores`` in ``db/ddl.sql``.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import streamlit as st
+
+from demo_store import Change, _collection, register_write_listener, store_revision
+from instrumentation import instrument_module
+from metrics import record_cache
+
+ScoreKey = Tuple[str, str]  # (evaluation_id, criterion_id)
+SCORE_COLUMNS = (
+    "evaluation_id", "criterion_id", "ppg_id", "form_type", "target_type", "target_id", "evaluator_id", "score",
+)
+
+
+def score_value(answer: Any) -> Optional[float]:
+    """Answer on the 0–5 scale: yes/no booleans count as 5/0, like ``calculate_weighted_score``."""
+    if isinstance(answer, bool):
+        return 5.0 if answer else 0.0
+    try:
+        return float(answer)
+    except (TypeError, ValueError):
+        return None
+
+
+def _score_rows(evaluation: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for criterion_id, answer in (evaluation.get("scores") or {}).items():
+        rows.append(
+            {
+                "evaluation_id": evaluation.get("id"),
+                "criterion_id": criterion_id,
+                "ppg_id": evaluation.get("ppg_id"),
+                "form_type": evaluation.get("form_type"),
+                "target_type": evaluation.get("target_type"),
+                "target_id": evaluation.get("target_id"),
+                "evaluator_id": evaluation.get("evaluator_id"),
+                "score": score_value(answer),
+            }
+        )
+    return rows
+
+
+def _empty_table(revision: int) -> Dict[str, Any]:
+    return {"revision": revision, "rows": {}, "by_evaluation": {}, "by_criterion": {}, "by_target": {}}
+
+
+def _add_evaluation(table: Dict[str, Any], evaluation: Dict[str, Any]) -> None:
+    for row in _score_rows(evaluation):
+        key = (row["evaluation_id"], row["criterion_id"])
+        table["rows"][key] = row
+        table["by_evaluation"].setdefault(row["evaluation_id"], []).append(key)
+        table["by_criterion"].setdefault((row["form_type"], row["criterion_id"]), set()).add(key)
+        table["by_target"].setdefault((row["target_type"], row["target_id"]), set()).add(key)
+
+
+def _remove_evaluation(table: Dict[str, Any], evaluation: Dict[str, Any]) -> None:
+    # Keys come from the index, not from ``evaluation["scores"]``: an in-place edit of
+    # the dict would make ``before`` and ``after`` share it.
+    for key in table["by_evaluation"].pop(evaluation.get("id"), []):
+        row = table["rows"].pop(key)
+        for index, index_key in (
+            ("by_criterion", (row["form_type"], row["criterion_id"])),
+            ("by_target", (row["target_type"], row["target_id"])),
+        ):
+            keys: Set[ScoreKey] = table[index].get(index_key, set())
+            keys.discard(key)
+            if not keys:
+                table[index].pop(index_key, None)
+
+
+def build_score_table() -> Dict[str, Any]:
+    table = _empty_table(store_revision())
+    for evaluation in _collection("evaluations"):
+        _add_evaluation(table, evaluation)
+    return table
+
+
+def score_table() -> Dict[str, Any]:
+    """Return the session's score table, rebuilding it only after a full reload."""
+    table = st.session_state.get("_evaluation_scores")
+    revision = store_revision()
+    hit = table is not None and table["revision"] == revision
+    record_cache("evaluation_scores", hit)
+    if not hit:
+        table = build_score_table()
+        st.session_state["_evaluation_scores"] = table
+    return table
+
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    table = st.session_state.get("_evaluation_scores")
+    # A stale table (missed write or full reload) is rebuilt on the next read.
+    if table is None or collection is None or table["revision"] != old_revision:
+        return
+    if collection == "evaluations":
+        for before, after in changes:
+            if before is not None:
+                _remove_evaluation(table, before)
+            if after is not None:
+                _add_evaluation(table, after)
+    table["revision"] = new_revision
+
+
+register_write_listener(_on_write)
+
+
+def score_rows(ppg_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    rows = score_table()["rows"].values()
+    return [row for row in rows if ppg_id is None or row["ppg_id"] == ppg_id]
+
+
+def criterion_scores(form_type: str, criterion_id: str, ppg_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Score rows of one criterion, read through the ``(form_type, criterion_id)`` index."""
+    table = score_table()
+    keys = table["by_criterion"].get((form_type, criterion_id), ())
+    rows = [table["rows"][key] for key in keys]
+    return [row for row in rows if ppg_id is None or row["ppg_id"] == ppg_id]
+
+
+def target_scores(target_type: str, target_id: str) -> List[Dict[str, Any]]:
+    """Score rows of every evaluation of one article or PTT, via the ``(target_type, target_id)`` index."""
+    table = score_table()
+    return [table["rows"][key] for key in table["by_target"].get((target_type, target_id), ())]
+
+
+def criterion_average(form_type: str, criterion_id: str, ppg_id: Optional[str] = None) -> Tuple[int, Optional[float]]:
+    values = [row["score"] for row in criterion_scores(form_type, criterion_id, ppg_id) if row["score"] is not None]
+    return len(values), (round(sum(values) / len(values), 2) if values else None)
+
+
+__all__ = [
+    "SCORE_COLUMNS",
+    "score_value",
+    "build_score_table",
+    "score_table",
+    "score_rows",
+    "criterion_scores",
+    "target_scores",
+    "criterion_average",
+]
+
+instrument_module(globals())
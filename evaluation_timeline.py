@@ -0,0 +1,153 @@
+"""Evaluations kept in ``created_at`` order per target and per PPG.
+
+Each sequence is a sorted list of ``(created_at, id)`` keys. Saves made in
+time order append at the end, and backfills go in with ``bisect.insort``. So
+"latest" is the last key, "history since a date" is a bisect plus a slice, and
+"N most recent of the PPG" is the tail of the PPG sequence. None of these
+sort per call. Built once per session and then kept in sync by a store write
+listener, like ``evaluation_scores``.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from demo_store import Change, _collection, register_write_listener, store_revision
+from instrumentation import instrument_module
+from metrics import record_cache
+
+TimeKey = Tuple[str, str]  # (created_at, evaluation_id)
+TargetKey = Tuple[Optional[str], Optional[str], Optional[str]]  # (ppg_id, target_type, target_id)
+
+
+def _time_key(evaluation: Dict[str, Any]) -> TimeKey:
+    return (str(evaluation.get("created_at") or ""), str(evaluation.get("id")))
+
+
+def _target_key(evaluation: Dict[str, Any]) -> TargetKey:
+    return (evaluation.get("ppg_id"), evaluation.get("target_type"), evaluation.get("target_id"))
+
+
+def _insert(sequence: List[TimeKey], key: TimeKey) -> None:
+    if not sequence or key >= sequence[-1]:
+        sequence.append(key)
+    else:
+        insort(sequence, key)
+
+
+def _remove(sequence: List[TimeKey], key: TimeKey) -> None:
+    position = bisect_left(sequence, key)
+    if position < len(sequence) and sequence[position] == key:
+        del sequence[position]
+
+
+def _add_evaluation(timeline: Dict[str, Any], evaluation: Dict[str, Any]) -> None:
+    key = _time_key(evaluation)
+    # Keys and target are remembered: an in-place edit can change the row before we see it.
+    timeline["rows"][key[1]] = (evaluation, key, _target_key(evaluation))
+    _insert(timeline["by_target"].setdefault(_target_key(evaluation), []), key)
+    _insert(timeline["by_ppg"].setdefault(evaluation.get("ppg_id"), []), key)
+
+
+def _remove_evaluation(timeline: Dict[str, Any], evaluation_id: Any) -> None:
+    entry = timeline["rows"].pop(str(evaluation_id), None)
+    if entry is None:
+        return
+    _, key, target = entry
+    for index, index_key in (("by_target", target), ("by_ppg", target[0])):
+        sequence = timeline[index].get(index_key)
+        if sequence is not None:
+            _remove(sequence, key)
+            if not sequence:
+                del timeline[index][index_key]
+
+
+def build_timeline() -> Dict[str, Any]:
+    evaluations = sorted(_collection("evaluations"), key=_time_key)
+    timeline: Dict[str, Any] = {"revision": store_revision(), "rows": {}, "by_target": {}, "by_ppg": {}}
+    for evaluation in evaluations:
+        _add_evaluation(timeline, evaluation)
+    return timeline
+
+
+def timeline() -> Dict[str, Any]:
+    """Return the session's timeline, rebuilding it only after a full reload."""
+    current = st.session_state.get("_evaluation_timeline")
+    revision = store_revision()
+    hit = current is not None and current["revision"] == revision
+    record_cache("evaluation_timeline", hit)
+    if not hit:
+        current = build_timeline()
+        st.session_state["_evaluation_timeline"] = current
+    return current
+
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    current = st.session_state.get("_evaluation_timeline")
+    # A stale timeline (missed write or full reload) is rebuilt on the next read.
+    if current is None or collection is None or current["revision"] != old_revision:
+        return
+    if collection == "evaluations":
+        for before, after in changes:
+            if before is not None:
+                _remove_evaluation(current, before.get("id"))
+            if after is not None:
+                _add_evaluation(current, after)
+    current["revision"] = new_revision
+
+
+register_write_listener(_on_write)
+
+
+def _rows(current: Dict[str, Any], keys: List[TimeKey]) -> List[Dict[str, Any]]:
+    return [current["rows"][evaluation_id][0] for _, evaluation_id in keys]
+
+
+def latest_evaluation(target_type: str, target_id: str, ppg_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    current = timeline()
+    sequence = current["by_target"].get((ppg_id, target_type, target_id))
+    return current["rows"][sequence[-1][1]][0] if sequence else None
+
+
+def target_history(
+    target_type: str, target_id: str, ppg_id: Optional[str], since: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Evaluations of one target, newest first, optionally only those created at or after ``since``."""
+    current = timeline()
+    sequence = current["by_target"].get((ppg_id, target_type, target_id), [])
+    start = bisect_left(sequence, (since, "")) if since else 0
+    return _rows(current, sequence[start:][::-1])
+
+
+def recent_evaluations(ppg_id: Optional[str], limit: int = 10) -> List[Dict[str, Any]]:
+    """The ``limit`` most recent evaluations of the PPG, newest first."""
+    current = timeline()
+    sequence = current["by_ppg"].get(ppg_id, [])
+    return _rows(current, sequence[-limit:][::-1] if limit > 0 else [])
+
+
+def target_stats(
+    target_type: str, target_id: str, ppg_id: Optional[str]
+) -> Tuple[int, Optional[float], Optional[float], Optional[str]]:
+    """``(count, average, latest score, latest created_at)``, like ``demo_store.stats_evaluations``."""
+    history = target_history(target_type, target_id, ppg_id)
+    if not history:
+        return 0, None, None, None
+    scores = [ev.get("final_score") for ev in history if ev.get("final_score") is not None]
+    avg = round(sum(scores) / len(scores), 2) if scores else None
+    latest = history[0]
+    return len(history), avg, latest.get("final_score"), latest.get("created_at")
+
+
+__all__ = [
+    "build_timeline",
+    "timeline",
+    "latest_evaluation",
+    "target_history",
+    "recent_evaluations",
+    "target_stats",
+]
+
+instrument_module(globals())
@@ -0,0 +1,301 @@
+"""Columnar (Parquet / Arrow IPC) export of one PPG, one file per collection and link table.
+
+``scores`` dicts become one ``score__<criterion>`` column per criterion and list
+fields (``artigos_ids``, ``linhas_ids``, ...) become link tables. Rows are
+converted in batches and streamed to the writer, so memory stays bounded by
+``BATCH_SIZE``. Requires ``pyarrow``, imported on first use.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+BATCH_SIZE = 10_000
+# Format -> file extension. Arrow uses the IPC *stream* format: the file format
+# cannot replace dictionaries between batches.
+FORMATS = {"parquet": "parquet", "arrow": "arrows"}
+SCORE_PREFIX = "score__"
+
+# Column kinds: "id" string, "cat" dictionary-encoded string, "text" plain string,
+# "int", "float" and "ts" (timestamp parsed from ISO strings).
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "ppgs": {"id": "id", "name": "text", "description": "text"},
+    "people": {
+        "id": "id", "ppg_id": "cat", "name": "text", "role": "cat", "status": "cat",
+        "orientador_id": "cat", "line_id": "cat",
+    },
+    "research_lines": {"id": "id", "ppg_id": "cat", "name": "cat", "description": "text"},
+    "projects": {"id": "id", "ppg_id": "cat", "name": "text", "description": "text", "status": "cat", "line_id": "cat"},
+    "dissertations": {
+        "id": "id", "ppg_id": "cat", "title": "text", "summary": "text", "status": "cat", "year": "int",
+        "line_id": "cat", "project_id": "cat", "orientador_id": "cat", "mestrando_id": "cat",
+    },
+    "articles": {
+        "id": "id", "ppg_id": "cat", "title": "text", "summary": "text", "status": "cat", "year": "int",
+        "line_id": "cat", "project_id": "cat", "dissertation_id": "cat", "orientador_id": "cat",
+        "mestrando_id": "cat", "autores_texto": "text",
+    },
+    "ptts": {
+        "id": "id", "ppg_id": "cat", "title": "text", "summary": "text", "tipo_ptt": "cat", "status": "cat",
+        "year": "int", "line_id": "cat", "project_id": "cat", "dissertation_id": "cat", "orientador_id": "cat",
+        "mestrando_id": "cat",
+    },
+    "evaluations": {
+        "id": "id", "ppg_id": "cat", "target_type": "cat", "target_id": "id", "evaluator_id": "cat",
+        "form_type": "cat", "form_version": "cat", "final_score": "float", "notes": "text", "created_at": "ts",
+    },
+}
+
+# List field -> (link table, parent column, child column).
+LINK_TABLES: Dict[str, Dict[str, Tuple[str, str, str]]] = {
+    "people": {
+        "linhas_ids": ("person_lines", "person_id", "line_id"),
+        "linhas_de_pesquisa_ids": ("person_lines", "person_id", "line_id"),
+    },
+    "projects": {
+        "orientadores_ids": ("project_orientadores", "project_id", "person_id"),
+        "mestrandos_ids": ("project_mestrandos", "project_id", "person_id"),
+    },
+    "dissertations": {
+        "artigos_ids": ("dissertation_articles", "dissertation_id", "article_id"),
+        "ptts_ids": ("dissertation_ptts", "dissertation_id", "ptt_id"),
+    },
+}
+
+
+def _arrow_type(kind: str) -> Any:
+    import pyarrow as pa
+
+    return {
+        "id": pa.string(),
+        "cat": pa.dictionary(pa.int32(), pa.string()),
+        "text": pa.string(),
+        "int": pa.int32(),
+        "float": pa.float64(),
+        "ts": pa.timestamp("us"),
+    }[kind]
+
+
+def _convert(kind: str, value: Any) -> Any:
+    if value is None or value == "":
+        return None
+    if kind == "int":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if kind == "float":
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if kind == "ts":
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return str(value)
+
+
+def _ppg_rows(db: Dict[str, Any], collection: str, ppg_id: str) -> Iterator[Dict[str, Any]]:
+    for row in db.get(collection, []):
+        if collection == "ppgs":
+            if row.get("id") == ppg_id:
+                yield row
+        elif row.get("ppg_id") == ppg_id:
+            yield row
+
+
+def _criteria(db: Dict[str, Any], ppg_id: str) -> List[str]:
+    """Criterion ids of every form, plus any extra key found in the PPG's scores."""
+    ids: Dict[str, None] = {}
+    for form in (db.get("evaluation_forms") or {}).values():
+        for criterion in form.get("criteria", []):
+            ids[criterion["id"]] = None
+    for row in _ppg_rows(db, "evaluations", ppg_id):
+        for key in row.get("scores") or {}:
+            ids.setdefault(key, None)
+    return list(ids)
+
+
+def _schema(db: Dict[str, Any], collection: str, ppg_id: str) -> Any:
+    import pyarrow as pa
+
+    fields = [pa.field(name, _arrow_type(kind)) for name, kind in SCHEMAS[collection].items()]
+    if collection == "evaluations":
+        fields += [pa.field(f"{SCORE_PREFIX}{criterion}", pa.float64()) for criterion in _criteria(db, ppg_id)]
+    return pa.schema(fields)
+
+
+def _batched(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_collection_batches(
+    db: Dict[str, Any], collection: str, ppg_id: str, batch_size: int = BATCH_SIZE
+) -> Tuple[Any, Iterator[Any]]:
+    """Return ``(schema, record batches)`` for one collection of ``ppg_id``."""
+    import pyarrow as pa
+
+    schema = _schema(db, collection, ppg_id)
+    kinds = SCHEMAS[collection]
+
+    def batches() -> Iterator[Any]:
+        for chunk in _batched(_ppg_rows(db, collection, ppg_id), batch_size):
+            columns = []
+            for field in schema:
+                if field.name.startswith(SCORE_PREFIX):
+                    key = field.name[len(SCORE_PREFIX) :]
+                    # Checkbox criteria are stored as booleans; float() maps them to 1.0/0.0.
+                    values = [_convert("float", (row.get("scores") or {}).get(key)) for row in chunk]
+                else:
+                    values = [_convert(kinds[field.name], row.get(field.name)) for row in chunk]
+                columns.append(pa.array(values, type=field.type))
+            yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    return schema, batches()
+
+
+def iter_link_batches(
+    db: Dict[str, Any], table: str, ppg_id: str, batch_size: int = BATCH_SIZE
+) -> Tuple[Any, Iterator[Any]]:
+    """Return ``(schema, record batches)`` for one link table, e.g. ``dissertation_articles``."""
+    import pyarrow as pa
+
+    sources = [
+        (collection, field, parent, child)
+        for collection, fields in LINK_TABLES.items()
+        for field, (name, parent, child) in fields.items()
+        if name == table
+    ]
+    if not sources:
+        raise ValueError(f"Tabela de vínculo desconhecida: {table}")
+    parent, child = sources[0][2], sources[0][3]
+    cat = _arrow_type("cat")
+    schema = pa.schema([pa.field(parent, cat), pa.field(child, cat), pa.field("position", pa.int32())])
+
+    def links() -> Iterator[Tuple[str, str, int]]:
+        for collection, field, _, _ in sources:
+            for row in _ppg_rows(db, collection, ppg_id):
+                for position, target in enumerate(row.get(field) or []):
+                    yield row["id"], target, position
+
+    def batches() -> Iterator[Any]:
+        for chunk in _batched(links(), batch_size):
+            parents, children, positions = zip(*chunk)
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(parents, type=cat), pa.array(children, type=cat), pa.array(positions, type=pa.int32())],
+                schema=schema,
+            )
+
+    return schema, batches()
+
+
+def table_names() -> List[str]:
+    links = {name for fields in LINK_TABLES.values() for name, _, _ in fields.values()}
+    return list(SCHEMAS) + sorted(links)
+
+
+def _table_batches(db: Dict[str, Any], table: str, ppg_id: str, batch_size: int) -> Tuple[Any, Iterator[Any]]:
+    if table in SCHEMAS:
+        return iter_collection_batches(db, table, ppg_id, batch_size)
+    return iter_link_batches(db, table, ppg_id, batch_size)
+
+
+def write_table(db: Dict[str, Any], table: str, ppg_id: str, sink: Any, fmt: str = "parquet", batch_size: int = BATCH_SIZE) -> int:
+    """Stream ``table`` of ``ppg_id`` to ``sink`` (path or file object); returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    schema, batches = _table_batches(db, table, ppg_id, batch_size)
+    rows = 0
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd", use_dictionary=True)
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def export_ppg(db: Dict[str, Any], ppg_id: str, out_dir: Path, fmt: str = "parquet") -> Dict[str, int]:
+    """Write every table of ``ppg_id`` to ``out_dir/<table>.<fmt>``; returns rows per table."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return {table: write_table(db, table, ppg_id, str(out_dir / f"{table}.{FORMATS[fmt]}"), fmt) for table in table_names()}
+
+
+def export_ppg_zip(db: Dict[str, Any], ppg_id: str, fmt: str = "parquet") -> bytes:
+    """Zip with one file per table, for download buttons."""
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        for table in table_names():
+            # Parquet and Arrow are already compressed, so the zip only stores them.
+            with zf.open(f"{ppg_id}/{table}.{FORMATS[fmt]}", "w") as member:
+                write_table(db, table, ppg_id, _SeekableWriter(member), fmt)
+    return out.getvalue()
+
+
+class _SeekableWriter(io.RawIOBase):
+    """Write-only adapter for zip members, which pyarrow expects to report ``tell()``."""
+
+    def __init__(self, raw: Any) -> None:
+        self._raw = raw
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        written = self._raw.write(data)
+        self._position += written
+        return written
+
+    def tell(self) -> int:
+        return self._position
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exporta um PPG para Parquet/Arrow, uma tabela por arquivo.")
+    parser.add_argument("source", help="Banco em JSON (Exportar JSON ou demo_generator.py)")
+    parser.add_argument("--ppg", action="append", help="PPG a exportar (padrão: todos)")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("-o", "--output", default="export", help="Diretório de saída (um subdiretório por PPG)")
+    args = parser.parse_args(argv)
+    db = json.loads(Path(args.source).read_text(encoding="utf-8"))
+    for ppg_id in args.ppg or [ppg["id"] for ppg in db.get("ppgs", [])]:
+        counts = export_ppg(db, ppg_id, Path(args.output) / ppg_id, args.format)
+        print(ppg_id, ", ".join(f"{table}={rows}" for table, rows in counts.items()))
+
+
+__all__ = [
+    "BATCH_SIZE",
+    "FORMATS",
+    "SCHEMAS",
+    "LINK_TABLES",
+    "iter_collection_batches",
+    "iter_link_batches",
+    "table_names",
+    "write_table",
+    "export_ppg",
+    "export_ppg_zip",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Immutable evaluation form versions and their compiled (ready-to-score) form.
+
+A version id is the form id plus a hash of its content, so any edit of an
+``evaluation_forms`` entry yields a new id while old evaluations keep pointing
+at the version they were scored with. Versions used by saved evaluations are
+kept in the ``evaluation_form_versions`` collection; compiled forms are cached
+per process by version id, which is safe because a version never changes.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from demo_store import Change, _collection, _upsert, get_by_id, get_evaluation_forms, register_write_listener
+from instrumentation import instrument_module
+from metrics import record_cache
+
+VERSIONS_COLLECTION = "evaluation_form_versions"
+
+
+def _scale(raw_value: Any) -> float:
+    try:
+        return float(raw_value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _yes_no(raw_value: Any) -> float:
+    return 5.0 if bool(raw_value) else 0.0
+
+
+# response_type -> answer on the 0–5 scale; unknown types are read as numbers.
+RESPONSE_SCORERS: Dict[str, Callable[[Any], float]] = {"scale_1_5": _scale, "yes_no": _yes_no}
+
+
+@dataclass(frozen=True)
+class CompiledForm:
+    version_id: str
+    form_type: str
+    criterion_ids: Tuple[str, ...]
+    weights: Tuple[float, ...]
+    response_types: Tuple[str, ...]
+    scorers: Tuple[Callable[[Any], float], ...]
+    index: Dict[str, int]
+
+    def score(self, scores: Dict[str, Any]) -> float:
+        """Weighted score, same result as ``data.calculate_weighted_score`` on the source form."""
+        get = scores.get
+        return round(
+            sum(weight * scorer(get(criterion)) for criterion, weight, scorer in zip(self.criterion_ids, self.weights, self.scorers)),
+            2,
+        )
+
+
+def form_version_id(form_type: str, form: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(json.dumps(form, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+    return f"{form.get('id') or form_type}@{digest[:12]}"
+
+
+def compile_form(form: Dict[str, Any], form_type: str = "", version_id: str = "") -> CompiledForm:
+    criteria = form.get("criteria", [])
+    ids = tuple(criterion.get("id") for criterion in criteria)
+    return CompiledForm(
+        version_id=version_id,
+        form_type=form_type,
+        criterion_ids=ids,
+        weights=tuple(float(criterion.get("weight", 0)) for criterion in criteria),
+        response_types=tuple(criterion.get("response_type", "scale_1_5") for criterion in criteria),
+        scorers=tuple(RESPONSE_SCORERS.get(criterion.get("response_type", "scale_1_5"), _scale) for criterion in criteria),
+        index={criterion_id: position for position, criterion_id in enumerate(ids)},
+    )
+
+
+# Version id -> compiled form, shared by every session.
+_COMPILED: Dict[str, CompiledForm] = {}
+
+
+def _current_versions() -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    return st.session_state.setdefault("_current_form_versions", {})
+
+
+def current_form_version(form_type: str) -> Optional[str]:
+    """Version id of the live ``evaluation_forms[form_type]``, hashed once per form edit."""
+    cached = _current_versions().get(form_type)
+    if cached is None:
+        form = get_evaluation_forms().get(form_type)
+        if not form:
+            return None
+        cached = (form_version_id(form_type, form), form)
+        _current_versions()[form_type] = cached
+    return cached[0]
+
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    if collection is None or collection == "evaluation_forms":
+        st.session_state.pop("_current_form_versions", None)
+
+
+register_write_listener(_on_write)
+
+
+def register_form_version(form_type: str) -> Optional[str]:
+    """Persist the live form as an immutable version (once) and return its id."""
+    version_id = current_form_version(form_type)
+    if version_id and get_by_id(VERSIONS_COLLECTION, version_id) is None:
+        number = 1 + sum(1 for row in _collection(VERSIONS_COLLECTION) if row.get("form_type") == form_type)
+        _upsert(
+            VERSIONS_COLLECTION,
+            {
+                "id": version_id,
+                "form_type": form_type,
+                "number": number,
+                "form": copy.deepcopy(_current_versions()[form_type][1]),
+                "created_at": datetime.utcnow().isoformat(),
+            },
+        )
+    return version_id
+
+
+def compiled_form(version_id: str) -> CompiledForm:
+    compiled = _COMPILED.get(version_id)
+    record_cache("compiled_form", compiled is not None)
+    if compiled is None:
+        row = get_by_id(VERSIONS_COLLECTION, version_id)
+        if row is not None:
+            form_type, form = row["form_type"], row["form"]
+        else:
+            live = next(((t, f) for t, (v, f) in _current_versions().items() if v == version_id), None)
+            if live is None:
+                raise ValueError(f"Versão de ficha desconhecida: {version_id}")
+            form_type, form = live
+        compiled = compile_form(form, form_type, version_id)
+        _COMPILED[version_id] = compiled
+    return compiled
+
+
+def current_compiled_form(form_type: str) -> Optional[CompiledForm]:
+    version_id = current_form_version(form_type)
+    return compiled_form(version_id) if version_id else None
+
+
+def score_evaluation(evaluation: Dict[str, Any]) -> Optional[float]:
+    """Recompute ``final_score`` with the form version the evaluation was saved with.
+
+    Evaluations saved before versioning have no ``form_version`` and use the live form.
+    """
+    version_id = evaluation.get("form_version") or current_form_version(evaluation.get("form_type") or "")
+    if not version_id:
+        return None
+    return compiled_form(version_id).score(evaluation.get("scores") or {})
+
+
+__all__ = [
+    "VERSIONS_COLLECTION",
+    "RESPONSE_SCORERS",
+    "CompiledForm",
+    "form_version_id",
+    "compile_form",
+    "current_form_version",
+    "register_form_version",
+    "compiled_form",
+    "current_compiled_form",
+    "score_evaluation",
+]
+
+instrument_module(globals())
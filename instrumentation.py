@@ -0,0 +1,241 @@
+"""Opt-in instrumentation of the data layer: call counts, time and rows scanned per rerun.
+
+Enable with ``PPG_INSTRUMENT=true`` (environment or secrets). Public functions of
+``data``, ``provider`` and ``demo_store`` are wrapped by ``instrument_module``;
+while disabled the wrappers only check a thread-local and call through.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import metrics
+
+ENV_FLAG = "PPG_INSTRUMENT"
+HISTORY_SIZE = 20
+PROFILE_TOP = 30
+
+# Each Streamlit session runs its script in its own thread, so the active rerun is thread-local.
+_local = threading.local()
+
+
+def is_enabled() -> bool:
+    flag = os.environ.get(ENV_FLAG)
+    if flag is None and hasattr(st, "secrets"):
+        # Reading st.secrets without a secrets.toml renders an error element on the page.
+        try:
+            if st.secrets.load_if_toml_exists():
+                flag = st.secrets.get(ENV_FLAG)  # type: ignore[attr-defined]
+        except Exception:
+            flag = None
+    return str(flag).lower() == "true"
+
+
+def _current() -> Optional[Dict[str, Any]]:
+    return getattr(_local, "rerun", None)
+
+
+def note_rows(count: int) -> None:
+    """Add ``count`` scanned rows to the innermost instrumented call."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1] += count
+
+
+def instrumented(func: Callable[..., Any], name: Optional[str] = None) -> Callable[..., Any]:
+    label = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        rerun = _current()
+        if rerun is None:
+            return func(*args, **kwargs)
+        stack = _local.stack
+        stack.append(0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            rerun["_last"] = time.perf_counter()
+            elapsed = rerun["_last"] - start
+            rows = stack.pop()
+            entry = rerun["calls"].setdefault(label, {"calls": 0, "seconds": 0.0, "rows_scanned": 0})
+            entry["calls"] += 1
+            entry["seconds"] += elapsed
+            entry["rows_scanned"] += rows
+            if stack:
+                # Nested calls count towards their caller too, like cumulative time.
+                stack[-1] += rows
+
+    wrapper.__wrapped__ = func  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_module(namespace: Dict[str, Any]) -> None:
+    """Wrap the functions a module defines and exports (``__all__`` or non-underscore names)."""
+    module = namespace["__name__"]
+    exported = set(namespace.get("__all__") or [n for n in namespace if not n.startswith("_")])
+    for name in exported:
+        obj = namespace.get(name)
+        if inspect.isfunction(obj) and obj.__module__ == module and not hasattr(obj, "__wrapped__"):
+            namespace[name] = instrumented(obj)
+
+
+def begin_rerun(page: str) -> None:
+    """Start collecting stats for a rerun of ``page`` and render the debug panel.
+
+    Called at the top of every page. A rerun cut short by ``st.stop()`` or
+    ``st.rerun()`` never reached ``end_rerun`` and is closed here, at its last
+    recorded activity.
+    """
+    if metrics.is_enabled():
+        _begin_metrics(page)
+    if not is_enabled():
+        return
+    pending = st.session_state.get("_instrument_active")
+    if pending is not None:
+        _finish(pending, stopped=True)
+    render_debug_panel()
+    rerun: Dict[str, Any] = {"page": page, "started_at": time.time(), "calls": {}}
+    rerun["_start"] = rerun["_last"] = time.perf_counter()
+    rerun["_profiler"] = _start_profiler(st.session_state.pop("_instrument_profile_next", None))
+    st.session_state["_instrument_active"] = rerun
+    _local.rerun = rerun
+    _local.stack = []
+
+
+def end_rerun() -> None:
+    """Close the current rerun; called at the bottom of every page."""
+    started = st.session_state.pop("_metrics_rerun", None)
+    if started is not None:
+        metrics.observe_rerun(started[0], time.perf_counter() - started[1])
+    rerun = _current()
+    if rerun is not None:
+        rerun["_last"] = time.perf_counter()
+        _finish(rerun, stopped=False)
+
+
+def _begin_metrics(page: str) -> None:
+    metrics.start_metrics_server()
+    pending = st.session_state.get("_metrics_rerun")
+    if pending is not None:
+        metrics.count_interrupted_rerun(pending[0])
+    st.session_state["_metrics_rerun"] = (page, time.perf_counter())
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        db = st.session_state.get("db") or {}
+        metrics.touch_session(ctx.session_id, sum(len(rows) for rows in db.values()))
+
+
+def _finish(rerun: Dict[str, Any], stopped: bool) -> None:
+    _local.rerun = None
+    st.session_state.pop("_instrument_active", None)
+    rerun["seconds"] = rerun.pop("_last") - rerun.pop("_start")
+    rerun["stopped"] = stopped
+    profiler = rerun.pop("_profiler", None)
+    if profiler is not None:
+        rerun["profile"] = _stop_profiler(profiler)
+    history: List[Dict[str, Any]] = st.session_state.setdefault("_instrument_history", [])
+    history.append(rerun)
+    del history[:-HISTORY_SIZE]
+
+
+def _start_profiler(kind: Optional[str]) -> Optional[Any]:
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            kind = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    if kind == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    return None
+
+
+def _stop_profiler(profiler: Any) -> str:
+    if hasattr(profiler, "output_text"):
+        profiler.stop()
+        return profiler.output_text(unicode=True)
+    import pstats
+
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return out.getvalue()
+
+
+def last_rerun() -> Optional[Dict[str, Any]]:
+    history = st.session_state.get("_instrument_history") or []
+    return history[-1] if history else None
+
+
+def session_report_json() -> str:
+    """Return the session's recent reruns (without profiler output) as JSON."""
+    history = st.session_state.get("_instrument_history") or []
+    reruns = [{k: v for k, v in rerun.items() if k != "profile"} for rerun in history]
+    return json.dumps({"reruns": reruns}, indent=2, ensure_ascii=False)
+
+
+def render_debug_panel() -> None:
+    """Sidebar panel with the stats of the last completed rerun."""
+    if not is_enabled():
+        return
+    with st.sidebar.expander("Instrumentação", expanded=False):
+        rerun = last_rerun()
+        if rerun is None:
+            st.caption("Nenhuma execução registrada ainda.")
+        else:
+            suffix = " (interrompida por st.stop/st.rerun)" if rerun.get("stopped") else ""
+            st.caption(f"Última execução: {rerun['page']} em {rerun['seconds'] * 1000:.1f} ms{suffix}")
+            rows = [
+                {
+                    "Função": name,
+                    "Chamadas": entry["calls"],
+                    "Tempo (ms)": round(entry["seconds"] * 1000, 3),
+                    "Linhas lidas": entry["rows_scanned"],
+                }
+                for name, entry in sorted(rerun["calls"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+            ]
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+            if rerun.get("profile"):
+                st.code(rerun["profile"])
+        st.download_button(
+            "Relatório JSON da sessão",
+            session_report_json(),
+            file_name="instrumentacao.json",
+            use_container_width=True,
+        )
+        kind = st.radio("Perfilador", ["cprofile", "pyinstrument"], horizontal=True, key="_instrument_profiler")
+        if st.button("Perfilar próxima execução", use_container_width=True):
+            st.session_state["_instrument_profile_next"] = kind
+            st.rerun()
+
+
+__all__ = [
+    "ENV_FLAG",
+    "is_enabled",
+    "note_rows",
+    "instrumented",
+    "instrument_module",
+    "begin_rerun",
+    "end_rerun",
+    "last_rerun",
+    "session_report_json",
+    "render_debug_panel",
+]
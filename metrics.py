@@ -0,0 +1,315 @@
+"""Process-wide metrics exported in the Prometheus text format.
+
+Collection and the side HTTP server are enabled by ``PPG_METRICS_PORT``; the
+server answers ``GET /metrics`` on that port from a daemon thread next to
+Streamlit.
+"""
+from __future__ import annotations
+
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PORT_ENV = "PPG_METRICS_PORT"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SESSION_TTL = 300.0
+
+LabelValues = Tuple[str, ...]
+
+logger = logging.getLogger(__name__)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        parts = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def remove(self, **labels: str) -> None:
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Layout: one cumulative count per bucket, then +Inf count, then sum.
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines: List[str] = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                bucket = self._format_labels(key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket} {count}")
+            bucket = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {state[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+RERUN_SECONDS = Histogram("ppg_rerun_seconds", "Duração dos reruns por página.", ("page",))
+RERUNS_INTERRUPTED = Counter(
+    "ppg_reruns_interrupted_total", "Reruns encerrados por st.stop/st.rerun antes do fim da página.", ("page",)
+)
+SUPABASE_QUERIES = Counter("ppg_supabase_queries_total", "Chamadas ao Supabase via provider.", ("operation", "status"))
+SUPABASE_SECONDS = Histogram("ppg_supabase_query_seconds", "Latência das chamadas ao Supabase.", ("operation",))
+CACHE_REQUESTS = Counter("ppg_cache_requests_total", "Consultas a caches por resultado (hit/miss).", ("cache", "result"))
+ACTIVE_SESSIONS = Gauge("ppg_active_sessions", f"Sessões com atividade nos últimos {int(SESSION_TTL)} s.")
+STORE_ROWS = Gauge("ppg_store_rows", "Linhas nos bancos em memória das sessões ativas (soma).")
+STORE_ROWS_MAX = Gauge("ppg_store_rows_max", "Linhas no maior banco em memória entre as sessões ativas.")
+CHANGE_EVENTS = Counter("ppg_change_events_total", "Eventos de alteração publicados no feed.", ("table", "origin"))
+PUSHED_RERUNS = Counter("ppg_pushed_reruns_total", "Reruns disparados em outras sessões pelo feed de alterações.")
+
+REGISTRY: List[_Metric] = [
+    RERUN_SECONDS,
+    RERUNS_INTERRUPTED,
+    SUPABASE_QUERIES,
+    SUPABASE_SECONDS,
+    CACHE_REQUESTS,
+    ACTIVE_SESSIONS,
+    STORE_ROWS,
+    STORE_ROWS_MAX,
+    CHANGE_EVENTS,
+    PUSHED_RERUNS,
+]
+
+# session_id -> (last seen, rows in its store)
+_sessions: Dict[str, Tuple[float, int]] = {}
+_sessions_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+_server_failed = False
+_server_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return bool(os.environ.get(PORT_ENV))
+
+
+def observe_rerun(page: str, seconds: float) -> None:
+    if is_enabled():
+        RERUN_SECONDS.observe(seconds, page=page)
+
+
+def count_interrupted_rerun(page: str) -> None:
+    if is_enabled():
+        RERUNS_INTERRUPTED.inc(page=page)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    if is_enabled():
+        CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_change_event(table: str, origin: str, reruns: int) -> None:
+    if is_enabled():
+        CHANGE_EVENTS.inc(table=table, origin=origin)
+        if reruns:
+            PUSHED_RERUNS.inc(reruns)
+
+
+def touch_session(session_id: str, store_rows: int) -> None:
+    """Mark ``session_id`` as active and record the size of its in-memory store.
+
+    Store sizes are exported as aggregates over the active sessions, not one
+    series per session.
+    """
+    if not is_enabled():
+        return
+    now = time.monotonic()
+    with _sessions_lock:
+        _sessions[session_id] = (now, store_rows)
+        for sid in [sid for sid, (seen, _) in _sessions.items() if now - seen > SESSION_TTL]:
+            del _sessions[sid]
+        sizes = [rows for _, rows in _sessions.values()]
+    STORE_ROWS.set(sum(sizes))
+    STORE_ROWS_MAX.set(max(sizes, default=0))
+    ACTIVE_SESSIONS.set(len(sizes))
+
+
+def timed_query(operation: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a Supabase call so its count and latency are recorded."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not is_enabled():
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            SUPABASE_SECONDS.observe(time.perf_counter() - start, operation=operation)
+            SUPABASE_QUERIES.inc(operation=operation, status=status)
+
+    return wrapper
+
+
+class TimedModule:
+    """Attribute proxy that wraps every function of a module with ``timed_query``.
+
+    The module is imported on first attribute access, so demo mode never loads it.
+    """
+
+    def __init__(self, module_name: str) -> None:
+        self._module_name = module_name
+        self._module: Any = None
+        self._wrapped: Dict[str, Callable[..., Any]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        attr = getattr(self._module, name)
+        if not callable(attr):
+            return attr
+        if name not in self._wrapped:
+            self._wrapped[name] = timed_query(name, attr)
+        return self._wrapped[name]
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Start the ``/metrics`` server once per process; returns ``None`` when disabled.
+
+    An invalid ``PPG_METRICS_PORT`` or a port already in use is logged once and
+    leaves the server off for the process, so pages keep rendering.
+    """
+    global _server, _server_failed
+    if _server_failed:
+        return None
+    with _server_lock:
+        if _server is None and not _server_failed:
+            try:
+                if port is None:
+                    if not is_enabled():
+                        return None
+                    port = int(os.environ[PORT_ENV])
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            except (OSError, ValueError) as exc:
+                _server_failed = True
+                logger.error("Servidor de métricas desativado (%s=%r): %s", PORT_ENV, os.environ.get(PORT_ENV), exc)
+                return None
+            threading.Thread(target=_server.serve_forever, name="ppg-metrics", daemon=True).start()
+    return _server
+
+
+__all__ = [
+    "PORT_ENV",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "TimedModule",
+    "is_enabled",
+    "observe_rerun",
+    "count_interrupted_rerun",
+    "record_cache",
+    "record_change_event",
+    "touch_session",
+    "timed_query",
+    "render_prometheus",
+    "start_metrics_server",
+]
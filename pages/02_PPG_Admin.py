@@ -5,10 +5,14 @@ from demo_seed import ensure_demo_db
 import streamlit as st
 
 from demo_context import current_ppg, current_profile
-from data import list_ppgs, update_ppg
+from data import VersionConflictError, editing_version, list_ppgs, update_ppg
 from rbac import can
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("Administração do PPG")
+watch_ppg_changes()
 
 st.title("Administração do PPG")
 ppg_id = current_ppg()
@@ -29,10 +33,17 @@ with st.form("ppg_form"):
     nome = st.text_input("Nome do PPG", value=ppg.get("name", ""))
     descricao = st.text_area("Descrição", value=ppg.get("description", ""))
     submitted = st.form_submit_button("Salvar")
+version = editing_version("ppg_form", ppg, submitted)
 
 if submitted:
-    update_ppg(ppg_id, {"name": nome, "description": descricao})
-    st.success("PPG atualizado.")
-    st.rerun()
+    try:
+        update_ppg(ppg_id, {"name": nome, "description": descricao, "version": version})
+    except VersionConflictError as exc:
+        st.error(str(exc))
+    else:
+        st.success("PPG atualizado.")
+        st.rerun()
 
 st.write("Use as demais páginas para gerenciar linhas, projetos e produções.")
+
+end_rerun()
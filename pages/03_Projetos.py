@@ -13,8 +13,12 @@ from data import (
     list_projects,
     list_research_lines,
 )
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("Projetos")
+watch_ppg_changes()
 
 st.title("Projetos")
 ppg_id = current_ppg()
@@ -22,7 +26,7 @@ role = current_profile()
 if not ppg_id:
     st.stop()
 
-lines = {line["id"]: line.get("name") for line in list_research_lines(ppg_id)}
+lines = {line["id"]: line.get("name") for line in list_research_lines(ppg_id, fields=("id", "name"))}
 members = list_ppg_members(ppg_id)
 member_labels = {m["user_id"]: m.get("label") or m.get("display_name") or m.get("name") or m["user_id"] for m in members}
 
@@ -61,3 +65,5 @@ for project in projects:
 
 if role not in ("coordenador", "orientador"):
     st.info("Seu perfil atual permite apenas consulta.")
+
+end_rerun()
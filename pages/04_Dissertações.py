@@ -4,11 +4,23 @@ from __future__ import annotations
 from demo_seed import ensure_demo_db
 import streamlit as st
 
-from data import list_dissertations, list_ppg_members, list_projects, list_research_lines, upsert_dissertation
+from data import (
+    VersionConflictError,
+    editing_version,
+    list_dissertations,
+    list_ppg_members,
+    list_projects,
+    list_research_lines,
+    upsert_dissertation,
+)
 from demo_context import current_ppg, current_profile
 from rbac import can
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("Dissertações")
+watch_ppg_changes()
 
 STATUS_OPTIONS = ["planejado", "em_execucao", "concluido"]
 
@@ -30,10 +42,10 @@ if not ppg_id or not role:
 can_create = can("criar")
 can_edit = can("editar")
 
-projects = list_projects(ppg_id)
+projects = list_projects(ppg_id, fields=("id", "name"))
 project_options = {p["id"]: p.get("name", "") for p in projects}
 
-lines = list_research_lines(ppg_id)
+lines = list_research_lines(ppg_id, fields=("id", "name"))
 line_options = {line["id"]: line.get("name") for line in lines}
 
 members = list_ppg_members(ppg_id)
@@ -91,25 +103,31 @@ if items:
                     )
                     status = status_selector("Status", diss.get("status"), key=f"status-{diss['id']}")
                     submitted = st.form_submit_button("Salvar", use_container_width=True)
+                version = editing_version(f"edit-diss-{diss['id']}", diss, submitted)
                 if submitted and title:
-                    upsert_dissertation(
-                        {
-                            "id": diss["id"],
-                            "ppg_id": ppg_id,
-                            "title": title,
-                            "summary": summary,
-                            "year": int(year),
-                            "project_id": project_id,
-                            "line_id": line_id,
-                            "orientador_id": orientador_id,
-                            "mestrando_id": mestrando_id,
-                            "status": status,
-                            "artigos_ids": diss.get("artigos_ids", []),
-                            "ptts_ids": diss.get("ptts_ids", []),
-                        }
-                    )
-                    st.success("Dissertação atualizada.")
-                    st.rerun()
+                    try:
+                        upsert_dissertation(
+                            {
+                                "id": diss["id"],
+                                "ppg_id": ppg_id,
+                                "title": title,
+                                "summary": summary,
+                                "year": int(year),
+                                "project_id": project_id,
+                                "line_id": line_id,
+                                "orientador_id": orientador_id,
+                                "mestrando_id": mestrando_id,
+                                "status": status,
+                                "artigos_ids": diss.get("artigos_ids", []),
+                                "ptts_ids": diss.get("ptts_ids", []),
+                                "version": version,
+                            }
+                        )
+                    except VersionConflictError as exc:
+                        st.error(str(exc))
+                    else:
+                        st.success("Dissertação atualizada.")
+                        st.rerun()
 else:
     st.info("Nenhuma dissertação cadastrada para este PPG.")
 
@@ -162,3 +180,5 @@ if can_create:
         st.rerun()
 else:
     st.info("Seu perfil não permite cadastrar dissertações.")
+
+end_rerun()
@@ -6,6 +6,8 @@ import streamlit as st
 
 from demo_context import current_ppg, current_profile
 from data import (
+    VersionConflictError,
+    editing_version,
     evaluation_stats,
     list_dissertations,
     list_ppg_members,
@@ -15,8 +17,12 @@ from data import (
     list_target_evaluations,
     upsert_ptt,
 )
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("PTTs")
+watch_ppg_changes()
 
 STATUS_OPTIONS = ["planejado", "em_execucao", "concluido"]
 
@@ -36,9 +42,9 @@ if not ppg_id:
 
 can_create_eval = role in ("coordenador", "orientador")
 
-projects = {p["id"]: p.get("name") for p in list_projects(ppg_id)}
-lines = {line["id"]: line.get("name") for line in list_research_lines(ppg_id)}
-disserts = {d["id"]: d.get("title") for d in list_dissertations(ppg_id)}
+projects = {p["id"]: p.get("name") for p in list_projects(ppg_id, fields=("id", "name"))}
+lines = {line["id"]: line.get("name") for line in list_research_lines(ppg_id, fields=("id", "name"))}
+disserts = {d["id"]: d.get("title") for d in list_dissertations(ppg_id, fields=("id", "title"))}
 people = {m["user_id"]: m.get("display_name") or m.get("label") or m["user_id"] for m in list_ppg_members(ppg_id)}
 
 ptts = list_ptts(ppg_id)
@@ -60,11 +66,16 @@ for ptt in ptts:
         with st.form(f"ptt-status-{ptt['id']}"):
             status = status_selector("Status", ptt.get("status"), key=f"ptt-status-control-{ptt['id']}")
             submitted_status = st.form_submit_button("Atualizar status", use_container_width=True)
+        version = editing_version(f"ptt-status-{ptt['id']}", ptt, submitted_status)
 
         if submitted_status:
-            upsert_ptt({**ptt, "status": status})
-            st.success("Status do PTT atualizado.")
-            st.rerun()
+            try:
+                upsert_ptt({**ptt, "status": status, "version": version})
+            except VersionConflictError as exc:
+                st.error(str(exc))
+            else:
+                st.success("Status do PTT atualizado.")
+                st.rerun()
 
         count, avg, last_score, last_date = evaluation_stats("ptt", ptt["id"])
         st.markdown(
@@ -73,9 +84,7 @@ for ptt in ptts:
         )
 
         st.markdown("**Avaliações**")
-        evaluations = sorted(
-            list_target_evaluations("ptt", ptt["id"]), key=lambda ev: ev.get("created_at", ""), reverse=True
-        )
+        evaluations = list_target_evaluations("ptt", ptt["id"])
         for ev in evaluations:
             st.write(
                 f"Nota final: {ev.get('final_score')} | Data: {ev.get('created_at', 'N/A')} | "
@@ -88,3 +97,5 @@ for ptt in ptts:
             st.page_link("pages/07_Avaliações.py", label="Criar avaliação", icon="✏️")
         else:
             st.info("Perfil atual permite apenas visualizar avaliações.")
+
+end_rerun()
@@ -8,16 +8,22 @@ import streamlit as st
 from demo_context import current_person, current_ppg, current_profile
 from data import (
     add_evaluation_record,
+    add_evaluation_records,
     calculate_weighted_score,
     get_admin_evaluation_forms,
     get_admin_form,
     list_articles,
     list_ppg_members,
     list_ptts,
+    list_recent_evaluations,
     list_target_evaluations,
 )
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("Avaliações")
+watch_ppg_changes()
 
 st.title("Avaliações")
 ppg_id = current_ppg()
@@ -44,6 +50,26 @@ def _current_evaluator_id() -> str | None:
     return coord or current_person() or (members[0]["user_id"] if members else None)
 
 
+with st.expander("Últimas avaliações do PPG"):
+    titles_by_target = {("article", a["id"]): a.get("title") for a in articles} | {("ptt", p["id"]): p.get("title") for p in ptts}
+    recent = list_recent_evaluations(10)
+    if recent:
+        st.dataframe(
+            [
+                {
+                    "Data": ev.get("created_at"),
+                    "Item": titles_by_target.get((ev.get("target_type"), ev.get("target_id")), ev.get("target_id")),
+                    "Avaliador": people_labels.get(ev.get("evaluator_id"), ev.get("evaluator_id", "-")),
+                    "Nota final": ev.get("final_score"),
+                }
+                for ev in recent
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.caption("Nenhuma avaliação registrada.")
+
 targets = {
     "article": {
         "label": "Artigos",
@@ -70,6 +96,88 @@ if not target_cfg["items"]:
     st.info(f"Nenhum {target_cfg['label'].lower()} cadastrado para avaliar.")
     st.stop()
 
+can_submit = role in ("coordenador", "orientador")
+
+
+def render_batch_entry() -> None:
+    """Grid of items x criteria saved with one ``add_evaluation_records`` call."""
+    criteria = form.get("criteria", [])
+    titles = {item["id"]: item.get(target_cfg["title_field"], item["id"]) for item in target_cfg["items"]}
+    st.caption(
+        "Uma linha por item; linhas sem nenhuma nota de 1 a 5 são ignoradas. "
+        "Itens do tipo 'Sim/Não' valem 5 para 'Sim' e 0 para 'Não'."
+    )
+    selected = st.multiselect(
+        f"{target_cfg['label']} desta sessão", options=list(titles), default=list(titles), format_func=titles.get
+    )
+    columns = {"item": st.column_config.TextColumn("Item", disabled=True)}
+    for criterion in criteria:
+        label = f"{criterion.get('name')} ({criterion.get('weight')})"
+        if criterion.get("response_type") == "yes_no":
+            columns[criterion["id"]] = st.column_config.CheckboxColumn(label, help=criterion.get("description"), default=True)
+        else:
+            columns[criterion["id"]] = st.column_config.NumberColumn(
+                label, help=criterion.get("description"), min_value=1, max_value=5, step=1
+            )
+    columns["notes"] = st.column_config.TextColumn("Comentários")
+    grid = [
+        {
+            "target_id": target_id,
+            "item": titles[target_id],
+            **{c["id"]: (True if c.get("response_type") == "yes_no" else None) for c in criteria},
+            "notes": "",
+        }
+        for target_id in selected
+    ]
+    generation = st.session_state.get("_batch_eval_generation", 0)
+    with st.form("batch_evaluation_form"):
+        edited = st.data_editor(
+            grid,
+            column_config=columns,
+            column_order=list(columns),
+            hide_index=True,
+            use_container_width=True,
+            key=f"batch_eval_{target_type}_{generation}",
+        )
+        submitted = st.form_submit_button("Salvar avaliações", type="primary")
+    if not submitted:
+        return
+    scale_ids = [c["id"] for c in criteria if c.get("response_type") != "yes_no"]
+    filled = [row for row in edited if any(row.get(cid) is not None for cid in scale_ids)]
+    if not filled:
+        st.warning("Nenhuma linha preenchida.")
+        return
+    evaluator_id = _current_evaluator_id()
+    payloads = [
+        {
+            "ppg_id": ppg_id,
+            "target_type": target_type,
+            "target_id": row["target_id"],
+            "form_type": target_cfg["form_type"],
+            "scores": {c["id"]: row.get(c["id"]) for c in criteria},
+            "notes": row.get("notes") or None,
+            "evaluator_id": evaluator_id,
+        }
+        for row in filled
+    ]
+    try:
+        saved = add_evaluation_records(payloads)
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+    st.session_state["_batch_eval_generation"] = generation + 1
+    st.success(f"{len(saved)} avaliação(ões) registrada(s).")
+
+
+entry_modes = {"single": "Um item por vez", "batch": "Em lote (comissão)"}
+entry_mode = (
+    st.radio("Modo de registro", list(entry_modes), format_func=entry_modes.get, horizontal=True) if can_submit else "single"
+)
+if entry_mode == "batch":
+    render_batch_entry()
+    end_rerun()
+    st.stop()
+
 options = {item["id"]: item.get(target_cfg["title_field"], item["id"]) for item in target_cfg["items"]}
 selected_id = st.selectbox(
     f"Selecione o {target_cfg['label'][:-1].lower()} a ser avaliado",
@@ -86,7 +194,7 @@ existing = list_target_evaluations(target_type, selected_id)
 
 st.subheader("Avaliações registradas")
 if existing:
-    for ev in sorted(existing, key=lambda item: item.get("created_at", ""), reverse=True):
+    for ev in existing:
         with st.container():
             st.markdown(f"**Nota final:** {ev.get('final_score')} | Criado em: {ev.get('created_at', 'N/A')}")
             evaluator_name = people_labels.get(ev.get("evaluator_id"), ev.get("evaluator_id", "-"))
@@ -96,7 +204,6 @@ if existing:
 else:
     st.info("Nenhuma avaliação registrada para este item.")
 
-can_submit = role in ("coordenador", "orientador")
 if not can_submit:
     st.info("Seu perfil permite apenas visualizar as avaliações.")
 else:
@@ -140,3 +247,5 @@ else:
             st.success(f"Avaliação registrada. Nota final: {final_score}")
             st.session_state.pop("_show_eval_form", None)
             st.rerun()
+
+end_rerun()
@@ -1,10 +1,23 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+from datetime import datetime
+
 from demo_seed import ensure_demo_db
 import streamlit as st
 
+from analytics import GROUPS, criterion_stats, group_stats, inter_evaluator_agreement, score_percentiles
+from change_feed import current_session_id
+from data import get_db, list_people, list_research_lines
+from demo_context import current_profile
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
+from report_jobs import FORMATS, cancel_job, delete_job, job_output, list_jobs, submit_report_job
+from reports import evaluation_average, evaluation_rows, production_report, quadrennials, report_rows
+
 ensure_demo_db()
+begin_rerun("Relatórios")
+watch_ppg_changes()
 
 st.title("Relatórios")
 ppg_id = st.session_state.get("ppg_id")
@@ -13,4 +26,119 @@ if not ppg_id or not role:
     st.warning("Faça login e selecione um PPG para continuar.")
     st.stop()
 
-st.info("Módulo em construção. Use os dados já disponíveis (linhas de pesquisa, SWOT, artigos) para validar o fluxo multi-PPG.")
+report = production_report(ppg_id)
+totals = report["totals"]
+evaluations_total, evaluations_avg = evaluation_average(report)
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Dissertações", totals["dissertations"])
+col2.metric("Artigos", totals["articles"])
+col3.metric("PTTs", totals["ptts"])
+col4.metric("Avaliações", evaluations_total, help=f"Nota média: {evaluations_avg if evaluations_avg is not None else '—'}")
+
+line_labels = {line["id"]: line.get("name", line["id"]) for line in list_research_lines(ppg_id, fields=("id", "name"))}
+people_labels = {person["id"]: person.get("name", person["id"]) for person in list_people(ppg_id)}
+status_labels = {"planejado": "Planejado", "em_execucao": "Em execução", "concluido": "Concluído"}
+target_labels = {"article": "Artigos", "ptt": "PTTs"}
+
+tab_line, tab_orientador, tab_year, tab_status, tab_eval, tab_analysis = st.tabs(
+    ["Por linha", "Por orientador", "Por ano", "Por status", "Avaliações", "Análise das notas"]
+)
+with tab_line:
+    st.dataframe(report_rows(report["line"], line_labels), use_container_width=True, hide_index=True)
+with tab_orientador:
+    st.dataframe(report_rows(report["orientador"], people_labels), use_container_width=True, hide_index=True)
+with tab_year:
+    st.dataframe(report_rows(report["year"]), use_container_width=True, hide_index=True)
+with tab_status:
+    st.dataframe(report_rows(report["status"], status_labels), use_container_width=True, hide_index=True)
+with tab_eval:
+    st.markdown("**Por tipo de produção**")
+    st.dataframe(evaluation_rows(report["evaluations"]["target_type"], target_labels), use_container_width=True, hide_index=True)
+    st.markdown("**Por ano da avaliação**")
+    st.dataframe(evaluation_rows(report["evaluations"]["year"]), use_container_width=True, hide_index=True)
+with tab_analysis:
+    group_labels = {"evaluator": "Avaliador", "line": "Linha", "project": "Projeto", "year": "Ano", "target_type": "Tipo"}
+    by = st.selectbox("Agrupar notas finais por", list(GROUPS), format_func=group_labels.get)
+    stats = group_stats(ppg_id, by)
+    if stats.empty:
+        st.info("Nenhuma avaliação com nota registrada.")
+    else:
+        percentiles = score_percentiles(ppg_id)
+        st.caption("Nota final — " + " · ".join(f"{name}: {value:.1f}" for name, value in percentiles.items()))
+        st.dataframe(
+            stats.drop(columns=GROUPS[by][0]).set_index("label").rename_axis(group_labels[by]).round(2),
+            use_container_width=True,
+        )
+        st.markdown("**Por critério** (respostas de 0 a 5; Sim/Não vale 5/0)")
+        st.dataframe(criterion_stats(ppg_id).set_index("criterion_name").drop(columns="criterion_id").round(2), use_container_width=True)
+        agreement = inter_evaluator_agreement(ppg_id)
+        st.markdown("**Concordância entre avaliadores**")
+        if not agreement["targets"]:
+            st.caption("Nenhuma produção avaliada por mais de um avaliador.")
+        else:
+            col_targets, col_diff, col_icc = st.columns(3)
+            col_targets.metric("Produções com 2+ avaliações", agreement["targets"])
+            col_diff.metric("Diferença média entre avaliadores", f"{agreement['mean_abs_diff']:.2f}")
+            col_icc.metric("ICC(1)", f"{agreement['icc1']:.2f}" if agreement["icc1"] is not None else "—")
+            criteria = agreement["criteria"]
+            if not criteria.empty:
+                st.dataframe(
+                    criteria.set_index("criterion_name")[["pairs", "exact_agreement"]]
+                    .rename(columns={"pairs": "Pares", "exact_agreement": "Concordância exata"})
+                    .round(2),
+                    use_container_width=True,
+                )
+
+st.subheader("Relatório quadrienal")
+st.caption("Gerado em segundo plano: você pode continuar navegando e baixar o arquivo quando ficar pronto.")
+# Demo sessions share the profile names, so without login the jobs belong to the browser session.
+owner = (st.session_state.get("auth") or {}).get("user_id") or f"sessao:{current_session_id() or current_profile()}"
+periods = quadrennials(datetime.now().year)
+with st.form("report_job_form"):
+    col_period, col_format = st.columns(2)
+    period = col_period.selectbox("Quadriênio", periods, format_func=lambda p: f"{p[0]}–{p[1]}")
+    fmt = col_format.radio("Formato", list(FORMATS), format_func=str.upper, horizontal=True)
+    if st.form_submit_button("Gerar relatório"):
+        try:
+            submit_report_job(owner, ppg_id, get_db(), period[0], period[1], fmt)
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.success("Relatório enviado para a fila.")
+
+
+def render_jobs(polling: bool) -> None:
+    jobs = list_jobs(owner=owner, ppg_id=ppg_id)
+    if not jobs:
+        st.caption("Nenhum relatório gerado ainda.")
+    for job in jobs:
+        with st.container(border=True):
+            st.markdown(f"**{job['first_year']}–{job['last_year']}** · {job['format'].upper()} · {job['created_at'][:16].replace('T', ' ')}")
+            if job["status"] in ("queued", "running"):
+                st.progress(job["progress"], text=job["message"])
+                if st.button("Cancelar", key=f"cancel_{job['id']}"):
+                    cancel_job(job["id"], owner)
+                    st.rerun()
+                continue
+            col_main, col_delete = st.columns([4, 1])
+            if job["status"] == "done":
+                output = job_output(job["id"], owner)
+                if output:
+                    col_main.download_button("Baixar", output[1], file_name=output[0], mime=output[2], key=f"download_{job['id']}")
+            elif job["status"] == "failed":
+                col_main.error(job["error"] or "Falha ao gerar o relatório.")
+            else:
+                col_main.caption("Cancelado")
+            if col_delete.button("Excluir", key=f"delete_{job['id']}"):
+                delete_job(job["id"], owner)
+                st.rerun()
+    if polling and not any(job["status"] in ("queued", "running") for job in jobs):
+        # Stop polling once every job finished.
+        st.rerun()
+
+
+active = any(job["status"] in ("queued", "running") for job in list_jobs(owner=owner, ppg_id=ppg_id))
+st.fragment(render_jobs, run_every=2 if active else None)(active)
+
+end_rerun()
@@ -2,13 +2,17 @@
 from __future__ import annotations
 
 from demo_seed import ensure_demo_db
-import pandas as pd
 import streamlit as st
 
 from data import get_admin_evaluation_forms
 from demo_context import current_ppg, current_profile
+from form_versions import current_form_version
+from instrumentation import begin_rerun, end_rerun
+from provider import watch_ppg_changes
 
 ensure_demo_db()
+begin_rerun("Fichas CAPES")
+watch_ppg_changes()
 
 st.title("Fichas CAPES / Critérios Administração")
 ppg_id = current_ppg()
@@ -30,6 +34,7 @@ for key in order:
     if not form:
         continue
     with st.expander(form.get("name", key).strip() or key, expanded=True):
+        st.caption(f"Versão atual: `{current_form_version(key)}` — as avaliações guardam a versão usada na nota.")
         if key == "ptts" and form.get("ptt_types"):
             st.caption("Tipos de PTT contemplados: " + ", ".join(form["ptt_types"]))
 
@@ -43,6 +48,8 @@ for key in order:
                     "Tipo de resposta": criterion.get("response_type"),
                 }
             )
-        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        st.dataframe(rows, use_container_width=True)
 
 st.success("Fichas carregadas com sucesso para visualização.")
+
+end_rerun()
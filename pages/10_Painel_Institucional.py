@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from demo_seed import ensure_demo_db
+import streamlit as st
+
+from instrumentation import begin_rerun, end_rerun
+from provider import institution_summary, supabase_session_active, watch_ppg_changes
+from rbac import can
+from reports import all_production_reports, consolidated_rows, evaluation_rows, merge_reports, report_rows
+
+ensure_demo_db()
+begin_rerun("Painel institucional")
+watch_ppg_changes()
+
+st.title("Painel institucional")
+if not can("admin"):
+    st.warning("Apenas a coordenação pode ver os dados consolidados dos PPGs.")
+    st.stop()
+
+refresh = st.button("Atualizar dados")
+summaries = institution_summary(refresh=refresh)
+if not summaries:
+    st.info("Nenhum PPG visível para este usuário.")
+    st.stop()
+
+rows = consolidated_rows(summaries)
+total = rows[-1]
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("PPGs", len(summaries))
+col2.metric("Dissertações", total["Dissertações"])
+col3.metric("Artigos", total["Artigos"])
+col4.metric("PTTs", total["PTTs"])
+col5.metric("Avaliações", total["Avaliações"], help=f"Nota média: {total['Nota média'] if total['Nota média'] is not None else '—'}")
+
+st.subheader("Por PPG")
+st.dataframe(rows, use_container_width=True, hide_index=True)
+
+if supabase_session_active():
+    # The ``ppg_summary`` view only has the per-PPG totals.
+    end_rerun()
+    st.stop()
+
+institution = merge_reports(all_production_reports().values())
+status_labels = {"planejado": "Planejado", "em_execucao": "Em execução", "concluido": "Concluído"}
+target_labels = {"article": "Artigos", "ptt": "PTTs"}
+tab_year, tab_status, tab_eval = st.tabs(["Produção por ano", "Produção por status", "Avaliações"])
+with tab_year:
+    st.dataframe(report_rows(institution["year"]), use_container_width=True, hide_index=True)
+with tab_status:
+    st.dataframe(report_rows(institution["status"], status_labels), use_container_width=True, hide_index=True)
+with tab_eval:
+    st.markdown("**Por tipo de produção**")
+    st.dataframe(evaluation_rows(institution["evaluations"]["target_type"], target_labels), use_container_width=True, hide_index=True)
+    st.markdown("**Por ano da avaliação**")
+    st.dataframe(evaluation_rows(institution["evaluations"]["year"]), use_container_width=True, hide_index=True)
+
+end_rerun()
@@ -0,0 +1,65 @@
+"""Column projection and keyset pagination for list functions.
+
+A page is ``fields`` (only those columns) of the rows ordered by
+``(created_at, id)``, starting after ``after``, the cursor of the last row of
+the previous page (``page_cursor``), and at most ``limit`` rows. With Supabase
+``provider`` turns the same arguments into a select of those columns with a
+keyset filter, served by the ``(ppg_id, created_at, id)`` indexes in
+``db/ddl.sql``. ``page_rows`` applies them to rows already in memory (the demo
+store and the provider's demo mode).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ``(created_at, id)`` of the last row of a page; pass it as ``after`` to get the next one.
+Cursor = Tuple[str, str]
+PAGE_KEY = ("created_at", "id")
+
+
+def _key(row: Dict[str, Any]) -> Cursor:
+    return (str(row.get("created_at") or ""), str(row.get("id")))
+
+
+def page_cursor(rows: List[Dict[str, Any]]) -> Optional[Cursor]:
+    if not rows:
+        return None
+    return _key(rows[-1])
+
+
+def is_paged(fields: Optional[Sequence[str]], after: Optional[Cursor], limit: Optional[int]) -> bool:
+    return fields is not None or after is not None or limit is not None
+
+
+def select_columns(fields: Optional[Sequence[str]], paginated: bool) -> List[str]:
+    if fields is None:
+        return ["*"]
+    columns = list(dict.fromkeys(fields))
+    # The cursor needs the page key even when the page does not show it.
+    return columns + [key for key in PAGE_KEY if paginated and key not in columns]
+
+
+def page_rows(
+    rows: List[Dict[str, Any]],
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """In-memory equivalent of the provider's Supabase page over ``rows``."""
+    if not is_paged(fields, after, limit):
+        return rows
+    paginated = after is not None or limit is not None
+    if paginated:
+        rows = sorted(rows, key=_key)
+        if after is not None:
+            cursor = tuple(after)
+            rows = [row for row in rows if _key(row) > cursor]
+        if limit is not None:
+            rows = rows[:limit]
+    if fields is not None:
+        columns = select_columns(fields, paginated)
+        rows = [{column: row.get(column) for column in columns} for row in rows]
+    return rows
+
+
+__all__ = ["Cursor", "PAGE_KEY", "is_paged", "page_cursor", "page_rows", "select_columns"]
@@ -0,0 +1,244 @@
+"""Per-PPG datasets of the store, prefetched for every program the user can switch to.
+
+One pass over each collection splits its rows by ``ppg_id``, so the lists of
+all PPGs are ready at once and a switch of PPG reads them instead of scanning
+the collections again. The partitions are built once per session and then
+kept in sync by a store write listener, like ``reports``. When the user can
+switch between programs, ``warm_up`` builds the partitions and the production
+reports of every program in a background thread, so a switch only reads them.
+The thread scans the store under ``read_lock`` into dicts of its own and
+never touches the session; the script thread swaps the result in with one
+assignment each, and only if no write happened since the scan.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import streamlit as st
+
+import rbac
+from demo_context import current_person, current_ppg, set_person, set_ppg
+from demo_store import Change, _collection, _with_standard_status, register_write_listener, store_revision
+from instrumentation import instrument_module
+from metrics import record_cache
+from paging import Cursor, page_rows
+from store_locks import read_lock, store_locks
+
+PARTITIONED = ("people", "research_lines", "projects", "dissertations", "articles", "ptts", "evaluations")
+
+
+def build_datasets(db: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Partitions of the session store, or of ``db`` (the warm-up thread has no session)."""
+    datasets: Dict[str, Any] = {"ppgs": {}}
+    with read_lock(*PARTITIONED, store=db):
+        datasets["revision"] = store_locks(db).revision
+        for collection in PARTITIONED:
+            for row in db.get(collection, []) if db is not None else _collection(collection):
+                datasets["ppgs"].setdefault(row.get("ppg_id"), {}).setdefault(collection, []).append(row)
+    return datasets
+
+
+def datasets() -> Dict[str, Any]:
+    """Return the session's partitions, rebuilding them only after a full reload or a missed write."""
+    _adopt_warm_up()
+    current = st.session_state.get("_ppg_datasets")
+    hit = current is not None and current["revision"] == store_revision()
+    record_cache("ppg_datasets", hit)
+    if not hit:
+        current = build_datasets()
+        st.session_state["_ppg_datasets"] = current
+    return current
+
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    current = st.session_state.get("_ppg_datasets")
+    # Stale partitions (missed write or full reload) are rebuilt on the next read.
+    if current is None or collection is None or current["revision"] != old_revision:
+        return
+    if collection in PARTITIONED:
+        for before, after in changes:
+            if before is not None and (after is None or before.get("ppg_id") != after.get("ppg_id")):
+                rows = current["ppgs"].get(before.get("ppg_id"), {}).get(collection, [])
+                # ``_patch`` updates rows in place, so the stored row may be ``after`` itself.
+                target = after if after is not None else before
+                for index, row in enumerate(rows):
+                    if row is target or row.get("id") == before.get("id"):
+                        del rows[index]
+                        break
+            if after is not None and (before is None or before.get("ppg_id") != after.get("ppg_id")):
+                current["ppgs"].setdefault(after.get("ppg_id"), {}).setdefault(collection, []).append(after)
+    current["revision"] = new_revision
+
+
+register_write_listener(_on_write)
+
+
+def ppg_rows(collection: str, ppg_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Rows of ``collection`` in ``ppg_id`` in store order; a row moved from another PPG goes last.
+
+    The list is new, the rows are shared with the store.
+    """
+    return list(datasets()["ppgs"].get(ppg_id, {}).get(collection, ()))
+
+
+def ppg_count(collection: str, ppg_id: Optional[str]) -> int:
+    return len(datasets()["ppgs"].get(ppg_id, {}).get(collection, ()))
+
+
+def list_people(ppg_id: str, role: Optional[str] = None) -> List[Dict[str, Any]]:
+    people = ppg_rows("people", ppg_id)
+    if role:
+        return [p for p in people if p.get("role") == role]
+    return people
+
+
+# ``fields``/``after``/``limit`` page the lists like the provider's (see ``paging``);
+# selectors ask only for the id and label columns.
+
+def list_lines(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    return page_rows(ppg_rows("research_lines", ppg_id), fields, after, limit)
+
+
+def list_projects(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    return page_rows(ppg_rows("projects", ppg_id), fields, after, limit)
+
+
+def list_dissertations(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    rows = [_with_standard_status(row, "dissertations") for row in ppg_rows("dissertations", ppg_id)]
+    return page_rows(rows, fields, after, limit)
+
+
+def list_articles(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    rows = [_with_standard_status(row, "articles") for row in ppg_rows("articles", ppg_id)]
+    return page_rows(rows, fields, after, limit)
+
+
+def list_ptts(
+    ppg_id: str, fields: Optional[Sequence[str]] = None, after: Optional[Cursor] = None, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    rows = [_with_standard_status(row, "ptts") for row in ppg_rows("ptts", ppg_id)]
+    return page_rows(rows, fields, after, limit)
+
+
+def list_evaluations(
+    target_type: Optional[str] = None, target_id: Optional[str] = None, ppg_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    ppg = ppg_id or current_ppg() or (_collection("ppgs") or [{}])[0].get("id")
+    evaluations = ppg_rows("evaluations", ppg)
+    if target_type:
+        evaluations = [ev for ev in evaluations if ev.get("target_type") == target_type]
+    if target_id:
+        evaluations = [ev for ev in evaluations if ev.get("target_id") == target_id]
+    return evaluations
+
+
+# -- Switching ------------------------------------------------------------
+
+def switchable_ppgs() -> List[Dict[str, Any]]:
+    """PPGs the session can switch to: the user's memberships when signed in, else every PPG."""
+    ppgs = _collection("ppgs")
+    user_id = rbac.cached_user()
+    if user_id is None:
+        return list(ppgs)
+    from provider import load_memberships  # provider pulls in the Supabase layer; only needed once signed in
+
+    member_of = {str(m.get("ppg_id")) for m in load_memberships(user_id)}
+    return [ppg for ppg in ppgs if str(ppg.get("id")) in member_of]
+
+
+def switch_ppg(ppg_id: str) -> None:
+    """Make ``ppg_id`` the current PPG; its lists come from the prefetched partitions."""
+    if ppg_id == current_ppg():
+        return
+    set_ppg(ppg_id)
+    st.session_state["ppg_id"] = ppg_id
+    _adopt_warm_up()
+    # The selected person belongs to the previous program.
+    if current_person() and not any(p.get("id") == current_person() for p in ppg_rows("people", ppg_id)):
+        set_person(None)
+
+
+class _WarmUp:
+    """One background build of the partitions and reports of every PPG in ``db``."""
+
+    def __init__(self, db: Dict[str, Any]) -> None:
+        self.db = db
+        # ``(partitions, reports)``, set once when the scan is done.
+        self.result: Optional[Tuple[Dict[str, Any], Dict[str, Any]]] = None
+        self.thread = threading.Thread(target=self._run, name="ppg-warm-up", daemon=True)
+
+    def _run(self) -> None:
+        from reports import PRODUCTION_COLLECTIONS, build_all_reports
+
+        # One read lock over every scanned collection: both builds see the same revision.
+        with read_lock("ppgs", *PARTITIONED, *PRODUCTION_COLLECTIONS, store=self.db):
+            partitions = build_datasets(self.db)
+            reports = build_all_reports(self.db)
+        self.result = (partitions, reports)
+
+
+def _adopt_warm_up() -> Optional[_WarmUp]:
+    """Swap in a finished warm-up if the store is still at its revision; return the running one."""
+    job = st.session_state.get("_ppg_warm_up")
+    if job is None or job.thread.is_alive():
+        return job
+    del st.session_state["_ppg_warm_up"]
+    # A write since the scan (or a failed build) leaves the caches to rebuild on their next read.
+    if job.result is not None and job.result[0]["revision"] == store_revision():
+        from reports import install_reports
+
+        partitions, reports = job.result
+        st.session_state["_ppg_datasets"] = partitions
+        install_reports(reports, partitions["revision"])
+    return None
+
+
+def warm_up() -> Optional[threading.Thread]:
+    """Build the partitions and production reports of every PPG in a background thread.
+
+    Called by the sidebar on every rerun: it swaps in a finished build, then
+    starts a new one if either cache is stale and none is running for the
+    session. Both are then kept current by their write listeners.
+    """
+    from reports import reports_current
+
+    running = _adopt_warm_up()
+    if running is not None:
+        return running.thread
+    current = st.session_state.get("_ppg_datasets")
+    if current is not None and current["revision"] == store_revision() and reports_current():
+        return None
+    job = _WarmUp(st.session_state["db"])
+    st.session_state["_ppg_warm_up"] = job
+    job.thread.start()
+    return job.thread
+
+
+__all__ = [
+    "PARTITIONED",
+    "build_datasets",
+    "datasets",
+    "ppg_rows",
+    "ppg_count",
+    "list_people",
+    "list_lines",
+    "list_projects",
+    "list_dissertations",
+    "list_articles",
+    "list_ptts",
+    "list_evaluations",
+    "switchable_ppgs",
+    "switch_ppg",
+    "warm_up",
+]
+
+instrument_module(globals())
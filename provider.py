@@ -2,13 +2,27 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
 
 import streamlit as st
 
-import data as supabase_data
+import change_feed
 import demo_data
-from auth import AuthState, logout as supabase_logout
+import rbac
+from demo_context import current_ppg
+from demo_store import VersionConflictError
+from instrumentation import instrument_module
+from metrics import TimedModule, record_cache
+from paging import Cursor, is_paged, page_cursor, page_rows, select_columns
+
+if TYPE_CHECKING:
+    from auth import AuthState
+
+# Supabase calls go through these proxies so /metrics reports their count and latency.
+# ``data`` and ``auth`` (and with it the Supabase client) are only imported on first use.
+supabase_data = TimedModule("data")
+supabase_auth = TimedModule("auth")
 
 
 def is_demo_mode() -> bool:
@@ -28,31 +42,176 @@ def _ensure_demo_seeded() -> None:
 # -- Auth helpers ---------------------------------------------------------
 
 def set_demo_auth(user_id: str, email: str) -> AuthState:
-    auth_state = AuthState(user_id=user_id, email=email, access_token="demo")
+    from auth import AuthState
+
+    auth_state = AuthState(user_id=user_id, email=email, access_token="demo", refresh_token="demo")
     st.session_state["auth"] = {
         "user_id": auth_state.user_id,
         "email": auth_state.email,
         "access_token": auth_state.access_token,
     }
+    load_memberships(user_id, refresh=True)
+    return auth_state
+
+
+def login(email: str, password: str) -> Optional[AuthState]:
+    """Sign in to Supabase and load the user's roles in all PPGs once for the session."""
+    auth_state = supabase_auth.login(email, password)
+    if auth_state is not None:
+        load_memberships(auth_state.user_id, refresh=True)
     return auth_state
 
 
 def logout() -> None:
+    rbac.invalidate_roles()
+    # The realtime channels must stop using this session's token.
+    change_feed.unwatch(change_feed.current_session_id())
     if is_demo_mode():
         st.session_state.pop("auth", None)
         st.session_state.pop("ppg_id", None)
         st.session_state.pop("role", None)
         return
-    supabase_logout()
+    supabase_auth.logout()
+
+
+def _supabase_access_token() -> Optional[str]:
+    """Access token of a signed-in Supabase user, ``None`` for demo sessions.
+
+    The token is checked first: ``is_demo_mode`` reads ``st.secrets``, which
+    fails when the app runs without a secrets file.
+    """
+    access_token = (st.session_state.get("auth") or {}).get("access_token")
+    if not access_token or access_token == "demo" or is_demo_mode():
+        return None
+    return access_token
+
+
+def supabase_session_active() -> bool:
+    return _supabase_access_token() is not None
+
+
+def _setting(name: str) -> Optional[str]:
+    """Environment variable or secret, without failing when there is no secrets file."""
+    value = os.environ.get(name)
+    if value is None and hasattr(st, "secrets"):
+        try:
+            if st.secrets.load_if_toml_exists():
+                value = st.secrets.get(name)  # type: ignore[attr-defined]
+        except Exception:
+            value = None
+    return value
+
+
+def supabase_login_available() -> bool:
+    """Whether the app can offer the Supabase sign-in: not in demo mode and with URL and key configured."""
+    if str(_setting("DEMO_MODE")).lower() == "true":
+        return False
+    return bool(_setting("SUPABASE_URL") and _setting("SUPABASE_ANON_KEY"))
+
+
+# -- Change feed ----------------------------------------------------------
+
+def watch_ppg_changes() -> List[Dict[str, Any]]:
+    """Subscribe this session to row changes of its PPG and apply the ones it missed.
+
+    Writes made elsewhere rerun this session instead of it having to poll: with
+    Supabase they arrive through realtime, in demo mode through the in-process bus.
+    """
+    ppg_id = current_ppg() or st.session_state.get("ppg_id")
+    if not ppg_id or not change_feed.is_enabled():
+        return []
+    user_id = rbac.cached_user()
+    events = change_feed.sync_session(ppg_id, user_id)
+    # Realtime needs a signed-in Supabase user: RLS filters the events by membership.
+    # Started after ``sync_session``, which registers this session (and its token) as a watcher.
+    access_token = _supabase_access_token()
+    if access_token:
+        from auth import _supabase_key, _supabase_url
+
+        url, key = _supabase_url(), _supabase_key()
+        if url and key:
+            change_feed.start_realtime(ppg_id, url, key, access_token)
+            if user_id:
+                # The user's memberships in every PPG, not only the current one.
+                change_feed.start_realtime(change_feed.user_feed(user_id), url, key, access_token)
+    if rbac.touches_cached_user(events):
+        load_memberships(rbac.cached_user(), refresh=True)
+    return events
+
+
+# -- Conditional writes ---------------------------------------------------
+
+def _save_record(table: str, payload: Dict[str, Any], expected_updated_at: Optional[str] = None) -> Dict[str, Any]:
+    """Insert or update a Supabase row.
+
+    With ``expected_updated_at`` (the value read with the row) the update only
+    applies while the row is unchanged; the ``bump_row_version`` trigger moves
+    ``updated_at`` on every update, so a concurrent save matches no row and
+    raises ``VersionConflictError`` instead of being overwritten.
+    """
+    if expected_updated_at is None or not payload.get("id"):
+        return supabase_data.upsert_record(table, payload)
+    client = supabase_auth.get_authed_client()
+    if client is None:
+        raise RuntimeError("Sessão expirada. Faça login novamente.")
+    response = (
+        client.table(table).update(payload).eq("id", payload["id"]).eq("updated_at", expected_updated_at).execute()
+    )
+    if not response.data:
+        raise VersionConflictError(table, payload["id"], expected_updated_at)
+    return response.data[0]
+
+
+# -- Projection and keyset pagination ------------------------------------
+
+def _select_page(
+    table: str, ppg_id: str, fields: Optional[Sequence[str]], after: Optional[Cursor], limit: Optional[int]
+) -> List[Dict[str, Any]]:
+    """Only the requested columns of one PPG, in ``(created_at, id)`` order, starting after ``after``.
+
+    ``table`` is the one the data module's list function reads, so a page has
+    the same rows and columns as the full list. The keyset condition seeks into
+    the ``(ppg_id, created_at, id)`` index instead of skipping ``offset`` rows.
+    """
+    client = supabase_auth.get_authed_client()
+    if client is None:
+        raise RuntimeError("Sessão expirada. Faça login novamente.")
+    paginated = after is not None or limit is not None
+    query = client.table(table).select(",".join(select_columns(fields, paginated))).eq("ppg_id", ppg_id)
+    if after is not None:
+        created_at, row_id = after
+        query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+    if paginated:
+        query = query.order("created_at").order("id")
+    if limit is not None:
+        query = query.limit(limit)
+    return query.execute().data or []
 
 
 # -- Memberships ----------------------------------------------------------
 
-def load_memberships(user_id: str) -> List[Dict[str, Any]]:
+def load_memberships(user_id: str, refresh: bool = False) -> List[Dict[str, Any]]:
+    """Memberships of ``user_id`` in every PPG, read once per session and kept in ``rbac``."""
+    cached = None if refresh else rbac.cached_memberships(user_id)
+    record_cache("memberships", cached is not None)
+    if cached is not None:
+        return cached
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_memberships(user_id)
-    return supabase_data.list_memberships(user_id)
+        memberships = demo_data.list_memberships(user_id)
+    else:
+        memberships = supabase_data.list_memberships(user_id)
+    rbac.cache_memberships(user_id, memberships)
+    return memberships
+
+
+def member_role(ppg_id: Optional[str] = None) -> Optional[str]:
+    """Role of the signed-in user in ``ppg_id`` (default: the current PPG), from the session cache."""
+    return rbac.role_for(ppg_id)
+
+
+def has_permission(action: str, ppg_id: Optional[str] = None) -> bool:
+    return rbac.can(action, ppg_id)
 
 
 def list_ppg_memberships(ppg_id: str) -> List[Dict[str, Any]]:
@@ -74,13 +233,51 @@ def user_management_available() -> bool:
     return supabase_data.user_management_available()
 
 
+# -- Institution dashboard ------------------------------------------------
+
+SUMMARY_TTL = float(os.environ.get("PPG_SUMMARY_TTL", "60"))
+
+
+def institution_summary(refresh: bool = False) -> List[Dict[str, Any]]:
+    """Production counts and evaluation totals of every PPG visible to the session.
+
+    One row per PPG, shaped like the ``public.ppg_summary`` view. Signed in to
+    Supabase, the view (one ``GROUP BY`` per table, filtered by RLS) is read
+    at most every ``PPG_SUMMARY_TTL`` seconds. Otherwise the rows come from
+    ``reports.all_production_reports``, built in one pass over the store and
+    then kept current by its write listener.
+    """
+    if _supabase_access_token() is None:
+        from demo_store import _collection
+        from reports import all_production_reports, ppg_summary
+
+        names = {ppg["id"]: ppg.get("name") for ppg in _collection("ppgs")}
+        return [ppg_summary(ppg_id, names.get(ppg_id), report) for ppg_id, report in all_production_reports().items()]
+    cached = st.session_state.get("_institution_summary")
+    if not refresh and cached is not None and time.monotonic() - cached[0] < SUMMARY_TTL:
+        return cached[1]
+    client = supabase_auth.get_authed_client()
+    if client is None:
+        raise RuntimeError("Sessão expirada. Faça login novamente.")
+    rows = client.table("ppg_summary").select("*").execute().data or []
+    st.session_state["_institution_summary"] = (time.monotonic(), rows)
+    return rows
+
+
 # -- Research lines, SWOT, objectives ------------------------------------
 
-def list_research_lines(ppg_id: str) -> List[Dict[str, Any]]:
+def list_research_lines(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_research_lines(ppg_id)
-    return supabase_data.list_linhas(ppg_id)
+        return page_rows(demo_data.list_research_lines(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_linhas(ppg_id)
+    return _select_page("linhas_pesquisa", ppg_id, fields, after, limit)
 
 
 def add_research_line(ppg_id: str, nome: str, descricao: str) -> Dict[str, Any]:
@@ -141,21 +338,35 @@ def remove_objective(record_id: Any) -> None:
 
 # -- Projects, dissertations, outputs ------------------------------------
 
-def list_projects(ppg_id: str) -> List[Dict[str, Any]]:
+def list_projects(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_projects(ppg_id)
-    return supabase_data.list_projetos(ppg_id)
+        return page_rows(demo_data.list_projects(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_projetos(ppg_id)
+    return _select_page("projetos", ppg_id, fields, after, limit)
 
 
-def upsert_project(ppg_id: str, titulo: str, lider: str, status: str, project_id: Optional[str] = None) -> Dict[str, Any]:
+def upsert_project(
+    ppg_id: str,
+    titulo: str,
+    lider: str,
+    status: str,
+    project_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> Dict[str, Any]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.upsert_project(ppg_id, titulo, lider, status, project_id)
+        return demo_data.upsert_project(ppg_id, titulo, lider, status, project_id, expected_updated_at)
     payload = {"ppg_id": ppg_id, "titulo": titulo, "lider": lider, "status": status}
     if project_id:
         payload["id"] = project_id
-    return supabase_data.upsert_record("projetos", payload)
+    return _save_record("projetos", payload, expected_updated_at)
 
 
 def remove_project(record_id: Any) -> None:
@@ -165,11 +376,18 @@ def remove_project(record_id: Any) -> None:
     supabase_data.delete_record("projetos", record_id)
 
 
-def list_dissertations(ppg_id: str) -> List[Dict[str, Any]]:
+def list_dissertations(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_dissertations(ppg_id)
-    return supabase_data.list_dissertacoes(ppg_id)
+        return page_rows(demo_data.list_dissertations(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_dissertacoes(ppg_id)
+    return _select_page("dissertacoes", ppg_id, fields, after, limit)
 
 
 def upsert_dissertation(
@@ -179,10 +397,13 @@ def upsert_dissertation(
     orientador: str,
     defesa_prevista: str,
     dissertation_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
 ) -> Dict[str, Any]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.upsert_dissertation(ppg_id, titulo, autor, orientador, defesa_prevista, dissertation_id)
+        return demo_data.upsert_dissertation(
+            ppg_id, titulo, autor, orientador, defesa_prevista, dissertation_id, expected_updated_at
+        )
     payload = {
         "ppg_id": ppg_id,
         "titulo": titulo,
@@ -192,7 +413,7 @@ def upsert_dissertation(
     }
     if dissertation_id:
         payload["id"] = dissertation_id
-    return supabase_data.upsert_record("dissertacoes", payload)
+    return _save_record("dissertacoes", payload, expected_updated_at)
 
 
 def remove_dissertation(record_id: Any) -> None:
@@ -202,21 +423,36 @@ def remove_dissertation(record_id: Any) -> None:
     supabase_data.delete_record("dissertacoes", record_id)
 
 
-def list_articles(ppg_id: str) -> List[Dict[str, Any]]:
+def list_articles(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_articles(ppg_id)
-    return supabase_data.list_articles(ppg_id)
+        return page_rows(demo_data.list_articles(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_articles(ppg_id)
+    return _select_page("artigos", ppg_id, fields, after, limit)
 
 
-def upsert_article(ppg_id: str, titulo: str, autores: str, ano: int, status: str, article_id: Optional[str] = None) -> Dict[str, Any]:
+def upsert_article(
+    ppg_id: str,
+    titulo: str,
+    autores: str,
+    ano: int,
+    status: str,
+    article_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> Dict[str, Any]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.upsert_article(ppg_id, titulo, autores, ano, status, article_id)
+        return demo_data.upsert_article(ppg_id, titulo, autores, ano, status, article_id, expected_updated_at)
     payload = {"ppg_id": ppg_id, "titulo": titulo, "autores": autores, "ano": ano, "status": status}
     if article_id:
         payload["id"] = article_id
-    return supabase_data.upsert_record("artigos", payload)
+    return _save_record("artigos", payload, expected_updated_at)
 
 
 def remove_article(record_id: Any) -> None:
@@ -226,21 +462,35 @@ def remove_article(record_id: Any) -> None:
     supabase_data.delete_record("artigos", record_id)
 
 
-def list_ptts(ppg_id: str) -> List[Dict[str, Any]]:
+def list_ptts(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_ptts(ppg_id)
-    return supabase_data.list_ptts(ppg_id)
+        return page_rows(demo_data.list_ptts(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_ptts(ppg_id)
+    return _select_page("ptts", ppg_id, fields, after, limit)
 
 
-def upsert_ptt(ppg_id: str, tema: str, responsavel: str, status: str, ptt_id: Optional[str] = None) -> Dict[str, Any]:
+def upsert_ptt(
+    ppg_id: str,
+    tema: str,
+    responsavel: str,
+    status: str,
+    ptt_id: Optional[str] = None,
+    expected_updated_at: Optional[str] = None,
+) -> Dict[str, Any]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.upsert_ptt(ppg_id, tema, responsavel, status, ptt_id)
+        return demo_data.upsert_ptt(ppg_id, tema, responsavel, status, ptt_id, expected_updated_at)
     payload = {"ppg_id": ppg_id, "tema": tema, "responsavel": responsavel, "status": status}
     if ptt_id:
         payload["id"] = ptt_id
-    return supabase_data.upsert_record("ptts", payload)
+    return _save_record("ptts", payload, expected_updated_at)
 
 
 def remove_ptt(record_id: Any) -> None:
@@ -300,11 +550,18 @@ def remove_criterion(record_id: Any) -> None:
     supabase_data.delete_record("ficha_criterios", record_id)
 
 
-def list_evaluations(ppg_id: str) -> List[Dict[str, Any]]:
+def list_evaluations(
+    ppg_id: str,
+    fields: Optional[Sequence[str]] = None,
+    after: Optional[Cursor] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
     if is_demo_mode():
         _ensure_demo_seeded()
-        return demo_data.list_evaluations(ppg_id)
-    return supabase_data.list_avaliacoes(ppg_id)
+        return page_rows(demo_data.list_evaluations(ppg_id), fields, after, limit)
+    if not is_paged(fields, after, limit):
+        return supabase_data.list_avaliacoes(ppg_id)
+    return _select_page("avaliacoes", ppg_id, fields, after, limit)
 
 
 def create_evaluation(
@@ -350,3 +607,5 @@ def delete_generic(table: str, record_id: Any) -> None:
 
 
 __all__ = [name for name in globals() if not name.startswith("_")]
+
+instrument_module(globals())
@@ -1,9 +1,18 @@
-"""Simple role-based access control helper for the demo context."""
+"""Simple role-based access control helper for the demo context.
+
+A signed-in session keeps its user's memberships in ``st.session_state``
+(``cache_memberships``): one entry per PPG with the role and its permission
+set. ``provider`` fills the cache at login and refreshes it when a membership
+change event arrives, so ``can`` answers without a query. Sessions without a
+cache (the demo app) use the profile picked in the sidebar.
+"""
 from __future__ import annotations
 
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
 import streamlit as st
 
-from demo_context import current_profile
+from demo_context import current_ppg, current_profile
 
 
 ROLE_PERMS = {
@@ -11,13 +20,80 @@ ROLE_PERMS = {
     "orientador": {"ver", "criar", "editar"},
     "mestrando": {"ver", "criar", "editar"},
 }
+_PERMS: Dict[str, FrozenSet[str]] = {role: frozenset(perms) for role, perms in ROLE_PERMS.items()}
+_NO_PERMS: FrozenSet[str] = frozenset()
+
+ROLE_CACHE_KEY = "_role_cache"
+
+
+def cache_memberships(user_id: str, memberships: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    """Store ``user_id``'s memberships for this session and return ``{ppg_id: role}``."""
+    rows = list(memberships)
+    roles = {str(m["ppg_id"]): str(m["role"]) for m in rows if m.get("ppg_id") and m.get("role")}
+    st.session_state[ROLE_CACHE_KEY] = {"user_id": user_id, "memberships": rows, "roles": roles}
+    return roles
+
+
+def cached_memberships(user_id: str) -> Optional[List[Dict[str, Any]]]:
+    cache = st.session_state.get(ROLE_CACHE_KEY)
+    if cache is None or cache["user_id"] != user_id:
+        return None
+    return cache["memberships"]
+
+
+def cached_user() -> Optional[str]:
+    cache = st.session_state.get(ROLE_CACHE_KEY)
+    return cache["user_id"] if cache is not None else None
 
 
-def can(action: str) -> bool:
-    role = current_profile() if hasattr(st, "session_state") else None
-    if not role:
+def invalidate_roles() -> None:
+    st.session_state.pop(ROLE_CACHE_KEY, None)
+
+
+def touches_cached_user(events: Iterable[Dict[str, Any]]) -> bool:
+    """Whether any ``memberships`` change event may concern the cached user.
+
+    Supabase DELETE events only carry the primary key, so a row without
+    ``user_id`` counts as a match.
+    """
+    user_id = cached_user()
+    if user_id is None:
         return False
-    return action in ROLE_PERMS.get(role, set())
+    for event in events:
+        if event.get("table") != "memberships":
+            continue
+        row = event.get("record") or event.get("old_record") or {}
+        if row.get("user_id") in (None, user_id) or (event.get("old_record") or {}).get("user_id") == user_id:
+            return True
+    return False
+
+
+def role_for(ppg_id: Optional[str] = None) -> Optional[str]:
+    """Role of the session in ``ppg_id`` (default: the current PPG)."""
+    cache = st.session_state.get(ROLE_CACHE_KEY) if hasattr(st, "session_state") else None
+    if cache is None:
+        return current_profile() if hasattr(st, "session_state") else None
+    return cache["roles"].get(str(ppg_id or current_ppg() or st.session_state.get("ppg_id")))
+
+
+def permissions(ppg_id: Optional[str] = None) -> FrozenSet[str]:
+    role = role_for(ppg_id)
+    return _PERMS.get(role, _NO_PERMS) if role else _NO_PERMS
+
+
+def can(action: str, ppg_id: Optional[str] = None) -> bool:
+    return action in permissions(ppg_id)
 
 
-__all__ = ["can", "ROLE_PERMS"]
+__all__ = [
+    "can",
+    "permissions",
+    "role_for",
+    "cache_memberships",
+    "cached_memberships",
+    "cached_user",
+    "invalidate_roles",
+    "touches_cached_user",
+    "ROLE_PERMS",
+    "ROLE_CACHE_KEY",
+]
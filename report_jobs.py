@@ -0,0 +1,397 @@
+"""Background report jobs: a thread pool fed from a persistent SQLite job table.
+
+Jobs receive a pickled copy of the PPG's data at submission time, since worker
+threads have no Streamlit session. Queued and running jobs left behind by a
+restart are resumed on first use.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import pickle
+import sqlite3
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from reports import ReportTable, build_quadrennial_report
+
+DB_ENV = "PPG_JOBS_DB"
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "var" / "report_jobs.sqlite3"
+MAX_WORKERS = int(os.environ.get("PPG_REPORT_WORKERS", "2"))
+MAX_ACTIVE_PER_OWNER = int(os.environ.get("PPG_REPORT_JOBS_PER_USER", "2"))
+
+FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("csv", "text/csv"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "application/pdf"),
+}
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+create table if not exists report_jobs (
+    id text primary key,
+    owner text not null,
+    ppg_id text not null,
+    first_year integer not null,
+    last_year integer not null,
+    format text not null,
+    status text not null,
+    progress real not null default 0,
+    message text,
+    error text,
+    created_at text not null,
+    started_at text,
+    finished_at text,
+    filename text,
+    input blob,
+    output blob
+);
+create index if not exists report_jobs_owner_status on report_jobs (owner, status);
+"""
+_COLUMNS = "id, owner, ppg_id, first_year, last_year, format, status, progress, message, error, created_at, started_at, finished_at, filename"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_start_lock = threading.Lock()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _db_path() -> Path:
+    return Path(os.environ.get(DB_ENV) or DEFAULT_DB_PATH)
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(_db_path(), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _pool() -> ThreadPoolExecutor:
+    """Create the table and the pool once per process, re-queueing jobs interrupted by a restart."""
+    global _executor
+    with _start_lock:
+        if _executor is None:
+            _db_path().parent.mkdir(parents=True, exist_ok=True)
+            with closing(_connect()) as conn:
+                conn.execute("pragma journal_mode=wal")
+                conn.executescript(_SCHEMA)
+                conn.execute("update report_jobs set status = 'queued', progress = 0 where status = 'running'")
+                pending = [row["id"] for row in conn.execute("select id from report_jobs where status = 'queued' order by created_at")]
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ppg-report")
+            for job_id in pending:
+                _executor.submit(_run, job_id)
+        return _executor
+
+
+def _ppg_slice(db: Dict[str, Any], ppg_id: str) -> Dict[str, Any]:
+    """Rows of ``ppg_id`` (plus rows without ``ppg_id``, such as the PPGs themselves)."""
+    return {
+        name: [row for row in rows if row.get("ppg_id", ppg_id) == ppg_id]
+        for name, rows in db.items()
+        if isinstance(rows, list)
+    }
+
+
+def submit_report_job(owner: str, ppg_id: str, db: Dict[str, Any], first_year: int, last_year: int, fmt: str) -> str:
+    """Queue a quadrennial report of ``ppg_id`` and return the job id.
+
+    Raises ``ValueError`` for an unknown format or when ``owner`` already has
+    ``MAX_ACTIVE_PER_OWNER`` jobs queued or running.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    pool = _pool()
+    job_id = uuid.uuid4().hex
+    blob = pickle.dumps(_ppg_slice(db, ppg_id), protocol=5)
+    with closing(_connect()) as conn:
+        conn.execute("begin immediate")
+        try:
+            (active,) = conn.execute(
+                "select count(*) from report_jobs where owner = ? and status in (?, ?)", (owner, *ACTIVE_STATUSES)
+            ).fetchone()
+            if active >= MAX_ACTIVE_PER_OWNER:
+                raise ValueError(
+                    f"Limite de {MAX_ACTIVE_PER_OWNER} relatórios em andamento atingido. Aguarde a conclusão dos anteriores."
+                )
+            conn.execute(
+                "insert into report_jobs (id, owner, ppg_id, first_year, last_year, format, status, message, created_at, input)"
+                " values (?, ?, ?, ?, ?, ?, 'queued', 'Na fila', ?, ?)",
+                (job_id, owner, ppg_id, first_year, last_year, fmt, _now(), blob),
+            )
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+    pool.submit(_run, job_id)
+    return job_id
+
+
+def list_jobs(owner: Optional[str] = None, ppg_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    _pool()
+    clauses, params = [], []
+    if owner:
+        clauses.append("owner = ?")
+        params.append(owner)
+    if ppg_id:
+        clauses.append("ppg_id = ?")
+        params.append(ppg_id)
+    where = f"where {' and '.join(clauses)}" if clauses else ""
+    with closing(_connect()) as conn:
+        rows = conn.execute(f"select {_COLUMNS} from report_jobs {where} order by created_at desc limit ?", (*params, limit))
+        return [dict(row) for row in rows]
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    _pool()
+    with closing(_connect()) as conn:
+        row = conn.execute(f"select {_COLUMNS} from report_jobs where id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def job_output(job_id: str, owner: str) -> Optional[Tuple[str, bytes, str]]:
+    """Return ``(filename, content, mime)`` of a finished job of ``owner``."""
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "select filename, output, format from report_jobs where id = ? and owner = ? and status = 'done'", (job_id, owner)
+        ).fetchone()
+    if row is None:
+        return None
+    return row["filename"], row["output"], FORMATS[row["format"]][1]
+
+
+def cancel_job(job_id: str, owner: str) -> None:
+    """Cancel a queued or running job of ``owner``; a running job stops at its next progress update."""
+    with closing(_connect()) as conn:
+        conn.execute(
+            "update report_jobs set status = 'cancelled', message = 'Cancelado', finished_at = ?, input = null"
+            " where id = ? and owner = ? and status in (?, ?)",
+            (_now(), job_id, owner, *ACTIVE_STATUSES),
+        )
+
+
+def delete_job(job_id: str, owner: str) -> None:
+    with closing(_connect()) as conn:
+        conn.execute(
+            "delete from report_jobs where id = ? and owner = ? and status not in (?, ?)", (job_id, owner, *ACTIVE_STATUSES)
+        )
+
+
+def _run(job_id: str) -> None:
+    with closing(_connect()) as conn:
+        claimed = conn.execute(
+            "update report_jobs set status = 'running', started_at = ?, message = 'Iniciando' where id = ? and status = 'queued'",
+            (_now(), job_id),
+        ).rowcount
+        if not claimed:
+            return
+        job = conn.execute("select ppg_id, first_year, last_year, format, input from report_jobs where id = ?", (job_id,)).fetchone()
+
+        def progress(fraction: float, message: str) -> None:
+            updated = conn.execute(
+                "update report_jobs set progress = ?, message = ? where id = ? and status = 'running'",
+                (fraction, message, job_id),
+            ).rowcount
+            if not updated:
+                raise _Cancelled
+
+        try:
+            db = pickle.loads(job["input"])
+            tables = build_quadrennial_report(db, job["ppg_id"], job["first_year"], job["last_year"], progress)
+            progress(0.95, "Gerando arquivo")
+            content = RENDERERS[job["format"]](tables)
+            filename = f"relatorio_{job['ppg_id']}_{job['first_year']}-{job['last_year']}.{FORMATS[job['format']][0]}"
+            conn.execute(
+                "update report_jobs set status = 'done', progress = 1, message = 'Concluído', finished_at = ?,"
+                " filename = ?, output = ?, input = null where id = ? and status = 'running'",
+                (_now(), filename, content, job_id),
+            )
+        except _Cancelled:
+            return
+        except Exception as exc:  # the job row is the only place errors can be reported
+            conn.execute(
+                "update report_jobs set status = 'failed', message = 'Falhou', error = ?, finished_at = ?, input = null where id = ?",
+                (f"{type(exc).__name__}: {exc}", _now(), job_id),
+            )
+
+
+# -- Renderers --------------------------------------------------------------
+
+def _cell(value: Any) -> Any:
+    return "" if value is None else value
+
+
+def render_csv(tables: List[ReportTable]) -> bytes:
+    """All tables in one file, each preceded by its title and separated by a blank line."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for index, (title, headers, rows) in enumerate(tables):
+        if index:
+            writer.writerow([])
+        writer.writerow([title])
+        writer.writerow(headers)
+        writer.writerows([[_cell(row.get(h)) for h in headers] for row in rows])
+    # BOM so Excel opens the accents correctly.
+    return out.getvalue().encode("utf-8-sig")
+
+
+def _column(index: int) -> str:
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def _xlsx_cell(ref: str, value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(str(_cell(value)))}</t></is></c>'
+    return f'<c r="{ref}"><v>{value}</v></c>'
+
+
+def render_xlsx(tables: List[ReportTable]) -> bytes:
+    """Minimal SpreadsheetML workbook (one sheet per table) written with the standard library."""
+    sheets = []
+    for title, headers, rows in tables:
+        lines = []
+        for r, values in enumerate([headers] + [[row.get(h) for h in headers] for row in rows], start=1):
+            cells = "".join(_xlsx_cell(f"{_column(c)}{r}", value) for c, value in enumerate(values))
+            lines.append(f'<row r="{r}">{cells}</row>')
+        sheets.append(
+            (
+                "".join(ch for ch in title if ch not in "[]:*?/\\")[:31],
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f"<sheetData>{''.join(lines)}</sheetData></worksheet>",
+            )
+        )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(sheets) + 1)
+        )
+        zf.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f"{overrides}</Types>",
+        )
+        zf.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>',
+        )
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, (name, _) in enumerate(sheets, 1))
+            + "</sheets></workbook>",
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(sheets) + 1)
+            )
+            + "</Relationships>",
+        )
+        for i, (_, xml) in enumerate(sheets, 1):
+            zf.writestr(f"xl/worksheets/sheet{i}.xml", xml)
+    return out.getvalue()
+
+
+PDF_LINES_PER_PAGE = 60
+PDF_LINE_WIDTH = 120
+
+
+def _pdf_text(text: str) -> str:
+    text = text.encode("cp1252", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_pdf(tables: List[ReportTable]) -> bytes:
+    """Plain-text PDF (Courier, A4 landscape) written with the standard library."""
+    lines: List[Tuple[str, bool]] = []
+    for title, headers, rows in tables:
+        lines += [(title, True), (" | ".join(headers), False)]
+        lines += [(" | ".join(str(_cell(row.get(h))) for h in headers), False) for row in rows]
+        lines.append(("", False))
+    pages = [lines[i : i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for page in pages:
+        ops = ["BT", "10 TL", "30 565 Td"]
+        for text, bold in page:
+            ops.append(f"/{'F2' if bold else 'F1'} 8 Tf ({_pdf_text(text[:PDF_LINE_WIDTH])}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+RENDERERS: Dict[str, Callable[[List[ReportTable]], bytes]] = {"csv": render_csv, "xlsx": render_xlsx, "pdf": render_pdf}
+
+
+__all__ = [
+    "FORMATS",
+    "MAX_ACTIVE_PER_OWNER",
+    "submit_report_job",
+    "list_jobs",
+    "get_job",
+    "job_output",
+    "cancel_job",
+    "delete_job",
+    "render_csv",
+    "render_xlsx",
+    "render_pdf",
+]
@@ -0,0 +1,416 @@
+"""Materialized per-PPG production reports kept in sync with store writes."""
+from __future__ import annotations
+
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+
+import streamlit as st
+
+from demo_store import Change, _collection, register_write_listener, store_revision
+from instrumentation import instrument_module
+from metrics import record_cache
+from store_locks import read_lock
+
+PRODUCTION_COLLECTIONS = ("dissertations", "articles", "ptts")
+SECTIONS = ("line", "orientador", "year", "status", "project")
+NO_KEY = ""
+
+Report = Dict[str, Any]
+
+
+def _empty_report() -> Report:
+    report: Report = {section: {} for section in SECTIONS}
+    report["totals"] = {collection: 0 for collection in PRODUCTION_COLLECTIONS}
+    report["evaluations"] = {"target_type": {}, "year": {}}
+    return report
+
+
+def _production_keys(row: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "line": row.get("line_id") or NO_KEY,
+        "orientador": row.get("orientador_id") or NO_KEY,
+        "year": str(row.get("year") or NO_KEY),
+        "status": row.get("status") or NO_KEY,
+        "project": row.get("project_id") or NO_KEY,
+    }
+
+
+def _add(bucket: Dict[str, Dict[str, float]], key: str, field: str, amount: float) -> None:
+    counts = bucket.setdefault(key, {})
+    counts[field] = counts.get(field, 0) + amount
+    if not any(round(value, 9) for value in counts.values()):
+        del bucket[key]
+
+
+def _apply(report: Report, collection: str, row: Dict[str, Any], sign: int) -> None:
+    """Add (``sign=1``) or remove (``sign=-1``) the contribution of one row."""
+    if collection in PRODUCTION_COLLECTIONS:
+        report["totals"][collection] += sign
+        for section, key in _production_keys(row).items():
+            _add(report[section], key, collection, sign)
+    elif collection == "evaluations":
+        score = row.get("final_score")
+        keys = {"target_type": row.get("target_type") or NO_KEY, "year": str(row.get("created_at") or NO_KEY)[:4]}
+        for section, key in keys.items():
+            _add(report["evaluations"][section], key, "count", sign)
+            if score is not None:
+                _add(report["evaluations"][section], key, "scored", sign)
+                _add(report["evaluations"][section], key, "score_sum", sign * float(score))
+
+
+def _scan_lock(db: Optional[Dict[str, Any]], collections: Tuple[str, ...]) -> ContextManager[None]:
+    """Read locks for a scan of the session database; snapshots passed as ``db`` need none."""
+    return read_lock(*collections) if db is None else nullcontext()
+
+
+def build_production_report(ppg_id: str, db: Optional[Dict[str, Any]] = None) -> Report:
+    """Aggregate every production and evaluation of ``ppg_id`` with one scan per collection.
+
+    ``db`` defaults to the session database; background jobs pass a snapshot instead.
+    """
+    report = _empty_report()
+    collections = PRODUCTION_COLLECTIONS + ("evaluations",)
+    with _scan_lock(db, collections):
+        for collection in collections:
+            for row in db.get(collection, []) if db is not None else _collection(collection):
+                if row.get("ppg_id") == ppg_id:
+                    _apply(report, collection, row, 1)
+    return report
+
+
+def build_all_reports(db: Optional[Dict[str, Any]] = None) -> Dict[str, Report]:
+    """Reports of every PPG (``ppg_id -> report``) with a single scan per collection.
+
+    The session database is scanned under ``read_lock``, so a concurrent save
+    cannot leave the reports disagreeing with each other.
+    """
+    collections = PRODUCTION_COLLECTIONS + ("evaluations",)
+    with _scan_lock(db, ("ppgs",) + collections):
+        ppgs = db.get("ppgs", []) if db is not None else _collection("ppgs")
+        reports: Dict[str, Report] = {ppg["id"]: _empty_report() for ppg in ppgs}
+        for collection in collections:
+            for row in db.get(collection, []) if db is not None else _collection(collection):
+                report = reports.get(row.get("ppg_id"))
+                if report is not None:
+                    _apply(report, collection, row, 1)
+    return reports
+
+
+def _cache() -> Dict[str, Dict[str, Any]]:
+    return st.session_state.setdefault("_production_reports", {})
+
+
+def production_report(ppg_id: str) -> Report:
+    """Return the materialized report of ``ppg_id``, rebuilding it only when it went stale."""
+    entry = _cache().get(ppg_id)
+    revision = store_revision()
+    hit = entry is not None and entry["revision"] == revision
+    record_cache("production_report", hit)
+    if not hit:
+        entry = {"revision": revision, "report": build_production_report(ppg_id)}
+        _cache()[ppg_id] = entry
+    return entry["report"]
+
+
+def all_production_reports() -> Dict[str, Report]:
+    """Reports of every PPG, from the same per-PPG cache as ``production_report``.
+
+    Stale entries are rebuilt together in one pass, not with one scan per PPG.
+    """
+    cache = _cache()
+    revision = store_revision()
+    ppg_ids = [ppg["id"] for ppg in _collection("ppgs")]
+    cold = [ppg_id for ppg_id in ppg_ids if cache.get(ppg_id, {}).get("revision") != revision]
+    record_cache("all_production_reports", not cold)
+    if cold:
+        built = build_all_reports()
+        for ppg_id in cold:
+            cache[ppg_id] = {"revision": revision, "report": built[ppg_id]}
+    return {ppg_id: cache[ppg_id]["report"] for ppg_id in ppg_ids}
+
+
+def reports_current() -> bool:
+    """Whether every PPG's cached report is at the store's revision."""
+    cache = st.session_state.get("_production_reports") or {}
+    revision = store_revision()
+    return all(cache.get(ppg["id"], {}).get("revision") == revision for ppg in _collection("ppgs"))
+
+
+def install_reports(built: Dict[str, Report], revision: int) -> None:
+    """Replace the cache with ``built`` (every PPG, scanned at ``revision``) in one assignment.
+
+    The background warm-up builds into a dict of its own; swapping it in whole
+    never changes a dict ``_on_write`` may be iterating.
+    """
+    st.session_state["_production_reports"] = {
+        ppg_id: {"revision": revision, "report": report} for ppg_id, report in built.items()
+    }
+
+
+def _on_write(collection: Optional[str], changes: List[Change], old_revision: int, new_revision: int) -> None:
+    cache = st.session_state.get("_production_reports")
+    if not cache:
+        return
+    if collection is None:
+        return
+    # Entries that missed an earlier write (or a full reload) are rebuilt on the next read.
+    current = {ppg_id: entry for ppg_id, entry in list(cache.items()) if entry["revision"] == old_revision}
+    if collection in PRODUCTION_COLLECTIONS or collection == "evaluations":
+        for before, after in changes:
+            if before is not None and before.get("ppg_id") in current:
+                _apply(current[before["ppg_id"]]["report"], collection, before, -1)
+            if after is not None and after.get("ppg_id") in current:
+                _apply(current[after["ppg_id"]]["report"], collection, after, 1)
+    for entry in current.values():
+        entry["revision"] = new_revision
+
+
+register_write_listener(_on_write)
+
+
+def report_rows(section_counts: Dict[str, Dict[str, float]], labels: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Flatten one production section into table rows, labelling keys via ``labels``."""
+    rows: List[Dict[str, Any]] = []
+    for key, counts in sorted(section_counts.items(), key=lambda item: item[0]):
+        articles, dissertations, ptts = (int(counts.get(c, 0)) for c in ("articles", "dissertations", "ptts"))
+        rows.append(
+            {
+                "Grupo": (labels or {}).get(key, key) or "Não informado",
+                "Dissertações": dissertations,
+                "Artigos": articles,
+                "PTTs": ptts,
+                "Total": articles + dissertations + ptts,
+            }
+        )
+    return rows
+
+
+def project_rows(report: Report, projects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Production per project, in the order of ``projects``, from the report's ``project`` section."""
+    rows: List[Dict[str, Any]] = []
+    for project in projects:
+        counts = report["project"].get(project.get("id"), {})
+        rows.append(
+            {
+                "Projeto": project.get("name"),
+                "#Dissertações": int(counts.get("dissertations", 0)),
+                "#Artigos": int(counts.get("articles", 0)),
+                "#PTTs": int(counts.get("ptts", 0)),
+            }
+        )
+    return rows
+
+
+def evaluation_rows(section_counts: Dict[str, Dict[str, float]], labels: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for key, counts in sorted(section_counts.items(), key=lambda item: item[0]):
+        scored = counts.get("scored", 0)
+        rows.append(
+            {
+                "Grupo": (labels or {}).get(key, key) or "Não informado",
+                "Avaliações": int(counts.get("count", 0)),
+                "Nota média": round(counts.get("score_sum", 0) / scored, 2) if scored else None,
+            }
+        )
+    return rows
+
+
+def evaluation_average(report: Report) -> Tuple[int, Optional[float]]:
+    counts = report["evaluations"]["target_type"].values()
+    total = int(sum(c.get("count", 0) for c in counts))
+    scored = sum(c.get("scored", 0) for c in counts)
+    score_sum = sum(c.get("score_sum", 0) for c in counts)
+    return total, (round(score_sum / scored, 2) if scored else None)
+
+
+def merge_reports(reports: Iterable[Report]) -> Report:
+    """Sum several PPG reports into one, e.g. the institution-wide totals."""
+    merged = _empty_report()
+    for report in reports:
+        for collection, count in report["totals"].items():
+            merged["totals"][collection] += count
+        for section in SECTIONS:
+            for key, counts in report[section].items():
+                for field, amount in counts.items():
+                    _add(merged[section], key, field, amount)
+        for section, buckets in report["evaluations"].items():
+            for key, counts in buckets.items():
+                for field, amount in counts.items():
+                    _add(merged["evaluations"][section], key, field, amount)
+    return merged
+
+
+def ppg_summary(ppg_id: str, name: Optional[str], report: Report) -> Dict[str, Any]:
+    """One row of the consolidated dashboard, shaped like the ``public.ppg_summary`` view."""
+    counts = report["evaluations"]["target_type"].values()
+    return {
+        "ppg_id": ppg_id,
+        "name": name or ppg_id,
+        **{collection: int(report["totals"][collection]) for collection in PRODUCTION_COLLECTIONS},
+        "evaluations": int(sum(c.get("count", 0) for c in counts)),
+        "scored": int(sum(c.get("scored", 0) for c in counts)),
+        "score_sum": sum(c.get("score_sum", 0) for c in counts),
+    }
+
+
+def consolidated_rows(summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Table rows per PPG followed by the institution total; averages are weighted by scored evaluations."""
+    totals: Dict[str, Any] = {"name": "Instituição (total)"}
+    rows: List[Dict[str, Any]] = []
+    for summary in sorted(summaries, key=lambda s: str(s.get("name") or "")) + [totals]:
+        if summary is not totals:
+            for field in PRODUCTION_COLLECTIONS + ("evaluations", "scored", "score_sum"):
+                totals[field] = totals.get(field, 0) + (summary.get(field) or 0)
+        scored = summary.get("scored") or 0
+        rows.append(
+            {
+                "PPG": summary.get("name"),
+                "Dissertações": int(summary.get("dissertations") or 0),
+                "Artigos": int(summary.get("articles") or 0),
+                "PTTs": int(summary.get("ptts") or 0),
+                "Avaliações": int(summary.get("evaluations") or 0),
+                "Nota média": round(float(summary.get("score_sum") or 0) / scored, 2) if scored else None,
+            }
+        )
+    return rows
+
+
+# CAPES quadrennial evaluations: 2017-2020, 2021-2024, ...
+QUADRENNIAL_START = 2017
+
+ReportTable = Tuple[str, List[str], List[Dict[str, Any]]]
+Progress = Callable[[float, str], None]
+
+
+def quadrennials(until_year: int) -> List[Tuple[int, int]]:
+    """Return the quadrennial periods up to the one containing ``until_year``, latest first."""
+    periods = [(start, start + 3) for start in range(QUADRENNIAL_START, until_year + 1, 4)]
+    return list(reversed(periods))
+
+
+GROUP_HEADERS = ["Grupo", "Dissertações", "Artigos", "PTTs", "Total"]
+PRODUCTION_HEADERS = ["Título", "Ano", "Status", "Linha", "Orientador", "Mestrando"]
+EVALUATED_HEADERS = ["Avaliações", "Nota média"]
+
+
+def build_quadrennial_report(
+    db: Dict[str, Any], ppg_id: str, first_year: int, last_year: int, progress: Optional[Progress] = None
+) -> List[ReportTable]:
+    """Assemble the tables of a quadrennial report from a database snapshot.
+
+    Runs outside Streamlit (see ``report_jobs``), so it only reads ``db``.
+    """
+    notify = progress or (lambda fraction, message: None)
+
+    def in_period(row: Dict[str, Any]) -> bool:
+        try:
+            return first_year <= int(row.get("year")) <= last_year
+        except (TypeError, ValueError):
+            return False
+
+    def of_ppg(collection: str) -> List[Dict[str, Any]]:
+        return [row for row in db.get(collection, []) if row.get("ppg_id") == ppg_id]
+
+    ppg = next((row for row in db.get("ppgs", []) if row.get("id") == ppg_id), {"id": ppg_id})
+    lines = {row["id"]: row.get("name", row["id"]) for row in of_ppg("research_lines")}
+    people = {row["id"]: row.get("name", row["id"]) for row in of_ppg("people")}
+
+    notify(0.05, "Selecionando produções do período")
+    period: Dict[str, List[Dict[str, Any]]] = {c: [r for r in of_ppg(c) if in_period(r)] for c in PRODUCTION_COLLECTIONS}
+    titles = {row["id"]: row.get("title", row["id"]) for rows in period.values() for row in rows}
+    types = {"article": "articles", "ptt": "ptts"}
+    evaluations = [
+        ev for ev in of_ppg("evaluations") if ev.get("target_id") in titles and types.get(ev.get("target_type")) in period
+    ]
+    scores: Dict[str, List[float]] = {}
+    for ev in evaluations:
+        if ev.get("final_score") is not None:
+            scores.setdefault(ev["target_id"], []).append(float(ev["final_score"]))
+
+    notify(0.25, "Agregando produção")
+    aggregates = build_production_report(ppg_id, {**period, "evaluations": evaluations})
+    total_evaluations, average = evaluation_average(aggregates)
+    summary = [
+        {"Indicador": "PPG", "Valor": ppg.get("name", ppg_id)},
+        {"Indicador": "Período", "Valor": f"{first_year}–{last_year}"},
+        {"Indicador": "Dissertações", "Valor": aggregates["totals"]["dissertations"]},
+        {"Indicador": "Artigos", "Valor": aggregates["totals"]["articles"]},
+        {"Indicador": "PTTs", "Valor": aggregates["totals"]["ptts"]},
+        {"Indicador": "Avaliações", "Valor": total_evaluations},
+        {"Indicador": "Nota média", "Valor": average if average is not None else "—"},
+    ]
+    tables: List[ReportTable] = [
+        ("Resumo", ["Indicador", "Valor"], summary),
+        ("Produção por linha", GROUP_HEADERS, report_rows(aggregates["line"], lines)),
+        ("Produção por orientador", GROUP_HEADERS, report_rows(aggregates["orientador"], people)),
+        ("Produção por ano", GROUP_HEADERS, report_rows(aggregates["year"])),
+    ]
+
+    def evaluated(row: Dict[str, Any]) -> Dict[str, Any]:
+        values = scores.get(row["id"], [])
+        return {"Avaliações": len(values), "Nota média": round(sum(values) / len(values), 2) if values else None}
+
+    def common(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "Título": row.get("title", ""),
+            "Ano": row.get("year"),
+            "Status": row.get("status", ""),
+            "Linha": lines.get(row.get("line_id"), ""),
+            "Orientador": people.get(row.get("orientador_id"), ""),
+            "Mestrando": people.get(row.get("mestrando_id"), ""),
+        }
+
+    notify(0.45, "Listando dissertações")
+    tables.append(("Dissertações", PRODUCTION_HEADERS, [common(row) for row in period["dissertations"]]))
+    notify(0.6, "Listando artigos")
+    tables.append(
+        (
+            "Artigos",
+            PRODUCTION_HEADERS + ["Dissertação"] + EVALUATED_HEADERS,
+            [{**common(row), "Dissertação": titles.get(row.get("dissertation_id"), ""), **evaluated(row)} for row in period["articles"]],
+        )
+    )
+    notify(0.75, "Listando PTTs")
+    tables.append(
+        (
+            "PTTs",
+            PRODUCTION_HEADERS + ["Tipo"] + EVALUATED_HEADERS,
+            [{**common(row), "Tipo": row.get("tipo_ptt", ""), **evaluated(row)} for row in period["ptts"]],
+        )
+    )
+    notify(0.85, "Listando avaliações")
+    evaluation_table = [
+        {
+            "Tipo": "Artigo" if ev.get("target_type") == "article" else "PTT",
+            "Produção": titles.get(ev.get("target_id"), ""),
+            "Avaliador": people.get(ev.get("evaluator_id"), ev.get("evaluator_id") or ""),
+            "Data": str(ev.get("created_at") or "")[:10],
+            "Nota": ev.get("final_score"),
+        }
+        for ev in sorted(evaluations, key=lambda ev: ev.get("created_at") or "")
+    ]
+    tables.append(("Avaliações", ["Tipo", "Produção", "Avaliador", "Data", "Nota"], evaluation_table))
+    return tables
+
+
+__all__ = [
+    "PRODUCTION_COLLECTIONS",
+    "ReportTable",
+    "quadrennials",
+    "build_quadrennial_report",
+    "build_production_report",
+    "build_all_reports",
+    "production_report",
+    "all_production_reports",
+    "reports_current",
+    "install_reports",
+    "merge_reports",
+    "ppg_summary",
+    "consolidated_rows",
+    "report_rows",
+    "project_rows",
+    "evaluation_rows",
+    "evaluation_average",
+]
+
+instrument_module(globals())
@@ -0,0 +1,182 @@
+"""Per-collection reader/writer locks for the in-memory store.
+
+The demo database is a dict of lists in ``st.session_state["db"]``; the same
+store object may sit in several sessions at once, and each session runs its
+reruns on script threads of its own. The locks belong to the store they
+protect: a process-wide registry keeps one ``StoreLocks`` per store object,
+so every session writing to a shared store waits on the same locks, while
+sessions with stores of their own never block each other. The store's
+revision counter lives there too, so a write in one session is seen as a new
+revision by every other session on that store. Within a store:
+
+* any number of threads may hold a collection's read lock at once;
+* a writer waits for the readers to leave and blocks new ones (writer
+  preference, so a stream of reruns cannot starve a save);
+* both are re-entrant per thread, and a thread holding the write lock may
+  also read, so write listeners can query the collection they are told about.
+
+Several collections are always acquired in name order, which is what keeps
+multi-collection writes (link syncs, cascades) free of deadlocks. Upgrading a
+read lock to a write lock is refused, since two upgraders would wait forever.
+"""
+from __future__ import annotations
+
+import itertools
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import streamlit as st
+
+
+class RWLock:
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}  # thread id -> read depth
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers[me] = 1
+
+    def release_read(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+            else:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("Não é possível promover uma leitura a escrita; adquira a escrita antes.")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+
+# Revisions are drawn from one process-wide sequence, so a store never reuses a
+# revision another store (or its own predecessor in a session) already had, and
+# caches keyed on ``revision == ...`` cannot match across a store swap.
+_revisions = itertools.count(1)
+
+
+class StoreLocks:
+    """Locks of one store: an ``RWLock`` per collection, plus the store's revision counter."""
+
+    def __init__(self, store: Any) -> None:
+        # Held so that ``id(store)`` cannot be reused while this entry exists.
+        self.store = store
+        self.revision = next(_revisions)
+        self._revision_lock = threading.Lock()
+        self._collections: Dict[str, RWLock] = {}
+        self._registry = threading.Lock()
+
+    def collection(self, name: str) -> RWLock:
+        lock = self._collections.get(name)
+        if lock is None:
+            with self._registry:
+                lock = self._collections.setdefault(name, RWLock())
+        return lock
+
+    def bump_revision(self) -> Tuple[int, int]:
+        """Move the store to a new revision; returns ``(old, new)``."""
+        with self._revision_lock:
+            old = self.revision
+            self.revision = next(_revisions)
+            return old, self.revision
+
+
+_stores: Dict[int, StoreLocks] = {}
+_registry_lock = threading.Lock()
+
+
+def _prune() -> None:
+    """Drop the entries of stores no session holds any more (only ``StoreLocks.store`` refers to them)."""
+    for store_id, locks in list(_stores.items()):
+        # References: ``locks.store`` and the argument of getrefcount.
+        if sys.getrefcount(locks.store) <= 2:
+            del _stores[store_id]
+
+
+def store_locks(store: Any = None) -> StoreLocks:
+    """Locks of the session's current store, shared by every session holding the same store object.
+
+    Threads without a session (the PPG warm-up) pass the ``store`` they read.
+    """
+    if store is None:
+        store = st.session_state.get("db")
+    locks = _stores.get(id(store))
+    if locks is None or locks.store is not store:
+        with _registry_lock:
+            locks = _stores.get(id(store))
+            if locks is None or locks.store is not store:
+                _prune()
+                locks = _stores[id(store)] = StoreLocks(store)
+    return locks
+
+
+def collection_lock(name: str) -> RWLock:
+    return store_locks().collection(name)
+
+
+@contextmanager
+def read_lock(*collections: str, store: Any = None) -> Iterator[None]:
+    """Hold the read locks of ``collections`` (a consistent view across several scans)."""
+    locks = [store_locks(store).collection(name) for name in sorted(set(collections))]
+    acquired = []
+    try:
+        for lock in locks:
+            lock.acquire_read()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release_read()
+
+
+@contextmanager
+def write_lock(*collections: str, store: Any = None) -> Iterator[None]:
+    """Hold the write locks of ``collections``; take every collection a change touches up front."""
+    locks = [store_locks(store).collection(name) for name in sorted(set(collections))]
+    acquired = []
+    try:
+        for lock in locks:
+            lock.acquire_write()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release_write()
+
+
+__all__ = ["RWLock", "StoreLocks", "store_locks", "collection_lock", "read_lock", "write_lock"]